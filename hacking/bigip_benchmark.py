@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Offline scaling benchmark for the F5 BIG-IP modules.
+
+Runs bigip_facts, bigip_pool and bigip_pool_member against an in-process
+stand-in for the iControl LocalLB, Networking and System interfaces and
+reports iControl round trips, wall time and peak memory per module and
+object count. No BIG-IP and no bigsuds installation are needed.
+
+The stand-in replaces the bigsuds module rather than speaking SOAP on the
+wire, so WSDL download and XML (de)serialization cost is not measured; use
+--latency to model the per-request network cost of a remote device.
+
+Usage:
+
+    python hacking/bigip_benchmark.py [--sizes 100,1000,10000] [--latency MS]
+
+Each case runs in its own interpreter so that peak RSS is per case.
+"""
+
+import json
+import optparse
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import types
+
+MODULE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, 'network', 'f5')
+
+CASES = ['facts', 'facts_parallel', 'pool_single', 'pool_batch',
+         'pool_member_single', 'pool_member_batch']
+
+# getters the stand-in rejects, as older BIG-IP versions do
+UNSUPPORTED = set(['get_gtm_score', 'get_client_ip_tos', 'get_nat64_state'])
+
+
+# ===========================================
+# iControl stand-in
+#
+
+class OperationFailed(Exception):
+    pass
+
+
+class MethodNotFound(Exception):
+    pass
+
+
+class WebFault(Exception):
+    pass
+
+
+class Device(object):
+    """In-memory BIG-IP configuration shared by all sessions.
+
+    Attributes:
+        round_trips: Number of iControl requests served.
+        latency: Seconds to sleep per request.
+        objects: Dictionary of interface name to list of object names.
+        pools: Dictionary of pool name to pool settings and members.
+    """
+
+    def __init__(self, size, latency=0):
+        self.lock = threading.Lock()
+        self.round_trips = 0
+        self.latency = latency
+        self.objects = {}
+        for interface in ('VirtualServer', 'NodeAddressV2', 'VirtualAddressV2',
+                          'Rule', 'ProfileClientSSL', 'Class'):
+            self.objects[interface] = ['/Common/%s_%d' % (interface.lower(), i)
+                                       for i in range(size)]
+        for interface in ('Interfaces', 'SelfIPV2', 'Trunk', 'VLAN'):
+            self.objects[interface] = ['/Common/%s_%d' % (interface.lower(), i)
+                                       for i in range(size)]
+        self.pools = {}
+        self.in_transaction = False
+
+    def add_pools(self, count, members_per_pool=0):
+        for i in range(count):
+            members = [{'address': '/Common/10.%d.%d.%d' % (j // 65536, (j // 256) % 256, j % 256), 'port': 80}
+                       for j in range(members_per_pool)]
+            self.pools['/Common/pool_%d' % i] = {
+                'lb_method': 'LB_METHOD_ROUND_ROBIN',
+                'monitor_rule': {'type': 'MONITOR_RULE_TYPE_NONE', 'quorum': 0,
+                                 'monitor_templates': []},
+                'slow_ramp_time': 10,
+                'action_on_service_down': 'SERVICE_DOWN_ACTION_NONE',
+                'members': members,
+                'member_properties': {},
+            }
+        self.objects['Pool'] = sorted(self.pools)
+
+    def request(self):
+        self.lock.acquire()
+        try:
+            self.round_trips += 1
+        finally:
+            self.lock.release()
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class Interface(object):
+
+    def __init__(self, device, namespace, name):
+        self.device = device
+        self.namespace = namespace
+        self.name = name
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        if method in UNSUPPORTED:
+            raise MethodNotFound(method)
+        handler = getattr(type(self), 'do_' + method, None)
+
+        def call(*args, **kwargs):
+            self.device.request()
+            if handler is not None:
+                return handler(self, *args, **kwargs)
+            return self.generic(method, args, kwargs)
+        return call
+
+    def generic(self, method, args, kwargs):
+        if method == 'get_list':
+            return list(self.device.objects.get(self.name, []))
+        if method.startswith(('get_', 'is_', 'query_')):
+            names = args and args[0] or (kwargs and list(kwargs.values())[0]) or []
+            if method.startswith('get_member_') or method.startswith('query_'):
+                return self.member_values(method, kwargs)
+            return ['%s:%s' % (method, x) for x in names]
+        # setters and other writes are accepted and ignored
+        return None
+
+    def member_values(self, method, kwargs):
+        return [[0 for m in members] for members in kwargs.get('members', [])]
+
+
+class SessionInterface(Interface):
+
+    def __init__(self, device, namespace, name):
+        Interface.__init__(self, device, namespace, name)
+        self.folder = '/Common'
+        self.recursive = 'STATE_DISABLED'
+
+    def do_get_active_folder(self):
+        return self.folder
+
+    def do_set_active_folder(self, folder):
+        self.folder = folder
+
+    def do_get_recursive_query_state(self):
+        return self.recursive
+
+    def do_set_recursive_query_state(self, state):
+        self.recursive = state
+
+    def do_get_session_identifier(self):
+        return 12345
+
+    def do_start_transaction(self):
+        self.device.in_transaction = True
+
+    def do_submit_transaction(self):
+        self.device.in_transaction = False
+
+    def do_rollback_transaction(self):
+        self.device.in_transaction = False
+
+
+class PoolInterface(Interface):
+
+    def pool(self, name):
+        if name not in self.device.pools:
+            raise OperationFailed("Pool %s was not found." % name)
+        return self.device.pools[name]
+
+    def do_get_list(self):
+        return sorted(self.device.pools)
+
+    def do_get_object_status(self, pool_names):
+        return [{'availability_status': 'AVAILABILITY_STATUS_GREEN'} for x in pool_names if self.pool(x)]
+
+    def do_get_lb_method(self, pool_names):
+        return [self.pool(x)['lb_method'] for x in pool_names]
+
+    def do_set_lb_method(self, pool_names, lb_methods):
+        for name, value in zip(pool_names, lb_methods):
+            self.pool(name)['lb_method'] = value
+
+    def do_get_monitor_association(self, pool_names):
+        return [{'pool_name': x, 'monitor_rule': self.pool(x)['monitor_rule']} for x in pool_names]
+
+    def do_set_monitor_association(self, monitor_associations):
+        for x in monitor_associations:
+            self.pool(x['pool_name'])['monitor_rule'] = x['monitor_rule']
+
+    def do_get_slow_ramp_time(self, pool_names):
+        return [self.pool(x)['slow_ramp_time'] for x in pool_names]
+
+    def do_set_slow_ramp_time(self, pool_names, values):
+        for name, value in zip(pool_names, values):
+            self.pool(name)['slow_ramp_time'] = value
+
+    def do_get_action_on_service_down(self, pool_names):
+        return [self.pool(x)['action_on_service_down'] for x in pool_names]
+
+    def do_set_action_on_service_down(self, pool_names, actions):
+        for name, value in zip(pool_names, actions):
+            self.pool(name)['action_on_service_down'] = value
+
+    def do_create_v2(self, pool_names, lb_methods, members):
+        for name, lb_method, pool_members in zip(pool_names, lb_methods, members):
+            if name in self.device.pools:
+                raise OperationFailed("Pool %s already exists." % name)
+            self.device.pools[name] = {
+                'lb_method': lb_method,
+                'monitor_rule': {'type': 'MONITOR_RULE_TYPE_NONE', 'quorum': 0,
+                                 'monitor_templates': []},
+                'slow_ramp_time': 10,
+                'action_on_service_down': 'SERVICE_DOWN_ACTION_NONE',
+                'members': list(pool_members),
+                'member_properties': {},
+            }
+
+    def do_delete_pool(self, pool_names):
+        for name in pool_names:
+            self.pool(name)
+            del self.device.pools[name]
+
+    def do_get_member_v2(self, pool_names):
+        return [list(self.pool(x)['members']) for x in pool_names]
+
+    def do_add_member_v2(self, pool_names, members):
+        for name, pool_members in zip(pool_names, members):
+            self.pool(name)['members'].extend(pool_members)
+
+    def do_remove_member_v2(self, pool_names, members):
+        for name, pool_members in zip(pool_names, members):
+            pool = self.pool(name)
+            pool['members'] = [x for x in pool['members'] if x not in pool_members]
+
+    def do_get_member_object_status(self, pool_names, members):
+        for name, pool_members in zip(pool_names, members):
+            current = self.pool(name)['members']
+            for member in pool_members:
+                if member not in current:
+                    raise OperationFailed("Pool member %s:%s was not found." % (member['address'], member['port']))
+        return [[{} for m in x] for x in members]
+
+    def member_values(self, method, kwargs):
+        prop = method.replace('get_member_', '')
+        result = []
+        for name, pool_members in zip(kwargs['pool_names'], kwargs['members']):
+            props = self.pool(name)['member_properties']
+            result.append([props.get((m['address'], m['port'], prop), 0) for m in pool_members])
+        return result
+
+    def generic(self, method, args, kwargs):
+        if method.startswith('set_member_'):
+            prop = method.replace('set_member_', '')
+            values = [v for k, v in kwargs.items() if k not in ('pool_names', 'members')][0]
+            for name, pool_members, pool_values in zip(kwargs['pool_names'], kwargs['members'], values):
+                props = self.pool(name)['member_properties']
+                for member, value in zip(pool_members, pool_values):
+                    props[(member['address'], member['port'], prop)] = value
+            return None
+        return Interface.generic(self, method, args, kwargs)
+
+
+INTERFACES = {
+    ('System', 'Session'): SessionInterface,
+    ('LocalLB', 'Pool'): PoolInterface,
+}
+
+
+class Namespace(object):
+
+    def __init__(self, device, name):
+        self.device = device
+        self.name = name
+        self.interfaces = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self.interfaces:
+            cls = INTERFACES.get((self.name, name), Interface)
+            self.interfaces[name] = cls(self.device, self.name, name)
+        return self.interfaces[name]
+
+
+class BIGIP(object):
+    """Drop-in replacement for bigsuds.BIGIP backed by a shared Device."""
+
+    device = None
+
+    def __init__(self, hostname=None, username=None, password=None, **kwargs):
+        for name in ('System', 'LocalLB', 'Networking', 'Management'):
+            setattr(self, name, Namespace(self.device, name))
+
+    def with_session_id(self, session_id=None):
+        if session_id is None:
+            self.System.Session.get_session_identifier()
+        return self
+
+
+def install_stand_in(device):
+    BIGIP.device = device
+    bigsuds = types.ModuleType('bigsuds')
+    bigsuds.BIGIP = BIGIP
+    bigsuds.OperationFailed = OperationFailed
+    suds = types.ModuleType('suds')
+    suds.MethodNotFound = MethodNotFound
+    suds.WebFault = WebFault
+    sys.modules['bigsuds'] = bigsuds
+    sys.modules['suds'] = suds
+
+
+def load_module(name):
+    """Load a module's functions without running main()."""
+    path = os.path.join(MODULE_DIR, name + '.py')
+    source = open(path).read()
+    source = source.replace('\nfrom ansible.module_utils.basic import *\n', '\n')
+    source = source[:source.rindex('\nmain()')]
+    namespace = {'__name__': name}
+    exec(compile(source, path, 'exec'), namespace)
+    return namespace
+
+
+class FakeModule(object):
+    """Just enough of AnsibleModule for the per-item parsers."""
+
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+
+    def fail_json(self, **kwargs):
+        raise Exception(kwargs['msg'])
+
+
+# ===========================================
+# benchmark cases
+#
+
+def case_facts(device, size, max_workers=1):
+    m = load_module('bigip_facts')
+    stats = m['FetchStats']()
+    f5_args = dict(host='bigip', user='admin', password='admin',
+                   session=False, stats=stats, chunk_size=1000)
+    facts = {}
+    m['collect_all_facts'](f5_args, ['pool', 'virtual_server', 'node'],
+                           None, max_workers, facts.__setitem__)
+    return sum([len(x) for x in facts.values()])
+
+
+def case_facts_parallel(device, size):
+    return case_facts(device, size, max_workers=3)
+
+
+def pool_items(size):
+    items = []
+    for i in range(size):
+        if i % 2:
+            items.append({'name': 'pool_%d' % i, 'lb_method': 'least_connection_member',
+                          'slow_ramp_time': 30})
+        else:
+            items.append({'name': 'new_pool_%d' % i, 'lb_method': 'round_robin',
+                          'host': '10.1.0.%d' % (i % 250 + 1), 'port': 80})
+    return items
+
+
+def case_pool_single(device, size):
+    # one module run per pool, as a with_items loop would do
+    m = load_module('bigip_pool')
+    for item in pool_items(size):
+        api = m['bigip_api']('bigip', 'admin', 'admin')
+        pool = '/Common/%s' % item['name']
+        if not m['pool_exists'](api, pool):
+            m['create_pool'](api, pool, item['lb_method'])
+            if item.get('host'):
+                m['add_pool_member'](api, pool, '/Common/%s' % item['host'], item['port'])
+        else:
+            if item['lb_method'] != m['get_lb_method'](api, pool):
+                m['set_lb_method'](api, pool, item['lb_method'])
+            if item['slow_ramp_time'] != m['get_slow_ramp_time'](api, pool):
+                m['set_slow_ramp_time'](api, pool, item['slow_ramp_time'])
+    return size
+
+
+def case_pool_batch(device, size):
+    m = load_module('bigip_pool')
+    module = FakeModule(dict([(x, None) for x in m['POOL_OPTIONS']]))
+    module.params.update(state='present', partition='Common')
+    pools = []
+    for item in pool_items(size):
+        params = m['pool_params'](module, item)
+        m['check_monitor_params'](module, params)
+        pools.append(params)
+    api = m['bigip_api']('bigip', 'admin', 'admin').with_session_id()
+    plan, changes = m['plan_pools'](api, pools)
+    m['apply_pool_plan'](api, plan)
+    return len(changes)
+
+
+def member_items(size):
+    items = []
+    for j in range(size):
+        address = '10.%d.%d.%d' % (j // 65536, (j // 256) % 256, j % 256)
+        items.append({'host': address, 'port': 80, 'ratio': 2, 'description': 'web %d' % j})
+    return items
+
+
+def case_pool_member_single(device, size):
+    m = load_module('bigip_pool_member')
+    pool = '/Common/pool_0'
+    for item in member_items(size):
+        api = m['bigip_api']('bigip', 'admin', 'admin')
+        address = '/Common/%s' % item['host']
+        m['pool_exists'](api, pool)
+        if not m['member_exists'](api, pool, address, item['port']):
+            m['add_pool_member'](api, pool, address, item['port'])
+        if item['ratio'] != m['get_ratio'](api, pool, address, item['port']):
+            m['set_ratio'](api, pool, address, item['port'], item['ratio'])
+        if item['description'] != m['get_description'](api, pool, address, item['port']):
+            m['set_description'](api, pool, address, item['port'], item['description'])
+    return size
+
+
+def case_pool_member_batch(device, size):
+    m = load_module('bigip_pool_member')
+    module = FakeModule({})
+    api = m['bigip_api']('bigip', 'admin', 'admin')
+    pool = '/Common/pool_0'
+    m['pool_exists'](api, pool)
+    desired = m['parse_members'](module, 'Common', member_items(size), 'present')
+    result = m['reconcile_members'](api, pool, desired, False)
+    return len(result['modified']) + len(result['added'])
+
+
+def setup_device(case, size, latency):
+    device = Device(size, latency)
+    if case.startswith('pool_member'):
+        # half of the members already exist
+        device.add_pools(1, members_per_pool=size // 2)
+    else:
+        device.add_pools(size)
+    return device
+
+
+def run_case(case, size, latency):
+    device = setup_device(case, size, latency)
+    install_stand_in(device)
+    start = time.time()
+    objects = globals()['case_' + case](device, size)
+    elapsed = time.time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'case': case, 'size': size, 'objects': objects,
+            'round_trips': device.round_trips, 'wall_time': elapsed,
+            'peak_rss_kb': peak_kb}
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--sizes', default='100,1000,10000',
+                      help="comma separated object counts (default: %default)")
+    parser.add_option('--latency', type='float', default=0.0,
+                      help="simulated milliseconds per iControl request (default: %default)")
+    parser.add_option('--cases', default=','.join(CASES),
+                      help="comma separated cases to run (default: all)")
+    parser.add_option('--json', action='store_true', default=False,
+                      help="print results as JSON")
+    parser.add_option('--run-case', help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.run_case:
+        case, size = options.run_case.split(':')
+        print(json.dumps(run_case(case, int(size), options.latency / 1000.0)))
+        return
+
+    results = []
+    for size in [int(x) for x in options.sizes.split(',')]:
+        for case in options.cases.split(','):
+            if case not in CASES:
+                parser.error("unknown case %s, expected one of: %s" % (case, ', '.join(CASES)))
+            output = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                                       '--latency', str(options.latency),
+                                       '--run-case', '%s:%d' % (case, size)],
+                                      stdout=subprocess.PIPE).communicate()[0]
+            results.append(json.loads(output))
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    print("%-20s %7s %12s %12s %14s" % ('case', 'size', 'round trips', 'wall time', 'peak rss (KB)'))
+    for r in results:
+        print("%-20s %7d %12d %11.3fs %14d" % (r['case'], r['size'], r['round_trips'],
+                                               r['wall_time'], r['peak_rss_kb']))
+
+
+if __name__ == '__main__':
+    main()
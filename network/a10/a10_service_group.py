@@ -32,6 +32,8 @@ author: Mischa Peters
 notes:
     - Requires A10 Networks aXAPI 2.1
     - When a server doesn't exist and is added to the service-group the server will be created
+    - The servers are checked with a single slb.server.getAll call, and the group
+      is created or updated together with its whole member list in one call.
 options:
   host:
     description:
@@ -57,7 +59,8 @@ options:
   service_group:
     description:
       - slb service-group name
-    required: true
+      - Required unless I(flush_config) is set.
+    required: false
     default: null
     aliases: ['service', 'pool', 'group']
     choices: []
@@ -93,6 +96,20 @@ options:
     required: false
     default: "no"
     choices: ["yes", "no"]
+  flush_config:
+    description:
+      - If C(yes), only write the running configuration to non-volatile memory
+        and exit, the service group is left alone. Meant for a handler notified
+        by tasks run with C(write_config=no), so a play that changes several
+        service groups saves the configuration once at the end.
+      - The configuration is always written. With I(cache_dir), the
+        a10_server, a10_service_group and a10_virtual_server tasks that change
+        the device without writing the configuration record it there, and
+        the flush only reports a change when such a record exists.
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.1"
   validate_certs:
     description:
       - If C(no), SSL certificates will not be validated. This should only be used
@@ -100,6 +117,33 @@ options:
     required: false
     default: 'yes'
     choices: ['yes', 'no']
+  cache_dir:
+    description:
+      - Local directory where the aXAPI session is cached when
+        I(reuse_session) is set, and where changes that were not written
+        to non-volatile memory are recorded for I(flush_config).
+    required: false
+    default: null
+    version_added: "2.1"
+  reuse_session:
+    description:
+      - If C(yes), keep the aXAPI session for this host and user in
+        I(cache_dir) instead of closing it, and reuse it in later tasks
+        until it expires, which saves the login and logout round trips.
+        A cached session the device no longer accepts is replaced with a
+        new one. Requires I(cache_dir).
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.1"
+  session_timeout:
+    description:
+      - Number of seconds a cached session may stay idle before a new one
+        is requested. Keep this below the session idle timeout configured
+        on the device.
+    required: false
+    default: 300
+    version_added: "2.1"
 
 '''
 
@@ -121,8 +165,49 @@ EXAMPLES = '''
         port: 8080
         status: disabled
 
+# Update several service groups and save the configuration once
+- a10_service_group:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    service_group: "{{ item.name }}"
+    servers: "{{ item.servers }}"
+    cache_dir: ~/.ansible/a10
+  with_items: service_groups
+  notify: save a10 configuration
+
+# handlers:
+- name: save a10 configuration
+  a10_service_group:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    flush_config: yes
+    cache_dir: ~/.ansible/a10
+
+# Reuse one aXAPI session across the tasks of a play
+- a10_service_group:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    service_group: sg-80-tcp
+    servers:
+      - server: foo1.mydomain.com
+        port: 8080
+    cache_dir: ~/.ansible/a10
+    reuse_session: yes
+
 '''
 
+import os
+import tempfile
+import time
+import hashlib
+
+# error codes the device returns for a session id it does not know (anymore)
+AXAPI_INVALID_SESSION = 1009
+AXAPI_SESSION_ERRORS = (AXAPI_INVALID_SESSION,)
+
 VALID_SERVICE_GROUP_FIELDS = ['name', 'protocol', 'lb_method']
 VALID_SERVER_FIELDS = ['server', 'port', 'status']
 
@@ -152,13 +237,89 @@ def validate_servers(module, servers):
             item['status'] = 1
 
 
+def axapi_session_path(module):
+    # sessions are cached per device and user
+    key = hashlib.sha1("%s|%s" % (module.params['host'], module.params['username'])).hexdigest()
+    return os.path.join(os.path.expanduser(module.params['cache_dir']), "axapi_session_%s.json" % key)
+
+def axapi_save_session(module, session_url):
+    cache_dir = os.path.expanduser(module.params['cache_dir'])
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, 0700)
+    entry = {'session_url': session_url, 'expires': time.time() + module.params['session_timeout']}
+    fd, tmp = tempfile.mkstemp(dir=cache_dir)
+    f = os.fdopen(fd, 'w')
+    try:
+        json.dump(entry, f)
+    finally:
+        f.close()
+    os.rename(tmp, axapi_session_path(module))
+
+def axapi_open_session(module, base_url, username, password, refresh=False):
+    '''
+    Returns the session url to use for the aXAPI calls. With reuse_session,
+    a cached session which has not expired is returned instead of logging
+    in again, unless refresh is set.
+    '''
+    if not module.params['reuse_session']:
+        return axapi_authenticate(module, base_url, username, password)
+
+    if not refresh:
+        try:
+            f = open(axapi_session_path(module))
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time() and entry['session_url'].startswith(base_url + '&'):
+                return entry['session_url']
+        except (IOError, ValueError, KeyError):
+            pass
+
+    session_url = axapi_authenticate(module, base_url, username, password)
+    axapi_save_session(module, session_url)
+    return session_url
+
+def axapi_session_expired(result):
+    # the device dropped a cached session before it expired here,
+    # e.g. after a reboot or an idle timeout shorter than ours
+    if not axapi_failure(result):
+        return False
+    return result['response'].get('err', {}).get('code') in AXAPI_SESSION_ERRORS
+
+def axapi_pending_path(module):
+    # unsaved changes are tracked per device, whoever made them
+    key = hashlib.sha1(module.params['host']).hexdigest()
+    return os.path.join(os.path.expanduser(module.params['cache_dir']), "axapi_pending_%s" % key)
+
+def axapi_set_pending(module, pending):
+    '''
+    Records whether the running configuration of the device has changes
+    flush_config still has to write.
+    '''
+    path = axapi_pending_path(module)
+    if pending:
+        cache_dir = os.path.expanduser(module.params['cache_dir'])
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        open(path, 'w').close()
+    elif os.path.exists(path):
+        os.remove(path)
+
+def axapi_close_session(module, session_url):
+    if module.params['reuse_session']:
+        # keep the session for the next task and push its expiry back
+        axapi_save_session(module, session_url)
+    else:
+        axapi_call(module, session_url + '&method=session.close')
+
 def main():
     argument_spec = a10_argument_spec()
     argument_spec.update(url_argument_spec())
     argument_spec.update(
         dict(
             state=dict(type='str', default='present', choices=['present', 'absent']),
-            service_group=dict(type='str', aliases=['service', 'pool', 'group'], required=True),
+            service_group=dict(type='str', aliases=['service', 'pool', 'group'], required=False),
             service_group_protocol=dict(type='str', default='tcp', aliases=['proto', 'protocol'], choices=['tcp', 'udp']),
             service_group_method=dict(type='str', default='round-robin',
                                       aliases=['method'],
@@ -174,6 +335,10 @@ def main():
                                                'src-ip-only-hash',
                                                'src-ip-hash']),
             servers=dict(type='list', aliases=['server', 'member'], default=[]),
+            flush_config=dict(type='bool', default=False),
+            cache_dir=dict(type='str'),
+            reuse_session=dict(type='bool', default=False),
+            session_timeout=dict(type='int', default=300),
         )
     )
 
@@ -191,11 +356,33 @@ def main():
     slb_service_group_proto = module.params['service_group_protocol']
     slb_service_group_method = module.params['service_group_method']
     slb_servers = module.params['servers']
+    flush_config = module.params['flush_config']
+
+    if module.params['reuse_session'] and not module.params['cache_dir']:
+        module.fail_json(msg="reuse_session requires cache_dir")
+
+    axapi_base_url = 'https://' + host + '/services/rest/V2.1/?format=json'
+
+    if flush_config:
+        # save what earlier tasks left in the running configuration. Only
+        # changes made with cache_dir are recorded, so the configuration
+        # is written even when none was
+        pending = not module.params['cache_dir'] or os.path.exists(axapi_pending_path(module))
+        session_url = axapi_open_session(module, axapi_base_url, username, password)
+        write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
+        if axapi_session_expired(write_result):
+            session_url = axapi_open_session(module, axapi_base_url, username, password, refresh=True)
+            write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
+        axapi_close_session(module, session_url)
+        if axapi_failure(write_result):
+            module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
+        if module.params['cache_dir']:
+            axapi_set_pending(module, False)
+        module.exit_json(changed=pending, content=write_result)
 
     if slb_service_group is None:
         module.fail_json(msg='service_group is required')
 
-    axapi_base_url = 'https://' + host + '/services/rest/V2.1/?format=json'
     load_balancing_methods = {'round-robin': 0,
                               'weighted-rr': 1,
                               'least-connection': 2,
@@ -225,22 +412,51 @@ def main():
     }
 
     # first we authenticate to get a session id
-    session_url = axapi_authenticate(module, axapi_base_url, username, password)
+    session_url = axapi_open_session(module, axapi_base_url, username, password)
 
     # then we check to see if the specified group exists
     slb_result = axapi_call(module, session_url + '&method=slb.service_group.search', json.dumps({'name': slb_service_group}))
+    if axapi_session_expired(slb_result):
+        session_url = axapi_open_session(module, axapi_base_url, username, password, refresh=True)
+        slb_result = axapi_call(module, session_url + '&method=slb.service_group.search', json.dumps({'name': slb_service_group}))
     slb_service_group_exist = not axapi_failure(slb_result)
 
     changed = False
+    members = dict(added=[], updated=[], removed=[])
     if state == 'present':
         # before creating/updating we need to validate that servers
-        # defined in the servers list exist to prevent errors
-        checked_servers = []
-        for server in slb_servers:
-            result = axapi_call(module, session_url + '&method=slb.server.search', json.dumps({'name': server['server']}))
+        # defined in the servers list exist to prevent errors, so
+        # fetch every server on the device once and check locally
+        if slb_servers:
+            result = axapi_call(module, session_url + '&method=slb.server.getAll')
             if axapi_failure(result):
-                module.fail_json(msg="the server %s specified in the servers list does not exist" % server['server'])
-            checked_servers.append(server['server'])
+                module.fail_json(msg="failed to list the servers: %s" % result['response']['err']['msg'])
+            existing_servers = set([server['name'] for server in result.get('server_list', [])])
+            missing_servers = [server['server'] for server in slb_servers if server['server'] not in existing_servers]
+            if missing_servers:
+                module.fail_json(msg="the servers %s specified in the servers list do not exist" % ', '.join(missing_servers))
+
+        # members are keyed on their server and port, and diffed
+        # against the member list the group search returned
+        defined_servers = slb_result.get('service_group', {}).get('member_list', [])
+        defined = dict(((server['server'], server['port']), server) for server in defined_servers)
+        wanted = dict(((server['server'], server['port']), server) for server in slb_servers)
+
+        for key, server in wanted.items():
+            if key not in defined:
+                members['added'].append(server)
+            else:
+                for valid_field in VALID_SERVER_FIELDS:
+                    if server[valid_field] != defined[key].get(valid_field):
+                        members['updated'].append(server)
+                        break
+        for key, server in defined.items():
+            if key not in wanted:
+                members['removed'].append(server)
+
+        # the whole member list goes along with the group definition,
+        # so the group and its members are set in a single call
+        json_post['service_group']['member_list'] = slb_servers
 
         if not slb_service_group_exist:
             result = axapi_call(module, session_url + '&method=slb.service_group.create', json.dumps(json_post))
@@ -248,10 +464,7 @@ def main():
                 module.fail_json(msg=result['response']['err']['msg'])
             changed = True
         else:
-            # check to see if the service group definition without the
-            # server members is different, and update that individually
-            # if it needs it
-            do_update = False
+            do_update = members['added'] or members['updated'] or members['removed']
             for field in VALID_SERVICE_GROUP_FIELDS:
                 if json_post['service_group'][field] != slb_result['service_group'][field]:
                     do_update = True
@@ -263,57 +476,24 @@ def main():
                     module.fail_json(msg=result['response']['err']['msg'])
                 changed = True
 
-        # next we pull the defined list of servers out of the returned
-        # results to make it a bit easier to iterate over
-        defined_servers = slb_result.get('service_group', {}).get('member_list', [])
-
-        # next we add/update new member servers from the user-specified
-        # list if they're different or not on the target device
-        for server in slb_servers:
-            found = False
-            different = False
-            for def_server in defined_servers:
-                if server['server'] == def_server['server']:
-                    found = True
-                    for valid_field in VALID_SERVER_FIELDS:
-                        if server[valid_field] != def_server[valid_field]:
-                            different = True
-                            break
-                    if found or different:
-                        break
-            # add or update as required
-            server_data = {
-                "name": slb_service_group,
-                "member": server,
-            }
-            if not found:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.create', json.dumps(server_data))
-                changed = True
-            elif different:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.update', json.dumps(server_data))
-                changed = True
-
-        # finally, remove any servers that are on the target
-        # device but were not specified in the list given
-        for server in defined_servers:
-            found = False
-            for slb_server in slb_servers:
-                if server['server'] == slb_server['server']:
-                    found = True
-                    break
-            # remove if not found
-            server_data = {
-                "name": slb_service_group,
-                "member": server,
-            }
-            if not found:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.delete', json.dumps(server_data))
-                changed = True
-
         # if we changed things, get the full info regarding
         # the service group for the return data below
         if changed:
             result = axapi_call(module, session_url + '&method=slb.service_group.search', json.dumps({'name': slb_service_group}))
+
+            # an update may leave members it was not given in place,
+            # remove the ones that are still there one by one
+            if members['removed'] and not axapi_failure(result):
+                current = result.get('service_group', {}).get('member_list', [])
+                leftovers = [server for server in current if (server['server'], server['port']) not in wanted]
+                for server in leftovers:
+                    server_data = {
+                        "name": slb_service_group,
+                        "member": server,
+                    }
+                    axapi_call(module, session_url + '&method=slb.service_group.member.delete', json.dumps(server_data))
+                if leftovers:
+                    result = axapi_call(module, session_url + '&method=slb.service_group.search', json.dumps({'name': slb_service_group}))
         else:
             result = slb_result
     elif state == 'absent':
@@ -323,15 +503,20 @@ def main():
         else:
             result = dict(msg="the service group was not present")
 
-    # if the config has changed, save the config unless otherwise requested
+    # if the config has changed, save the config unless otherwise requested,
+    # in which case a later flush_config run has something to write
     if changed and write_config:
         write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
         if axapi_failure(write_result):
             module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
-
-    # log out of the session nicely and exit
-    axapi_call(module, session_url + '&method=session.close')
-    module.exit_json(changed=changed, content=result)
+        if module.params['cache_dir']:
+            axapi_set_pending(module, False)
+    elif changed and module.params['cache_dir']:
+        axapi_set_pending(module, True)
+
+    # log out of the session nicely, or keep it for the next task, and exit
+    axapi_close_session(module, session_url)
+    module.exit_json(changed=changed, content=result, members=members)
 
 # standard ansible module imports
 from ansible.module_utils.basic import *
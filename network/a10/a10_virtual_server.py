@@ -100,6 +100,34 @@ options:
     required: false
     default: 'yes'
     choices: ['yes', 'no']
+  cache_dir:
+    description:
+      - Local directory where the aXAPI session is cached when
+        I(reuse_session) is set, and where changes that were not written
+        to non-volatile memory are recorded for the I(flush_config) option
+        of a10_service_group.
+    required: false
+    default: null
+    version_added: "2.1"
+  reuse_session:
+    description:
+      - If C(yes), keep the aXAPI session for this host and user in
+        I(cache_dir) instead of closing it, and reuse it in later tasks
+        until it expires, which saves the login and logout round trips.
+        A cached session the device no longer accepts is replaced with a
+        new one. Requires I(cache_dir).
+    required: false
+    default: "no"
+    choices: ["yes", "no"]
+    version_added: "2.1"
+  session_timeout:
+    description:
+      - Number of seconds a cached session may stay idle before a new one
+        is requested. Keep this below the session idle timeout configured
+        on the device.
+    required: false
+    default: 300
+    version_added: "2.1"
 
 '''
 
@@ -124,6 +152,15 @@ EXAMPLES = '''
 
 '''
 
+import os
+import tempfile
+import time
+import hashlib
+
+# error codes the device returns for a session id it does not know (anymore)
+AXAPI_INVALID_SESSION = 1009
+AXAPI_SESSION_ERRORS = (AXAPI_INVALID_SESSION,)
+
 VALID_PORT_FIELDS = ['port', 'protocol', 'service_group', 'status']
 
 def validate_ports(module, ports):
@@ -162,6 +199,82 @@ def validate_ports(module, ports):
         if 'service_group' not in item:
             item['service_group'] = ''
 
+def axapi_session_path(module):
+    # sessions are cached per device and user
+    key = hashlib.sha1("%s|%s" % (module.params['host'], module.params['username'])).hexdigest()
+    return os.path.join(os.path.expanduser(module.params['cache_dir']), "axapi_session_%s.json" % key)
+
+def axapi_save_session(module, session_url):
+    cache_dir = os.path.expanduser(module.params['cache_dir'])
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, 0700)
+    entry = {'session_url': session_url, 'expires': time.time() + module.params['session_timeout']}
+    fd, tmp = tempfile.mkstemp(dir=cache_dir)
+    f = os.fdopen(fd, 'w')
+    try:
+        json.dump(entry, f)
+    finally:
+        f.close()
+    os.rename(tmp, axapi_session_path(module))
+
+def axapi_open_session(module, base_url, username, password, refresh=False):
+    '''
+    Returns the session url to use for the aXAPI calls. With reuse_session,
+    a cached session which has not expired is returned instead of logging
+    in again, unless refresh is set.
+    '''
+    if not module.params['reuse_session']:
+        return axapi_authenticate(module, base_url, username, password)
+
+    if not refresh:
+        try:
+            f = open(axapi_session_path(module))
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time() and entry['session_url'].startswith(base_url + '&'):
+                return entry['session_url']
+        except (IOError, ValueError, KeyError):
+            pass
+
+    session_url = axapi_authenticate(module, base_url, username, password)
+    axapi_save_session(module, session_url)
+    return session_url
+
+def axapi_session_expired(result):
+    # the device dropped a cached session before it expired here,
+    # e.g. after a reboot or an idle timeout shorter than ours
+    if not axapi_failure(result):
+        return False
+    return result['response'].get('err', {}).get('code') in AXAPI_SESSION_ERRORS
+
+def axapi_pending_path(module):
+    # unsaved changes are tracked per device, whoever made them
+    key = hashlib.sha1(module.params['host']).hexdigest()
+    return os.path.join(os.path.expanduser(module.params['cache_dir']), "axapi_pending_%s" % key)
+
+def axapi_set_pending(module, pending):
+    '''
+    Records whether the running configuration of the device has changes
+    flush_config still has to write.
+    '''
+    path = axapi_pending_path(module)
+    if pending:
+        cache_dir = os.path.expanduser(module.params['cache_dir'])
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        open(path, 'w').close()
+    elif os.path.exists(path):
+        os.remove(path)
+
+def axapi_close_session(module, session_url):
+    if module.params['reuse_session']:
+        # keep the session for the next task and push its expiry back
+        axapi_save_session(module, session_url)
+    else:
+        axapi_call(module, session_url + '&method=session.close')
+
 def main():
     argument_spec = a10_argument_spec()
     argument_spec.update(url_argument_spec())
@@ -172,6 +285,9 @@ def main():
             virtual_server_ip=dict(type='str', aliases=['ip', 'address'], required=True),
             virtual_server_status=dict(type='str', default='enabled', aliases=['status'], choices=['enabled', 'disabled']),
             virtual_server_ports=dict(type='list', required=True),
+            cache_dir=dict(type='str'),
+            reuse_session=dict(type='bool', default=False),
+            session_timeout=dict(type='int', default=300),
         )
     )
 
@@ -195,10 +311,16 @@ def main():
 
     validate_ports(module, slb_virtual_ports)
 
+    if module.params['reuse_session'] and not module.params['cache_dir']:
+        module.fail_json(msg="reuse_session requires cache_dir")
+
     axapi_base_url = 'https://%s/services/rest/V2.1/?format=json' % host
-    session_url = axapi_authenticate(module, axapi_base_url, username, password)
+    session_url = axapi_open_session(module, axapi_base_url, username, password)
 
     slb_virtual_data = axapi_call(module, session_url + '&method=slb.virtual_server.search', json.dumps({'name': slb_virtual}))
+    if axapi_session_expired(slb_virtual_data):
+        session_url = axapi_open_session(module, axapi_base_url, username, password, refresh=True)
+        slb_virtual_data = axapi_call(module, session_url + '&method=slb.virtual_server.search', json.dumps({'name': slb_virtual}))
     slb_virtual_exists = not axapi_failure(slb_virtual_data)
 
     changed = False
@@ -280,14 +402,19 @@ def main():
         else:
             result = dict(msg="the virtual server was not present")
 
-    # if the config has changed, save the config unless otherwise requested
+    # if the config has changed, save the config unless otherwise requested,
+    # in which case a later flush_config run has something to write
     if changed and write_config:
         write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
         if axapi_failure(write_result):
             module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
+        if module.params['cache_dir']:
+            axapi_set_pending(module, False)
+    elif changed and module.params['cache_dir']:
+        axapi_set_pending(module, True)
 
-    # log out of the session nicely and exit
-    axapi_call(module, session_url + '&method=session.close')
+    # log out of the session nicely, or keep it for the next task, and exit
+    axapi_close_session(module, session_url)
     module.exit_json(changed=changed, content=result)
 
 # standard ansible module imports
@@ -66,6 +66,25 @@ options:
     required: true
     default: hostname
     aliases: []
+  names:
+    description:
+      - List of entity names to run I(action) on, instead of I(name). The
+        module logs in once, sends the actions over kept-alive connections
+        that share the session and logs out, instead of authenticating every
+        request. The outcome and timing of every entity is returned in
+        C(results). An entity listed more than once is acted on once.
+    required: false
+    default: null
+    aliases: []
+    version_added: "2.1"
+  max_workers:
+    description:
+      - Number of actions from I(names) sent at the same time, each worker
+        using its own connection.
+    required: false
+    default: 1
+    aliases: []
+    version_added: "2.1"
   type:
     description:
       - type of the entity
@@ -94,11 +113,27 @@ ansible host -m netscaler -a "nsc_host=nsc.example.com user=apiuser password=api
 
 # Disable the service local:8080
 ansible host -m netscaler -a "nsc_host=nsc.example.com user=apiuser password=apipass name=local:8080 type=service action=disable"
+
+# Disable a batch of servers with a single login, four at a time
+- netscaler:
+    nsc_host: nsc.example.com
+    user: apiuser
+    password: apipass
+    action: disable
+    names: "{{ groups['webservers'] }}"
+    max_workers: 4
+  delegate_to: localhost
+  run_once: true
 '''
 
 
 import base64
+import httplib
 import socket
+import ssl
+import threading
+import time
+import Queue
 
 
 class netscaler(object):
@@ -140,6 +175,131 @@ class netscaler(object):
         return resp
 
 
+class netscaler_session(object):
+    """
+    Runs actions on several entities with a single NITRO login. Every
+    worker thread keeps its own connection open, all of them sharing the
+    session token.
+    """
+
+    _nitro_config_url = '/nitro/v1/config/'
+
+    def __init__(self, module):
+        self.module = module
+        self._nsc_host = module.params.get('nsc_host')
+        self._nsc_user = module.params.get('user')
+        self._nsc_pass = module.params.get('password')
+        self._nsc_protocol = module.params.get('nsc_protocol')
+        self._validate_certs = module.params.get('validate_certs')
+        self._type = module.params.get('type')
+        self._token = None
+
+    def connect(self):
+        if self._nsc_protocol == 'http':
+            return httplib.HTTPConnection(self._nsc_host)
+        if self._validate_certs:
+            return httplib.HTTPSConnection(self._nsc_host, context=ssl.create_default_context())
+        return httplib.HTTPSConnection(self._nsc_host, context=ssl._create_unverified_context())
+
+    def http_request(self, conn, data_json):
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        if self._token:
+            headers['Cookie'] = 'NITRO_AUTH_TOKEN=%s; sessionid=%s' % (self._token, self._token)
+        conn.request('POST', self._nitro_config_url, urllib.urlencode(data_json), headers)
+        response = conn.getresponse()
+        # the whole body has to be read before the connection is reused
+        body = response.read()
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {'errorcode': -1, 'message': 'HTTP %s %s' % (response.status, response.reason)}
+
+    def login(self, conn):
+        resp = self.http_request(conn, {"object": json.dumps({"login": {"username": self._nsc_user, "password": self._nsc_pass}})})
+        if resp.get('errorcode') != 0:
+            raise Exception("login failed: %s" % resp.get('message'))
+        self._token = resp['sessionid']
+
+    def logout(self, conn):
+        self.http_request(conn, {"object": json.dumps({"logout": {}})})
+        self._token = None
+
+    def prepare_request(self, conn, name, action):
+        start = time.time()
+        try:
+            resp = self.http_request(conn, {
+                "object": json.dumps({
+                    "params": {"action": action},
+                    self._type: {"name": name}
+                })
+            })
+        except (httplib.HTTPException, socket.error), e:
+            # start over on a new connection for the next entity
+            conn.close()
+            resp = {'errorcode': -1, 'message': str(e)}
+        return dict(name=name, errorcode=resp.get('errorcode', -1),
+                    message=resp.get('message', ''),
+                    elapsed=round(time.time() - start, 3))
+
+    def run(self, names, action, max_workers):
+        # an entity listed twice gets the action once
+        unique = []
+        for name in names:
+            if name not in unique:
+                unique.append(name)
+        names = unique
+
+        work = Queue.Queue()
+        for name in names:
+            work.put(name)
+        results = {}
+
+        def worker():
+            conn = self.connect()
+            try:
+                while True:
+                    try:
+                        name = work.get_nowait()
+                    except Queue.Empty:
+                        break
+                    try:
+                        results[name] = self.prepare_request(conn, name, action)
+                    except Exception, e:
+                        # keep the worker going on a new connection
+                        conn.close()
+                        results[name] = dict(name=name, errorcode=-1, message=str(e), elapsed=0)
+            finally:
+                conn.close()
+
+        conn = self.connect()
+        self.login(conn)
+        try:
+            workers = []
+            for i in range(min(max_workers, len(names))):
+                t = threading.Thread(target=worker)
+                t.daemon = True
+                t.start()
+                workers.append(t)
+            for t in workers:
+                t.join()
+        finally:
+            self.logout(conn)
+            conn.close()
+
+        # a name no worker got to counts as failed
+        return [results.get(name, dict(name=name, errorcode=-1, message='the action was not sent', elapsed=0))
+                for name in names]
+
+
+def core_names(module):
+    names = module.params.get('names')
+    n = netscaler_session(module)
+    start = time.time()
+    results = n.run(names, module.params.get('action'), module.params.get('max_workers'))
+    failed = [r['name'] for r in results if r['errorcode'] != 0]
+    return failed, dict(results=results, elapsed=round(time.time() - start, 3))
+
+
 def core(module):
     n = netscaler(module)
     n._nsc_host = module.params.get('nsc_host')
@@ -165,11 +325,29 @@ def main():
             password = dict(required=True),
             action = dict(default='enable', choices=['enable','disable']),
             name = dict(default=socket.gethostname()),
+            names = dict(type='list'),
+            max_workers = dict(type='int', default=1),
             type = dict(default='server', choices=['service', 'server']),
             validate_certs=dict(default='yes', type='bool'),
         )
     )
 
+    if module.params['names'] is not None:
+        if module.params['max_workers'] < 1:
+            module.fail_json(msg="max_workers must be 1 or greater")
+        if module.params['nsc_protocol'] != 'http' and not hasattr(ssl, 'create_default_context'):
+            module.fail_json(msg="names requires python 2.7.9 or newer for https")
+
+        try:
+            failed, result = core_names(module)
+        except Exception, e:
+            module.fail_json(msg=str(e))
+
+        result['changed'] = len(failed) < len(result['results'])
+        if failed:
+            module.fail_json(msg="the action failed on: %s" % ", ".join(failed), **result)
+        module.exit_json(**result)
+
     rc = 0
     try:
         rc, result = core(module)
@@ -92,6 +92,33 @@ options:
     required: false
     default: null
 
+  records:
+    description:
+      - List of records to synchronize with I(domain) in one go. Each item is a dict with the
+        C(name), C(type) and C(value) keys, and optionally C(ttl), C(priority) and C(state) which
+        default to I(ttl), I(priority) and I(state), or C(present).
+      - The records of the domain are listed once and indexed by name, type and value, and only
+        the records to add, update or delete are sent. The changes are returned in C(created),
+        C(updated) and C(deleted), which in check mode is the diff that would be applied.
+    required: false
+    default: null
+    version_added: "2.1"
+
+  purge:
+    description:
+      - With I(records), delete every record of the domain which is not in the list, except the
+        system records managed by DNSimple.
+    required: false
+    default: false
+    version_added: "2.1"
+
+  max_workers:
+    description:
+      - With I(records), number of changes sent to DNSimple at the same time.
+    required: false
+    default: 4
+    version_added: "2.1"
+
 requirements: [ dnsimple ]
 author: Alex Coomans
 '''
@@ -127,9 +154,23 @@ EXAMPLES = '''
 # and delete the record
 - local_action: dnsimpledomain=my.com record= type=CNAME value=example.com state=absent
 
+# make the my.com records exactly these ones, running with --check
+# only returns what would be created, updated and deleted
+- local_action:
+    module: dnsimple
+    domain: my.com
+    purge: yes
+    records:
+      - { name: "", type: A, value: 127.0.0.1 }
+      - { name: www, type: CNAME, value: my.com, ttl: 600 }
+      - { name: "", type: MX, value: mail.my.com, priority: 10 }
+  register: diff
+
 '''
 
 import os
+import threading
+import Queue
 try:
     from dnsimple import DNSimple
     from dnsimple.dnsimple import DNSimpleException
@@ -137,6 +178,129 @@ except ImportError:
     print "failed=True msg='dnsimple required for this module'"
     sys.exit(1)
 
+def validate_records(module, records):
+    for item in records:
+        if not isinstance(item, dict) or 'name' not in item or 'type' not in item or 'value' not in item:
+            module.fail_json(msg="records items must be dicts with at least the name, type and value keys: %s" % item)
+        item['name'] = item['name'] or ''
+        item.setdefault('ttl', module.params.get('ttl'))
+        item.setdefault('priority', module.params.get('priority'))
+        item.setdefault('state', module.params.get('state') or 'present')
+        if item['state'] not in ('present', 'absent'):
+            module.fail_json(msg="'%s' is an unknown value for the state of record %s" % (item['state'], item['name']))
+        # compared with the integers of the current records
+        for key in ('ttl', 'priority'):
+            if item[key] is None:
+                continue
+            try:
+                item[key] = int(item[key])
+            except (TypeError, ValueError):
+                module.fail_json(msg="the %s of record %s %s must be an integer" % (key, item['name'], item['type']))
+
+def diff_records(current, records, purge):
+    """
+    Returns the records to add, update and delete so that the current
+    records of the domain match the records list.
+    """
+    index = dict(((r['name'], r['record_type'], r['content']), r) for r in current)
+    wanted = set()
+    add, update, delete = [], [], []
+    for item in records:
+        key = (item['name'], item['type'], item['value'])
+        wanted.add(key)
+        rr = index.get(key)
+        if item['state'] == 'absent':
+            if rr:
+                delete.append(rr)
+        elif not rr:
+            data = {'name': item['name'], 'record_type': item['type'], 'content': item['value']}
+            if item['ttl']:      data['ttl']  = item['ttl']
+            if item['priority']: data['prio'] = item['priority']
+            add.append(data)
+        elif (item['ttl'] and rr['ttl'] != item['ttl']) or (item['priority'] and rr['prio'] != item['priority']):
+            data = {'id': rr['id']}
+            if item['ttl']:      data['ttl']  = item['ttl']
+            if item['priority']: data['prio'] = item['priority']
+            update.append(data)
+    if purge:
+        for key, rr in index.items():
+            if key not in wanted and not rr.get('system_record'):
+                delete.append(rr)
+    return add, update, delete
+
+def apply_changes(new_client, domain, add, update, delete, max_workers):
+    """
+    Sends the changes from a bounded pool of workers, each with its own
+    client. Returns the results of the changes and the errors, which
+    include the changes left unsent because no worker got a client.
+    """
+    work = Queue.Queue()
+    for rr in delete:
+        work.put(('delete', rr))
+    for data in update:
+        work.put(('update', data))
+    for data in add:
+        work.put(('add', data))
+    results = dict(add=[], update=[], delete=[])
+    errors = []
+    client_errors = []
+
+    def worker():
+        try:
+            client = new_client()
+        except Exception, e:
+            # the other workers take this one's share, if any of them can
+            client_errors.append(getattr(e, 'message', None) or e)
+            return
+        while True:
+            try:
+                action, data = work.get_nowait()
+            except Queue.Empty:
+                break
+            try:
+                if action == 'delete':
+                    client.delete_record(domain, data['id'])
+                    results['delete'].append(data)
+                elif action == 'update':
+                    changes = dict((k, v) for k, v in data.items() if k != 'id')
+                    results['update'].append(client.update_record(domain, str(data['id']), changes)['record'])
+                else:
+                    results['add'].append(client.add_record(domain, data)['record'])
+            except Exception, e:
+                errors.append("%s %s: %s" % (action, data, getattr(e, 'message', None) or e))
+
+    workers = []
+    for i in range(min(max_workers, work.qsize())):
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        workers.append(t)
+    for t in workers:
+        t.join()
+
+    while not work.empty():
+        action, data = work.get_nowait()
+        errors.append("%s %s: not sent, no client: %s" % (action, data, client_errors[-1]))
+
+    return results, errors
+
+def sync_records(module, new_client, client, domain):
+    records = module.params.get('records')
+    validate_records(module, records)
+
+    current = [r['record'] for r in client.records(domain)]
+    add, update, delete = diff_records(current, records, module.params.get('purge'))
+    changed = bool(add or update or delete)
+
+    if module.check_mode or not changed:
+        module.exit_json(changed=changed, created=add, updated=update, deleted=delete)
+
+    results, errors = apply_changes(new_client, domain, add, update, delete, module.params.get('max_workers'))
+    if errors:
+        module.fail_json(msg="Unable to apply %d of the changes" % len(errors), errors=errors,
+                         created=results['add'], updated=results['update'], deleted=results['delete'])
+    module.exit_json(changed=True, created=results['add'], updated=results['update'], deleted=results['delete'])
+
 def main():
     module = AnsibleModule(
         argument_spec = dict(
@@ -151,10 +315,16 @@ def main():
             priority          = dict(required=False, type='int'), 
             state             = dict(required=False, choices=['present', 'absent']),
             solo              = dict(required=False, type='bool'),
+            records           = dict(required=False, type='list'),
+            purge             = dict(required=False, default=False, type='bool'),
+            max_workers       = dict(required=False, default=4, type='int'),
         ),
         required_together = (
             ['record', 'value']
         ),
+        mutually_exclusive = [
+            ['records', 'record'], ['records', 'record_ids']
+        ],
         supports_check_mode = True,
     )
 
@@ -170,16 +340,27 @@ def main():
     state             = module.params.get('state')
     is_solo           = module.params.get('solo')
 
-    if account_email and account_api_token:
-        client = DNSimple(email=account_email, api_token=account_api_token)
-    elif os.environ.get('DNSIMPLE_EMAIL') and os.environ.get('DNSIMPLE_API_TOKEN'):
-        client = DNSimple(email=os.environ.get('DNSIMPLE_EMAIL'), api_token=os.environ.get('DNSIMPLE_API_TOKEN'))
-    else:
-        client = DNSimple()
+    def new_client():
+        if account_email and account_api_token:
+            return DNSimple(email=account_email, api_token=account_api_token)
+        elif os.environ.get('DNSIMPLE_EMAIL') and os.environ.get('DNSIMPLE_API_TOKEN'):
+            return DNSimple(email=os.environ.get('DNSIMPLE_EMAIL'), api_token=os.environ.get('DNSIMPLE_API_TOKEN'))
+        else:
+            return DNSimple()
+
+    client = new_client()
 
     try:
         # Let's figure out what operation we want to do
 
+        # Synchronize the records of the domain with a list
+        if module.params.get('records') is not None:
+            if not domain:
+                module.fail_json(msg="records requires a domain")
+            if module.params.get('max_workers') < 1:
+                module.fail_json(msg="max_workers must be 1 or greater")
+            sync_records(module, new_client, client, str(domain))
+
         # No domain, return a list
         if not domain:
             domains = client.domains()
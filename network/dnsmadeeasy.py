@@ -73,6 +73,24 @@ options:
     choices: [ 'present', 'absent' ]
     default: null
     
+  records:
+    description:
+      - List of records to manage in one go, instead of I(record_name). Each item is a
+        dict with the C(name), C(type) and C(value) keys, and optionally C(ttl) and C(state)
+        which default to I(record_ttl) and I(state). MX items may also set C(mxLevel),
+        SRV items C(priority), C(weight) and C(port), and HTTPRED items C(redirectType),
+        C(description), C(keywords), C(title) and C(hardLink).
+      - The zone is downloaded once and diffed against the list, then the changes are sent
+        with the bulk create, update and delete calls of the API.
+      - The values listed for a present name and type are all the values that name and type
+        keep; other records with the same name and type are reused for new values or deleted.
+        HTTPRED, MX and SRV records are not reused, new values get new records.
+        An absent item without C(value) removes every record with its name and type that
+        no present item keeps.
+    required: false
+    default: null
+    version_added: "2.1"
+
   validate_certs:
     description:
       - If C(no), SSL certificates will not be validated. This should only be used
@@ -85,6 +103,7 @@ options:
 notes:
   - The DNS Made Easy service requires that machines interacting with the API have the proper time and timezone set. Be sure you are within a few seconds of actual time by using NTP. 
   - This module returns record(s) in the "result" element when 'state' is set to 'present'. This value can be be registered and used in your playbooks.
+  - With I(records), the records that were created, updated and deleted are returned in the "created", "updated" and "deleted" elements.
   
 requirements: [ urllib, urllib2, hashlib, hmac ]
 author: Brice Burgess
@@ -107,6 +126,19 @@ EXAMPLES = '''
   
 # delete a record / ensure it is absent
 - dnsmadeeasy: account_key=key account_secret=secret domain=my.com state=absent record_name="test"
+
+# set several records with a single download of the zone
+- dnsmadeeasy:
+    account_key: key
+    account_secret: secret
+    domain: my.com
+    state: present
+    records:
+      - { name: www, type: A, value: 192.168.0.1 }
+      - { name: www, type: A, value: 192.168.0.2 }
+      - { name: mail, type: CNAME, value: mx.my.com., ttl: 300 }
+      - { name: '', type: MX, value: mx.my.com., mxLevel: 10 }
+      - { name: old, type: A, state: absent }
 '''
 
 # ============================================
@@ -134,6 +166,7 @@ class DME2:
         self.domain_map = None      # ["domain_name"] => ID
         self.record_map = None      # ["record_name"] => ID
         self.records = None         # ["record_ID"] => <record>
+        self.record_index = None    # [("record_name", "record_type")] => [<record>]
 
         # Lookup the domain ID if passed as a domain name vs. ID
         if not self.domain.isdigit():
@@ -230,6 +263,129 @@ class DME2:
         #@TODO remove record from the cache when impleneted
         return self.query(self.record_url + '/' + str(record_id), 'DELETE')
 
+    def getRecordIndex(self):
+        # built from a single download of the zone
+        if self.record_index is None:
+            index = {}
+            for record in self.getRecords():
+                index.setdefault((record['name'], record['type']), []).append(record)
+            self.record_index = index
+
+        return self.record_index
+
+    def createRecords(self, data):
+        return self.query(self.record_url + '/createMulti', 'POST', data)
+
+    def updateRecords(self, data):
+        return self.query(self.record_url + '/updateMulti', 'PUT', data)
+
+    def deleteRecords(self, record_ids):
+        ids = urllib.urlencode([('ids', record_id) for record_id in record_ids])
+        return self.query(self.record_url + '?' + ids, 'DELETE')
+
+
+RECORD_TYPES = ['A', 'AAAA', 'CNAME', 'HTTPRED', 'MX', 'NS', 'PTR', 'SRV', 'TXT']
+
+# fields records of these types carry besides the value, which items may set
+RECORD_FIELDS = {
+    'HTTPRED': ['redirectType', 'description', 'keywords', 'title', 'hardLink'],
+    'MX': ['mxLevel'],
+    'SRV': ['priority', 'weight', 'port'],
+}
+
+def validate_records(module, records):
+    for item in records:
+        if not isinstance(item, dict) or 'name' not in item or 'type' not in item:
+            module.fail_json(msg="records items must be dicts with at least the name and type keys: %s" % item)
+        if item['type'] not in RECORD_TYPES:
+            module.fail_json(msg="invalid record type %s, must be one of: %s" % (item['type'], ', '.join(RECORD_TYPES)))
+        item.setdefault('state', module.params['state'])
+        if item['state'] not in ('present', 'absent'):
+            module.fail_json(msg="'%s' is an unknown value for the state of record %s" % (item['state'], item['name']))
+        if item['state'] == 'present' and 'value' not in item:
+            module.fail_json(msg="record %s %s must have a value to be present" % (item['name'], item['type']))
+        try:
+            item['ttl'] = int(item.get('ttl', module.params['record_ttl']))
+        except ValueError:
+            module.fail_json(msg="the ttl of record %s %s must be an integer" % (item['name'], item['type']))
+
+def diff_records(index, records):
+    """
+    Returns the records to create, update and delete so that the zone,
+    given as its (name, type) index, matches the records list. A record
+    kept or updated for a present item is never deleted for an absent one.
+    """
+    wanted = {}
+    absent = []
+    for item in records:
+        if item['state'] == 'present':
+            wanted.setdefault((item['name'], item['type']), []).append(item)
+        else:
+            absent.append(item)
+
+    create, update, delete = [], [], []
+    claimed = set()
+    for key, items in wanted.items():
+        current = list(index.get(key, []))
+
+        fields = ['ttl'] + RECORD_FIELDS.get(key[1], [])
+
+        # records which already have a wanted value only need their ttl
+        # and type specific fields checked
+        pending = []
+        for item in items:
+            matches = [r for r in current if str(r['value']) == str(item['value'])]
+            if matches:
+                current.remove(matches[0])
+                claimed.add(matches[0]['id'])
+                changes = dict([(field, item[field]) for field in fields
+                                if field in item and str(matches[0].get(field)) != str(item[field])])
+                if changes:
+                    update.append(dict(matches[0], **changes))
+            else:
+                pending.append(item)
+
+        # the other records of that name and type take the new values, what
+        # is left over is created or deleted. Records with type specific
+        # fields are not reused, they would keep the fields of the old value
+        for item in pending:
+            record = {'name': item['name'], 'type': item['type'], 'value': item['value']}
+            record.update([(field, item[field]) for field in fields if field in item])
+            if current and key[1] not in RECORD_FIELDS:
+                claimed.add(current[0]['id'])
+                update.append(dict(current.pop(0), **record))
+            else:
+                create.append(record)
+        delete.extend(current)
+
+    for item in absent:
+        for record in index.get((item['name'], item['type']), []):
+            if 'value' in item and str(record['value']) != str(item['value']):
+                continue
+            if record['id'] not in claimed and record not in delete:
+                delete.append(record)
+
+    return create, update, delete
+
+def sync_records(module, DME):
+    records = module.params["records"]
+    validate_records(module, records)
+
+    create, update, delete = diff_records(DME.getRecordIndex(), records)
+
+    # deletions go first so a name can change type, e.g. from A to CNAME
+    if delete:
+        DME.deleteRecords([record['id'] for record in delete])
+    if update:
+        DME.updateRecords(DME.prepareRecord(update))
+    if create:
+        created = DME.createRecords(DME.prepareRecord(create))
+        if isinstance(created, list):
+            create = created
+
+    module.exit_json(changed=bool(create or update or delete),
+                     created=create, updated=update, deleted=delete)
+
 
 # ===========================================
 # Module execution.
@@ -248,11 +404,15 @@ def main():
                              'A', 'AAAA', 'CNAME', 'HTTPRED', 'MX', 'NS', 'PTR', 'SRV', 'TXT']),
             record_value=dict(required=False),
             record_ttl=dict(required=False, default=1800, type='int'),
+            records=dict(required=False, type='list'),
             validate_certs = dict(default='yes', type='bool'),
         ),
         required_together=(
             ['record_value', 'record_ttl', 'record_type']
-        )
+        ),
+        mutually_exclusive=[
+            ['records', 'record_name'], ['records', 'record_value'], ['records', 'record_type']
+        ]
     )
 
     if IMPORT_ERROR:
@@ -263,6 +423,9 @@ def main():
     state = module.params["state"]
     record_name = module.params["record_name"]
 
+    if module.params["records"] is not None:
+        sync_records(module, DME)
+
     # Follow Keyword Controlled Behavior
     if not record_name:
         domain_records = DME.getRecords()
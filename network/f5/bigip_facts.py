@@ -64,6 +64,39 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: 2.0
+    cache_dir:
+        description:
+            - Local directory used to cache the iControl WSDLs between runs
+              and, with I(reuse_session), the iControl session id. Nothing is
+              cached when unset.
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
+    reuse_session:
+        description:
+            - If C(yes), persist the iControl session id for this server and
+              user in I(cache_dir) and reuse it in later runs until it
+              expires. A cached session id the device no longer accepts
+              is replaced with a new one. Requires I(cache_dir). Parallel
+              workers started by I(max_workers) always use their own new
+              sessions.
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        aliases: []
+        version_added: 2.1
+    session_timeout:
+        description:
+            - Number of seconds a persisted session id may stay idle before
+              a new one is requested. Keep this below the session timeout
+              configured on the BIG-IP.
+        required: false
+        default: 300
+        choices: []
+        aliases: []
+        version_added: 2.1
     session:
         description:
             - BIG-IP session support; may be useful to avoid concurrency
@@ -86,10 +119,91 @@ options:
         description:
             - Shell-style glob matching string used to filter fact keys. Not
               applicable for software and system_info fact categories.
+            - When the filter starts with a literal folder path, for example
+              C(/Tenant1/web*), object lists are only read from that folder
+              and its subfolders.
         required: false
         default: null
         choices: []
         aliases: []
+    max_workers:
+        description:
+            - Maximum number of fact categories to collect in parallel. Each
+              worker uses its own iControl session, so this also bounds the
+              number of concurrent sessions opened against the device.
+        required: false
+        default: 1
+        choices: []
+        aliases: []
+        version_added: 2.1
+    chunk_size:
+        description:
+            - Maximum number of object names sent in a single multi-object
+              getter request. Larger categories are fetched in several
+              chunks. C(0) sends all names in one request.
+        required: false
+        default: 1000
+        choices: []
+        aliases: []
+        version_added: 2.1
+    report_round_trips:
+        description:
+            - If C(yes), return the number of iControl requests made as
+              C(round_trips) and the methods rejected by the device as
+              C(unsupported_methods).
+        required: false
+        default: false
+        choices: []
+        aliases: []
+        version_added: 2.1
+    cache_path:
+        description:
+            - Directory used to cache collected facts between runs. Entries
+              are keyed by server, user, category, filter and fields, and
+              are discarded once older than their TTL or when the device
+              configuration commit id changes. Caching is disabled when unset.
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
+    cache_ttl:
+        description:
+            - Dictionary of fact category to cache lifetime in seconds. The
+              C(default) key applies to categories not listed. Defaults to
+              3600 seconds for certificate, client_ssl_profile, key, rule and
+              software and 300 seconds for everything else.
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
+    fields:
+        description:
+            - List of fields to collect for each object, for example
+              C(description,lb_method,member). Fields that do not apply to an
+              included category are ignored, but names that match none of the
+              included categories are an error. Not applicable for certificate,
+              key, software and system_info fact categories. All fields are
+              collected when unset.
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
+    dest:
+        description:
+            - Write the collected facts to this local file instead of
+              returning them. The file holds one JSON document per line, each
+              with C(category) and C(facts) keys, and categories are written
+              as soon as they are collected. The module then only returns
+              C(dest) and the number of objects per category in
+              C(categories).
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
 '''
 
 EXAMPLES = '''
@@ -109,6 +223,46 @@ EXAMPLES = '''
       password=mysecret
       include=interface,vlan
 
+  - name: Collect BIG-IP LTM facts using four parallel sessions
+    local_action: >
+      bigip_facts
+      server=lb.mydomain.com
+      user=admin
+      password=mysecret
+      include=pool,virtual_server,node,virtual_address
+      max_workers=4
+
+  - name: Collect pool members and LB methods for one partition only
+    local_action: >
+      bigip_facts
+      server=lb.mydomain.com
+      user=admin
+      password=mysecret
+      include=pool
+      filter=/Tenant1/*
+      fields=lb_method,member
+
+  - name: Dump a full BIG-IP inventory to a JSON lines file
+    local_action: >
+      bigip_facts
+      server=lb.mydomain.com
+      user=admin
+      password=mysecret
+      include=pool,virtual_server,node,virtual_address,rule
+      dest=/var/tmp/lb.mydomain.com.jsonl
+
+  - name: Collect rarely changing BIG-IP facts through a local cache
+    local_action:
+      module: bigip_facts
+      server: lb.mydomain.com
+      user: admin
+      password: mysecret
+      include: certificate,key,client_ssl_profile,rule
+      cache_path: ~/.ansible/bigip_facts_cache
+      cache_ttl:
+        default: 600
+        certificate: 86400
+
 '''
 
 try:
@@ -122,6 +276,16 @@ else:
 import fnmatch
 import traceback
 import re
+import os
+import tempfile
+import time
+import threading
+import Queue
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
 
 # ===========================================
 # bigip_facts module specific support methods.
@@ -133,16 +297,32 @@ class F5(object):
     F5 BIG-IP iControl API class.
 
     Attributes:
-        api: iControl API instance.
+        bigip: Underlying bigsuds BIGIP instance.
+        api: iControl API instance wrapped in a batching layer.
+        stats: Shared FetchStats instance.
+        chunk_size: Maximum number of objects sent per getter request.
+        folder: Folder object lists are read from, recursively.
+        fields: List of fields to collect, or None for all fields.
     """
 
-    def __init__(self, host, user, password, session=False):
-        self.api = bigsuds.BIGIP(hostname=host, username=user, password=password)
-        if session:
+    def __init__(self, host, user, password, session=False, stats=None,
+                 chunk_size=0, folder="/", fields=None, cache_dir=None,
+                 reuse_session=False, session_timeout=300):
+        self.bigip = bigip_api(host, user, password, cache_dir,
+                               reuse_session, session_timeout)
+        if stats is None:
+            stats = FetchStats()
+        self.stats = stats
+        self.chunk_size = chunk_size
+        self.folder = folder
+        self.fields = fields
+        self.api = BatchedAPI(self.bigip, self.stats, self.chunk_size)
+        if session and not reuse_session:
             self.start_session()
 
     def start_session(self):
-        self.api = self.api.with_session_id()
+        self.bigip = self.bigip.with_session_id()
+        self.api = BatchedAPI(self.bigip, self.stats, self.chunk_size)
 
     def get_api(self):
         return self.api
@@ -166,6 +346,222 @@ class F5(object):
         return self.api.System.Session.get_active_folder()
 
 
+class FetchStats(object):
+    """iControl request bookkeeping shared by all sessions of a run.
+
+    Attributes:
+        round_trips: Number of SOAP requests sent to the device.
+        unsupported: Set of methods the device rejected with MethodNotFound.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.round_trips = 0
+        self.unsupported = set()
+
+    def add_round_trip(self):
+        self.lock.acquire()
+        try:
+            self.round_trips += 1
+        finally:
+            self.lock.release()
+
+    def mark_unsupported(self, method):
+        self.lock.acquire()
+        try:
+            self.unsupported.add(method)
+        finally:
+            self.lock.release()
+
+    def is_unsupported(self, method):
+        return method in self.unsupported
+
+
+class BatchedAPI(object):
+    """Batching proxy over a bigsuds BIGIP instance.
+
+    Method lookups are deferred until the call so that rejected methods can
+    be answered locally. Getters taking a single object name list, either
+    positionally or by keyword, are split into chunk_size sized requests and
+    their responses concatenated.
+
+    Attributes:
+        bigip: Underlying bigsuds BIGIP instance.
+        stats: Shared FetchStats instance.
+        chunk_size: Maximum number of objects per getter request; 0 disables
+          chunking.
+        path: Tuple of namespace, interface and method names.
+    """
+
+    def __init__(self, bigip, stats, chunk_size=0, path=()):
+        self.bigip = bigip
+        self.stats = stats
+        self.chunk_size = chunk_size
+        self.path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BatchedAPI(self.bigip, self.stats, self.chunk_size,
+                          self.path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        method_name = '.'.join(self.path)
+        if self.stats.is_unsupported(method_name):
+            raise MethodNotFound(method_name)
+        try:
+            method = self.bigip
+            for name in self.path:
+                method = getattr(method, name)
+            if len(args) + len(kwargs) == 1:
+                if args:
+                    names = args[0]
+                    keyword = None
+                else:
+                    keyword, names = kwargs.items()[0]
+                if self.chunk_size and isinstance(names, list) and \
+                   len(names) > self.chunk_size and \
+                   self.path[-1].startswith(('get_', 'is_')):
+                    result = []
+                    for i in range(0, len(names), self.chunk_size):
+                        chunk = names[i:i + self.chunk_size]
+                        self.stats.add_round_trip()
+                        if keyword:
+                            result.extend(method(**{keyword: chunk}))
+                        else:
+                            result.extend(method(chunk))
+                    return result
+            self.stats.add_round_trip()
+            return method(*args, **kwargs)
+        except MethodNotFound:
+            self.stats.mark_unsupported(method_name)
+            raise
+
+
+class FactCache(object):
+    """On-disk fact cache.
+
+    Each category is stored in its own JSON file keyed by server, user,
+    category, filter and selected fields. An entry is reused while it is younger than the category TTL
+    and, when the device reports one, while its configuration version is
+    unchanged.
+
+    Attributes:
+        path: Directory holding the cache files.
+        server: BIG-IP host the facts belong to.
+        user: BIG-IP user the facts were collected as.
+        fact_filter: Filter string the facts were collected with.
+        fields: List of fields the facts were collected with, or None.
+        ttls: Dictionary of category to TTL in seconds.
+    """
+
+    def __init__(self, path, server, user, fact_filter, fields, ttls):
+        self.path = os.path.expanduser(path)
+        self.server = server
+        self.user = user
+        self.fact_filter = fact_filter or ''
+        self.fields = ','.join(sorted(fields or []))
+        self.ttls = ttls
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, 0700)
+
+    def get_ttl(self, category):
+        return self.ttls.get(category, self.ttls['default'])
+
+    def get_file(self, category):
+        key = "%s|%s|%s|%s|%s" % (self.server, self.user, category,
+                                   self.fact_filter, self.fields)
+        digest = hashlib.sha1(key).hexdigest()
+        return os.path.join(self.path, "bigip_facts_%s.json" % digest)
+
+    def load(self, category, config_version):
+        try:
+            f = open(self.get_file(category))
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return None
+        if time.time() - entry.get('timestamp', 0) > self.get_ttl(category):
+            return None
+        if config_version is not None and \
+           entry.get('config_version') != config_version:
+            return None
+        return entry.get('facts')
+
+    def store(self, category, config_version, facts):
+        entry = {'timestamp': time.time(), 'config_version': config_version,
+                 'facts': facts}
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        try:
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(entry, f)
+            finally:
+                f.close()
+            os.rename(tmp, self.get_file(category))
+        except:
+            os.unlink(tmp)
+            raise
+
+
+class FactWriter(object):
+    """JSON lines fact writer.
+
+    Writes one line per category as soon as it has been collected, so only
+    the category currently being collected is held in memory. Output goes to
+    a temporary file that replaces dest on close.
+
+    Attributes:
+        dest: Path of the JSON lines file.
+        counts: Dictionary of category to number of objects written.
+    """
+
+    def __init__(self, dest):
+        self.dest = os.path.expanduser(dest)
+        self.counts = {}
+        self.lock = threading.Lock()
+        dest_dir = os.path.dirname(os.path.abspath(self.dest))
+        fd, self.tmp = tempfile.mkstemp(dir=dest_dir)
+        self.f = os.fdopen(fd, 'w')
+
+    def add(self, category, facts):
+        line = json.dumps({'category': category, 'facts': facts})
+        self.lock.acquire()
+        try:
+            self.f.write(line + "\n")
+            self.counts[category] = len(facts)
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.f.close()
+        os.rename(self.tmp, self.dest)
+
+    def abort(self):
+        """Drops the temporary file, leaving dest untouched."""
+        self.f.close()
+        try:
+            os.unlink(self.tmp)
+        except OSError:
+            pass
+
+
+class F5WorkerError(Exception):
+    """Raised when a parallel fact collection worker fails.
+
+    Attributes:
+        error: The original exception raised in the worker thread.
+        worker_traceback: Formatted traceback from the worker thread.
+    """
+
+    def __init__(self, error, worker_traceback):
+        Exception.__init__(self, str(error))
+        self.error = error
+        self.worker_traceback = worker_traceback
+
+
 class Interfaces(object):
     """Interfaces class.
 
@@ -1363,12 +1759,23 @@ class SystemInfo(object):
     def get_uptime(self):
         return self.api.System.SystemInfo.get_uptime()
 
+    def get_config_version(self):
+        local_device = self.api.Management.Device.get_local_device()
+        return self.api.Management.Device.get_commit_id([local_device])[0]
 
-def generate_dict(api_obj, fields):
+
+def select_fields(fields, selected):
+    if selected is None:
+        return fields
+    return [field for field in fields if field in selected]
+
+def generate_dict(api_obj, fields, selected=None):
+    fields = select_fields(fields, selected)
     result_dict = {}
     lists = []
     supported_fields = []
-    if api_obj.get_list():
+    names = api_obj.get_list()
+    if names:
         for field in fields:
             try:
                 api_response = getattr(api_obj, "get_" + field)()
@@ -1377,13 +1784,14 @@ def generate_dict(api_obj, fields):
             else:
                 lists.append(api_response)
                 supported_fields.append(field)
-        for i, j in enumerate(api_obj.get_list()):
+        for i, j in enumerate(names):
             temp = {}
             temp.update([(item[0], item[1][i]) for item in zip(supported_fields, lists)])
             result_dict[j] = temp
     return result_dict
 
-def generate_simple_dict(api_obj, fields):
+def generate_simple_dict(api_obj, fields, selected=None):
+    fields = select_fields(fields, selected)
     result_dict = {}
     for field in fields:
         try:
@@ -1394,137 +1802,159 @@ def generate_simple_dict(api_obj, fields):
             result_dict[field] = api_response
     return result_dict
 
+FACT_FIELDS = {
+    'address_class': ['address_class', 'description'],
+    'client_ssl_profile': ['alert_timeout', 'allow_nonssl_state', 'authenticate_depth',
+                           'authenticate_once_state', 'ca_file', 'cache_size',
+                           'cache_timeout', 'certificate_file', 'chain_file',
+                           'cipher_list', 'client_certificate_ca_file', 'crl_file',
+                           'default_profile', 'description',
+                           'forward_proxy_ca_certificate_file', 'forward_proxy_ca_key_file',
+                           'forward_proxy_ca_passphrase',
+                           'forward_proxy_certificate_extension_include',
+                           'forward_proxy_certificate_lifespan',
+                           'forward_proxy_enabled_state',
+                           'forward_proxy_lookup_by_ipaddr_port_state', 'handshake_timeout',
+                           'key_file', 'modssl_emulation_state', 'passphrase',
+                           'peer_certification_mode', 'profile_mode',
+                           'renegotiation_maximum_record_delay', 'renegotiation_period',
+                           'renegotiation_state', 'renegotiation_throughput',
+                           'retain_certificate_state', 'secure_renegotiation_mode',
+                           'server_name', 'session_ticket_state', 'sni_default_state',
+                           'sni_require_state', 'ssl_option', 'strict_resume_state',
+                           'unclean_shutdown_state', 'is_base_profile', 'is_system_profile'],
+    'device': ['active_modules', 'base_mac_address', 'blade_addresses',
+               'build', 'chassis_id', 'chassis_type', 'comment',
+               'configsync_address', 'contact', 'description', 'edition',
+               'failover_state', 'hostname', 'inactive_modules', 'location',
+               'management_address', 'marketing_name', 'multicast_address',
+               'optional_modules', 'platform_id', 'primary_mirror_address',
+               'product', 'secondary_mirror_address', 'software_version',
+               'timelimited_modules', 'timezone', 'unicast_addresses'],
+    'device_group': ['all_preferred_active', 'autosync_enabled_state','description',
+                     'device', 'full_load_on_sync_state',
+                     'incremental_config_sync_size_maximum',
+                     'network_failover_enabled_state', 'sync_status', 'type'],
+    'interface': ['active_media', 'actual_flow_control', 'bundle_state',
+                  'description', 'dual_media_state', 'enabled_state', 'if_index',
+                  'learning_mode', 'lldp_admin_status', 'lldp_tlvmap',
+                  'mac_address', 'media', 'media_option', 'media_option_sfp',
+                  'media_sfp', 'media_speed', 'media_status', 'mtu',
+                  'phy_master_slave_mode', 'prefer_sfp_state', 'flow_control',
+                  'sflow_poll_interval', 'sflow_poll_interval_global',
+                  'sfp_media_state', 'stp_active_edge_port_state',
+                  'stp_enabled_state', 'stp_link_type',
+                  'stp_protocol_detection_reset_state'],
+    'node': ['address', 'connection_limit', 'description', 'dynamic_ratio',
+             'monitor_instance', 'monitor_rule', 'monitor_status',
+             'object_status', 'rate_limit', 'ratio', 'session_status'],
+    'pool': ['action_on_service_down', 'active_member_count',
+             'aggregate_dynamic_ratio', 'allow_nat_state',
+             'allow_snat_state', 'client_ip_tos', 'client_link_qos',
+             'description', 'gateway_failsafe_device',
+             'ignore_persisted_weight_state', 'lb_method', 'member',
+             'minimum_active_member', 'minimum_up_member',
+             'minimum_up_member_action', 'minimum_up_member_enabled_state',
+             'monitor_association', 'monitor_instance', 'object_status',
+             'profile', 'queue_depth_limit',
+             'queue_on_connection_limit_state', 'queue_time_limit',
+             'reselect_tries', 'server_ip_tos', 'server_link_qos',
+             'simple_timeout', 'slow_ramp_time'],
+    'rule': ['definition', 'description', 'ignore_vertification',
+             'verification_status'],
+    'self_ip': ['address', 'allow_access_list', 'description',
+                'enforced_firewall_policy', 'floating_state', 'fw_rule',
+                'netmask', 'staged_firewall_policy', 'traffic_group',
+                'vlan', 'is_traffic_group_inherited'],
+    'traffic_group': ['auto_failback_enabled_state', 'auto_failback_time',
+                      'default_device', 'description', 'ha_load_factor',
+                      'ha_order', 'is_floating', 'mac_masquerade_address',
+                      'unit_id'],
+    'trunk': ['active_lacp_state', 'configured_member_count', 'description',
+              'distribution_hash_option', 'interface', 'lacp_enabled_state',
+              'lacp_timeout_option', 'link_selection_policy', 'media_speed',
+              'media_status', 'operational_member_count', 'stp_enabled_state',
+              'stp_protocol_detection_reset_state'],
+    'virtual_address': ['address', 'arp_state', 'auto_delete_state', 'connection_limit',
+                        'description', 'enabled_state', 'icmp_echo_state',
+                        'is_floating_state', 'netmask', 'object_status',
+                        'route_advertisement_state', 'traffic_group'],
+    'virtual_server': ['actual_hardware_acceleration', 'authentication_profile',
+                       'auto_lasthop', 'bw_controller_policy', 'clone_pool',
+                       'cmp_enable_mode', 'connection_limit', 'connection_mirror_state',
+                       'default_pool_name', 'description', 'destination',
+                       'enabled_state', 'enforced_firewall_policy',
+                       'fallback_persistence_profile', 'fw_rule', 'gtm_score',
+                       'last_hop_pool', 'nat64_state', 'object_status',
+                       'persistence_profile', 'profile', 'protocol',
+                       'rate_class', 'rate_limit', 'rate_limit_destination_mask',
+                       'rate_limit_mode', 'rate_limit_source_mask', 'related_rule',
+                       'rule', 'security_log_profile', 'snat_pool', 'snat_type',
+                       'source_address', 'source_address_translation_lsn_pool',
+                       'source_address_translation_snat_pool',
+                       'source_address_translation_type', 'source_port_behavior',
+                       'staged_firewall_policy', 'translate_address_state',
+                       'translate_port_state', 'type', 'vlan', 'wildmask'],
+    'vlan': ['auto_lasthop', 'cmp_hash_algorithm', 'description',
+             'dynamic_forwarding', 'failsafe_action', 'failsafe_state',
+             'failsafe_timeout', 'if_index', 'learning_mode',
+             'mac_masquerade_address', 'member', 'mtu',
+             'sflow_poll_interval', 'sflow_poll_interval_global',
+             'sflow_sampling_rate', 'sflow_sampling_rate_global',
+             'source_check_state', 'true_mac_address', 'vlan_id'],
+}
+
 def generate_interface_dict(f5, regex):
     interfaces = Interfaces(f5.get_api(), regex)
-    fields = ['active_media', 'actual_flow_control', 'bundle_state',
-              'description', 'dual_media_state', 'enabled_state', 'if_index',
-              'learning_mode', 'lldp_admin_status', 'lldp_tlvmap',
-              'mac_address', 'media', 'media_option', 'media_option_sfp',
-              'media_sfp', 'media_speed', 'media_status', 'mtu',
-              'phy_master_slave_mode', 'prefer_sfp_state', 'flow_control',
-              'sflow_poll_interval', 'sflow_poll_interval_global',
-              'sfp_media_state', 'stp_active_edge_port_state',
-              'stp_enabled_state', 'stp_link_type',
-              'stp_protocol_detection_reset_state']
-    return generate_dict(interfaces, fields)
+    return generate_dict(interfaces, FACT_FIELDS['interface'], f5.fields)
 
 def generate_self_ip_dict(f5, regex):
     self_ips = SelfIPs(f5.get_api(), regex)
-    fields = ['address', 'allow_access_list', 'description',
-              'enforced_firewall_policy', 'floating_state', 'fw_rule',
-              'netmask', 'staged_firewall_policy', 'traffic_group',
-              'vlan', 'is_traffic_group_inherited']
-    return generate_dict(self_ips, fields)
+    return generate_dict(self_ips, FACT_FIELDS['self_ip'], f5.fields)
 
 def generate_trunk_dict(f5, regex):
     trunks = Trunks(f5.get_api(), regex)
-    fields = ['active_lacp_state', 'configured_member_count', 'description',
-              'distribution_hash_option', 'interface', 'lacp_enabled_state',
-              'lacp_timeout_option', 'link_selection_policy', 'media_speed',
-              'media_status', 'operational_member_count', 'stp_enabled_state',
-              'stp_protocol_detection_reset_state']
-    return generate_dict(trunks, fields)
+    return generate_dict(trunks, FACT_FIELDS['trunk'], f5.fields)
 
 def generate_vlan_dict(f5, regex):
     vlans = Vlans(f5.get_api(), regex)
-    fields = ['auto_lasthop', 'cmp_hash_algorithm', 'description',
-              'dynamic_forwarding', 'failsafe_action', 'failsafe_state',
-              'failsafe_timeout', 'if_index', 'learning_mode',
-              'mac_masquerade_address', 'member', 'mtu',
-              'sflow_poll_interval', 'sflow_poll_interval_global',
-              'sflow_sampling_rate', 'sflow_sampling_rate_global',
-              'source_check_state', 'true_mac_address', 'vlan_id']
-    return generate_dict(vlans, fields)
+    return generate_dict(vlans, FACT_FIELDS['vlan'], f5.fields)
 
 def generate_vs_dict(f5, regex):
     virtual_servers = VirtualServers(f5.get_api(), regex)
-    fields = ['actual_hardware_acceleration', 'authentication_profile',
-              'auto_lasthop', 'bw_controller_policy', 'clone_pool',
-              'cmp_enable_mode', 'connection_limit', 'connection_mirror_state',
-              'default_pool_name', 'description', 'destination',
-              'enabled_state', 'enforced_firewall_policy',
-              'fallback_persistence_profile', 'fw_rule', 'gtm_score',
-              'last_hop_pool', 'nat64_state', 'object_status',
-              'persistence_profile', 'profile', 'protocol',
-              'rate_class', 'rate_limit', 'rate_limit_destination_mask',
-              'rate_limit_mode', 'rate_limit_source_mask', 'related_rule',
-              'rule', 'security_log_profile', 'snat_pool', 'snat_type',
-              'source_address', 'source_address_translation_lsn_pool',
-              'source_address_translation_snat_pool',
-              'source_address_translation_type', 'source_port_behavior',
-              'staged_firewall_policy', 'translate_address_state',
-              'translate_port_state', 'type', 'vlan', 'wildmask']
-    return generate_dict(virtual_servers, fields)
+    return generate_dict(virtual_servers, FACT_FIELDS['virtual_server'], f5.fields)
 
 def generate_pool_dict(f5, regex):
     pools = Pools(f5.get_api(), regex)
-    fields = ['action_on_service_down', 'active_member_count',
-              'aggregate_dynamic_ratio', 'allow_nat_state',
-              'allow_snat_state', 'client_ip_tos', 'client_link_qos',
-              'description', 'gateway_failsafe_device',
-              'ignore_persisted_weight_state', 'lb_method', 'member',
-              'minimum_active_member', 'minimum_up_member',
-              'minimum_up_member_action', 'minimum_up_member_enabled_state',
-              'monitor_association', 'monitor_instance', 'object_status',
-              'profile', 'queue_depth_limit',
-              'queue_on_connection_limit_state', 'queue_time_limit',
-              'reselect_tries', 'server_ip_tos', 'server_link_qos',
-              'simple_timeout', 'slow_ramp_time']
-    return generate_dict(pools, fields)
+    return generate_dict(pools, FACT_FIELDS['pool'], f5.fields)
 
 def generate_device_dict(f5, regex):
     devices = Devices(f5.get_api(), regex)
-    fields = ['active_modules', 'base_mac_address', 'blade_addresses',
-              'build', 'chassis_id', 'chassis_type', 'comment',
-              'configsync_address', 'contact', 'description', 'edition',
-              'failover_state', 'hostname', 'inactive_modules', 'location',
-              'management_address', 'marketing_name', 'multicast_address',
-              'optional_modules', 'platform_id', 'primary_mirror_address',
-              'product', 'secondary_mirror_address', 'software_version',
-              'timelimited_modules', 'timezone', 'unicast_addresses']
-    return generate_dict(devices, fields)
+    return generate_dict(devices, FACT_FIELDS['device'], f5.fields)
 
 def generate_device_group_dict(f5, regex):
     device_groups = DeviceGroups(f5.get_api(), regex)
-    fields = ['all_preferred_active', 'autosync_enabled_state','description',
-              'device', 'full_load_on_sync_state',
-              'incremental_config_sync_size_maximum',
-              'network_failover_enabled_state', 'sync_status', 'type']
-    return generate_dict(device_groups, fields)
+    return generate_dict(device_groups, FACT_FIELDS['device_group'], f5.fields)
 
 def generate_traffic_group_dict(f5, regex):
     traffic_groups = TrafficGroups(f5.get_api(), regex)
-    fields = ['auto_failback_enabled_state', 'auto_failback_time',
-              'default_device', 'description', 'ha_load_factor',
-              'ha_order', 'is_floating', 'mac_masquerade_address',
-              'unit_id']
-    return generate_dict(traffic_groups, fields)
+    return generate_dict(traffic_groups, FACT_FIELDS['traffic_group'], f5.fields)
 
 def generate_rule_dict(f5, regex):
     rules = Rules(f5.get_api(), regex)
-    fields = ['definition', 'description', 'ignore_vertification',
-              'verification_status']
-    return generate_dict(rules, fields)
+    return generate_dict(rules, FACT_FIELDS['rule'], f5.fields)
 
 def generate_node_dict(f5, regex):
     nodes = Nodes(f5.get_api(), regex)
-    fields = ['address', 'connection_limit', 'description', 'dynamic_ratio',
-              'monitor_instance', 'monitor_rule', 'monitor_status',
-              'object_status', 'rate_limit', 'ratio', 'session_status']
-    return generate_dict(nodes, fields)
+    return generate_dict(nodes, FACT_FIELDS['node'], f5.fields)
 
 def generate_virtual_address_dict(f5, regex):
     virtual_addresses = VirtualAddresses(f5.get_api(), regex)
-    fields = ['address', 'arp_state', 'auto_delete_state', 'connection_limit',
-              'description', 'enabled_state', 'icmp_echo_state',
-              'is_floating_state', 'netmask', 'object_status',
-              'route_advertisement_state', 'traffic_group']
-    return generate_dict(virtual_addresses, fields)
+    return generate_dict(virtual_addresses, FACT_FIELDS['virtual_address'], f5.fields)
 
 def generate_address_class_dict(f5, regex):
     address_classes = AddressClasses(f5.get_api(), regex)
-    fields = ['address_class', 'description']
-    return generate_dict(address_classes, fields)
+    return generate_dict(address_classes, FACT_FIELDS['address_class'], f5.fields)
 
 def generate_certificate_dict(f5, regex):
     certificates = Certificates(f5.get_api(), regex)
@@ -1536,26 +1966,7 @@ def generate_key_dict(f5, regex):
 
 def generate_client_ssl_profile_dict(f5, regex):
     profiles = ProfileClientSSL(f5.get_api(), regex)
-    fields = ['alert_timeout', 'allow_nonssl_state', 'authenticate_depth',
-              'authenticate_once_state', 'ca_file', 'cache_size',
-              'cache_timeout', 'certificate_file', 'chain_file',
-              'cipher_list', 'client_certificate_ca_file', 'crl_file',
-              'default_profile', 'description',
-              'forward_proxy_ca_certificate_file', 'forward_proxy_ca_key_file',
-              'forward_proxy_ca_passphrase',
-              'forward_proxy_certificate_extension_include',
-              'forward_proxy_certificate_lifespan',
-              'forward_proxy_enabled_state',
-              'forward_proxy_lookup_by_ipaddr_port_state', 'handshake_timeout',
-              'key_file', 'modssl_emulation_state', 'passphrase',
-              'peer_certification_mode', 'profile_mode',
-              'renegotiation_maximum_record_delay', 'renegotiation_period',
-              'renegotiation_state', 'renegotiation_throughput',
-              'retain_certificate_state', 'secure_renegotiation_mode',
-              'server_name', 'session_ticket_state', 'sni_default_state',
-              'sni_require_state', 'ssl_option', 'strict_resume_state',
-              'unclean_shutdown_state', 'is_base_profile', 'is_system_profile']
-    return generate_dict(profiles, fields)
+    return generate_dict(profiles, FACT_FIELDS['client_ssl_profile'], f5.fields)
 
 def generate_system_info_dict(f5):
     system_info = SystemInfo(f5.get_api())
@@ -1574,6 +1985,285 @@ def generate_software_list(f5):
     software_list = software.get_all_software_status()
     return software_list
 
+DEFAULT_CACHE_TTL = {
+    'default': 300,
+    'certificate': 3600,
+    'client_ssl_profile': 3600,
+    'key': 3600,
+    'rule': 3600,
+    'software': 3600,
+}
+
+FACT_GENERATORS = {
+    'address_class': generate_address_class_dict,
+    'certificate': generate_certificate_dict,
+    'client_ssl_profile': generate_client_ssl_profile_dict,
+    'device': generate_device_dict,
+    'device_group': generate_device_group_dict,
+    'interface': generate_interface_dict,
+    'key': generate_key_dict,
+    'node': generate_node_dict,
+    'pool': generate_pool_dict,
+    'rule': generate_rule_dict,
+    'self_ip': generate_self_ip_dict,
+    'traffic_group': generate_traffic_group_dict,
+    'trunk': generate_trunk_dict,
+    'virtual_address': generate_virtual_address_dict,
+    'virtual_server': generate_vs_dict,
+    'vlan': generate_vlan_dict,
+}
+
+def generate_facts(f5, category, regex):
+    if category == 'software':
+        return generate_software_list(f5)
+    if category == 'system_info':
+        return generate_system_info_dict(f5)
+    return FACT_GENERATORS[category](f5, regex)
+
+def get_filter_folder(fact_filter):
+    """Return the literal folder prefix of an absolute filter glob.
+
+    For example '/Tenant1/web*' yields '/Tenant1', so listing can be pushed
+    down to that folder instead of downloading every object on the device.
+    """
+    if not fact_filter or not fact_filter.startswith('/'):
+        return '/'
+    literal = re.split(r'[*?\[]', fact_filter, 1)[0]
+    return literal[:literal.rfind('/')] or '/'
+
+def save_session_state(f5):
+    saved_active_folder = f5.get_active_folder()
+    saved_recursive_query_state = f5.get_recursive_query_state()
+    active_folder = saved_active_folder
+    if saved_active_folder != f5.folder:
+        try:
+            f5.set_active_folder(f5.folder)
+            active_folder = f5.folder
+        except WebFault:
+            # folder does not exist; fall back to listing from the root
+            if saved_active_folder != "/":
+                f5.set_active_folder("/")
+                active_folder = "/"
+    if saved_recursive_query_state != "STATE_ENABLED":
+        f5.enable_recursive_query_state()
+    return (saved_active_folder, saved_recursive_query_state, active_folder)
+
+def restore_session_state(f5, saved_state):
+    saved_active_folder, saved_recursive_query_state, active_folder = saved_state
+    if saved_active_folder and saved_active_folder != active_folder:
+        f5.set_active_folder(saved_active_folder)
+    if saved_recursive_query_state and \
+       saved_recursive_query_state != "STATE_ENABLED":
+        f5.set_recursive_query_state(saved_recursive_query_state)
+
+def get_config_version(f5):
+    """Return an opaque configuration version, or None if unsupported."""
+    try:
+        version = SystemInfo(f5.get_api()).get_config_version()
+    except (MethodNotFound, WebFault):
+        return None
+    return json.dumps(version, sort_keys=True, default=str)
+
+def collect_cached_facts(f5_args, include, regex, max_workers, cache, store):
+    """Collect facts, reusing still valid cache entries."""
+    f5 = F5(**dict(f5_args, session=False))
+    config_version = get_config_version(f5)
+    missing = []
+    for category in include:
+        cached = cache.load(category, config_version)
+        if cached is None:
+            missing.append(category)
+        else:
+            store(category, cached)
+
+    def store_and_cache(category, value):
+        cache.store(category, config_version, value)
+        store(category, value)
+
+    if missing:
+        collect_all_facts(f5_args, missing, regex, max_workers,
+                          store_and_cache)
+
+def collect_all_facts(f5_args, include, regex, max_workers, store):
+    if max_workers > 1 and len(include) > 1:
+        collect_facts_parallel(f5_args, include, regex, max_workers, store)
+    else:
+        collect_facts(f5_args, include, regex, store)
+
+def collect_facts(f5_args, include, regex, store):
+    f5 = F5(**f5_args)
+    saved_state = save_session_state(f5)
+    try:
+        for category in include:
+            store(category, generate_facts(f5, category, regex))
+    finally:
+        restore_session_state(f5, saved_state)
+
+def collect_facts_parallel(f5_args, include, regex, max_workers, store):
+    """Collect fact categories using a bounded pool of worker threads.
+
+    Active folder and recursive query state are per iControl session, so
+    every worker opens its own session and saves/restores that state once
+    before pulling categories off the shared queue. store must be safe to
+    call from several threads.
+    """
+    errors = []
+    worker_args = dict(f5_args, session=True, reuse_session=False)
+    work = Queue.Queue()
+    for category in include:
+        work.put(category)
+
+    def worker():
+        try:
+            f5 = F5(**worker_args)
+            saved_state = save_session_state(f5)
+        except Exception, e:
+            errors.append((e, traceback.format_exc()))
+            return
+        try:
+            try:
+                while not errors:
+                    try:
+                        category = work.get_nowait()
+                    except Queue.Empty:
+                        break
+                    store(category, generate_facts(f5, category, regex))
+            except Exception, e:
+                errors.append((e, traceback.format_exc()))
+        finally:
+            try:
+                restore_session_state(f5, saved_state)
+            except Exception:
+                pass
+
+    workers = []
+    for i in range(min(max_workers, len(include))):
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        workers.append(t)
+    for t in workers:
+        t.join()
+
+    if errors:
+        raise F5WorkerError(*errors[0])
+
+# faults returned for a session id the device does not know (anymore)
+INVALID_SESSION_RE = re.compile(r'session.*(invalid|not found|expired)', re.I)
+
+def bigip_api(bigip, user, password, cache_dir=None, reuse_session=False, session_timeout=300):
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        wsdl_dir = os.path.join(cache_dir, 'wsdl')
+        if not os.path.isdir(wsdl_dir):
+            os.makedirs(wsdl_dir, 0700)
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password, cachedir=wsdl_dir)
+    else:
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if reuse_session:
+        api = BigIPCachedSession(SessionCache(api, bigip, user, cache_dir, session_timeout))
+    return api
+
+class SessionCache(object):
+    """iControl session id persisted per server and user in cache_dir.
+
+    A cached id is reused until it has been idle for session_timeout seconds.
+    As the device may have dropped it before that (reboot, shorter idle
+    timeout), the first call checks it: if the device rejects the session,
+    the entry is dropped and the call retried once with a new session id.
+    The expiry is pushed back after every successful call, so the id
+    expires session_timeout seconds after it was last used. The entry is
+    rewritten at most once a second, which keeps long runs cheap.
+    """
+
+    def __init__(self, api, bigip, user, cache_dir, session_timeout):
+        self.api = api
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.session_timeout = session_timeout
+        key = hashlib.sha1("%s|%s" % (bigip, user)).hexdigest()
+        self.path = os.path.join(self.cache_dir, "session_%s.json" % key)
+        self.checked = False
+        self.saved = 0
+        session_id = self.load()
+        self.cached = session_id is not None
+        if session_id is None:
+            session_id = api.System.Session.get_session_identifier()
+        self.session_id = session_id
+        self.session = api.with_session_id(session_id)
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time():
+                return entry['session_id']
+        except (IOError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self):
+        self.saved = time.time()
+        entry = {'session_id': self.session_id, 'expires': self.saved + self.session_timeout}
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(entry, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+
+    def drop(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def renew(self):
+        self.drop()
+        self.session_id = self.api.System.Session.get_session_identifier()
+        self.session = self.api.with_session_id(self.session_id)
+        self.cached = False
+
+    def call(self, path, args, kwargs):
+        try:
+            result = self.resolve(path)(*args, **kwargs)
+        except (bigsuds.ServerError, bigsuds.ConnectionError), e:
+            if self.checked or not self.cached or not INVALID_SESSION_RE.search(str(e)):
+                raise
+            # the request was refused, so it is safe to send it again
+            self.renew()
+            result = self.resolve(path)(*args, **kwargs)
+        self.checked = True
+        if time.time() - self.saved >= 1:
+            self.save()
+        return result
+
+    def resolve(self, path):
+        method = self.session
+        for name in path:
+            method = getattr(method, name)
+        return method
+
+class BigIPCachedSession(object):
+    """Stand-in for a bigsuds BIGIP instance running its calls through a
+    SessionCache, e.g. api.LocalLB.Pool.get_list().
+    """
+
+    def __init__(self, cache, path=()):
+        self._cache = cache
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BigIPCachedSession(self._cache, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._path, args, kwargs)
+
 def disable_ssl_cert_validation():
     # You probably only want to do this for testing and never in production.
     # From https://www.python.org/dev/peps/pep-0476/#id29
@@ -1588,9 +2278,19 @@ def main():
             user = dict(type='str', required=True),
             password = dict(type='str', required=True),
             validate_certs = dict(default='yes', type='bool'),
+            cache_dir = dict(type='str'),
+            reuse_session = dict(type='bool', default=False),
+            session_timeout = dict(type='int', default=300),
             session = dict(type='bool', default=False),
             include = dict(type='list', required=True),
             filter = dict(type='str', required=False),
+            max_workers = dict(type='int', default=1),
+            chunk_size = dict(type='int', default=1000),
+            report_round_trips = dict(type='bool', default=False),
+            cache_path = dict(type='str', required=False),
+            cache_ttl = dict(type='dict', required=False),
+            fields = dict(type='list', required=False),
+            dest = dict(type='str', required=False),
         )
     )
 
@@ -1601,13 +2301,23 @@ def main():
     user = module.params['user']
     password = module.params['password']
     validate_certs = module.params['validate_certs']
+    cache_dir = module.params['cache_dir']
+    reuse_session = module.params['reuse_session']
+    session_timeout = module.params['session_timeout']
     session = module.params['session']
+    max_workers = module.params['max_workers']
+    chunk_size = module.params['chunk_size']
+    report_round_trips = module.params['report_round_trips']
+    cache_path = module.params['cache_path']
+    cache_ttl = module.params['cache_ttl']
+    fields = module.params['fields']
+    dest = module.params['dest']
     fact_filter = module.params['filter']
     if fact_filter:
         regex = fnmatch.translate(fact_filter)
     else:
         regex = None
-    include = map(lambda x: x.lower(), module.params['include'])
+    include = list(set(map(lambda x: x.lower(), module.params['include'])))
     valid_includes = ('address_class', 'certificate', 'client_ssl_profile',
                       'device', 'device_group', 'interface', 'key', 'node',
                       'pool', 'rule', 'self_ip', 'software', 'system_info',
@@ -1616,68 +2326,75 @@ def main():
     include_test = map(lambda x: x in valid_includes, include)
     if not all(include_test):
         module.fail_json(msg="value of include must be one or more of: %s, got: %s" % (",".join(valid_includes), ",".join(include)))
+    if fields:
+        known_fields = set()
+        for category in include:
+            known_fields.update(FACT_FIELDS.get(category, []))
+        unknown_fields = sorted(set(fields) - known_fields)
+        if unknown_fields:
+            module.fail_json(msg="unknown field(s) for include %s: %s" % (",".join(sorted(include)), ",".join(unknown_fields)))
+    if max_workers < 1:
+        module.fail_json(msg="max_workers must be a positive integer")
+    if chunk_size < 0:
+        module.fail_json(msg="chunk_size must be zero or a positive integer")
+    if cache_ttl:
+        try:
+            cache_ttl = dict((k, int(v)) for k, v in cache_ttl.items())
+        except ValueError:
+            module.fail_json(msg="cache_ttl values must be integers")
+        invalid_ttls = [k for k in cache_ttl if k != 'default' and k not in valid_includes]
+        if invalid_ttls:
+            module.fail_json(msg="cache_ttl keys must be 'default' or one of: %s, got: %s" % (",".join(valid_includes), ",".join(invalid_ttls)))
+
+    if reuse_session and not cache_dir:
+        module.fail_json(msg="reuse_session requires cache_dir")
 
     if not validate_certs:
         disable_ssl_cert_validation()
 
     try:
         facts = {}
+        if dest:
+            writer = FactWriter(dest)
+            store = writer.add
+        else:
+            store = facts.__setitem__
 
-        if len(include) > 0:
-            f5 = F5(server, user, password, session)
-            saved_active_folder = f5.get_active_folder()
-            saved_recursive_query_state = f5.get_recursive_query_state()
-            if saved_active_folder != "/":
-                f5.set_active_folder("/")
-            if saved_recursive_query_state != "STATE_ENABLED":
-                f5.enable_recursive_query_state()
-
-            if 'interface' in include:
-                facts['interface'] = generate_interface_dict(f5, regex)
-            if 'self_ip' in include:
-                facts['self_ip'] = generate_self_ip_dict(f5, regex)
-            if 'trunk' in include:
-                facts['trunk'] = generate_trunk_dict(f5, regex)
-            if 'vlan' in include:
-                facts['vlan'] = generate_vlan_dict(f5, regex)
-            if 'virtual_server' in include:
-                facts['virtual_server'] = generate_vs_dict(f5, regex)
-            if 'pool' in include:
-                facts['pool'] = generate_pool_dict(f5, regex)
-            if 'device' in include:
-                facts['device'] = generate_device_dict(f5, regex)
-            if 'device_group' in include:
-                facts['device_group'] = generate_device_group_dict(f5, regex)
-            if 'traffic_group' in include:
-                facts['traffic_group'] = generate_traffic_group_dict(f5, regex)
-            if 'rule' in include:
-                facts['rule'] = generate_rule_dict(f5, regex)
-            if 'node' in include:
-                facts['node'] = generate_node_dict(f5, regex)
-            if 'virtual_address' in include:
-                facts['virtual_address'] = generate_virtual_address_dict(f5, regex)
-            if 'address_class' in include:
-                facts['address_class'] = generate_address_class_dict(f5, regex)
-            if 'software' in include:
-                facts['software'] = generate_software_list(f5)
-            if 'certificate' in include:
-                facts['certificate'] = generate_certificate_dict(f5, regex)
-            if 'key' in include:
-                facts['key'] = generate_key_dict(f5, regex)
-            if 'client_ssl_profile' in include:
-                facts['client_ssl_profile'] = generate_client_ssl_profile_dict(f5, regex)
-            if 'system_info' in include:
-                facts['system_info'] = generate_system_info_dict(f5)
-
-            # restore saved state
-            if saved_active_folder and saved_active_folder != "/":
-                f5.set_active_folder(saved_active_folder)
-            if saved_recursive_query_state and \
-               saved_recursive_query_state != "STATE_ENABLED":
-                f5.set_recursive_query_state(saved_recursive_query_state)
-
-        result = {'ansible_facts': facts}
+        stats = FetchStats()
+        f5_args = dict(host=server, user=user, password=password,
+                       session=session, stats=stats, chunk_size=chunk_size,
+                       folder=get_filter_folder(fact_filter), fields=fields,
+                       cache_dir=cache_dir, reuse_session=reuse_session,
+                       session_timeout=session_timeout)
+
+        try:
+            if len(include) > 0 and cache_path:
+                ttls = dict(DEFAULT_CACHE_TTL)
+                ttls.update(cache_ttl or {})
+                cache = FactCache(cache_path, server, user, fact_filter, fields,
+                                  ttls)
+                collect_cached_facts(f5_args, include, regex, max_workers, cache,
+                                     store)
+            elif len(include) > 0:
+                collect_all_facts(f5_args, include, regex, max_workers, store)
+        except Exception:
+            # drop the partial dest file; the error is reported below
+            if dest:
+                writer.abort()
+            raise
+
+        if dest:
+            writer.close()
+            result = {'ansible_facts': {}, 'dest': dest,
+                      'categories': writer.counts}
+        else:
+            result = {'ansible_facts': facts}
+        if report_round_trips:
+            result['round_trips'] = stats.round_trips
+            result['unsupported_methods'] = sorted(stats.unsupported)
 
+    except F5WorkerError, e:
+        module.fail_json(msg="received exception: %s\ntraceback: %s" % (e.error, e.worker_traceback))
     except Exception, e:
         module.fail_json(msg="received exception: %s\ntraceback: %s" % (e, traceback.format_exc()))
 
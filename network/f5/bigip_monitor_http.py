@@ -59,6 +59,32 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: 2.0
+    cache_dir:
+        description:
+            - Local directory used to cache the iControl WSDLs between runs
+              and, with I(reuse_session), the iControl session id. Nothing is
+              cached when unset.
+        required: false
+        default: null
+        version_added: 2.1
+    reuse_session:
+        description:
+            - If C(yes), persist the iControl session id for this server and
+              user in I(cache_dir) and reuse it in later runs until it
+              expires. A cached session id the device no longer accepts
+              is replaced with a new one. Requires I(cache_dir).
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        version_added: 2.1
+    session_timeout:
+        description:
+            - Number of seconds a persisted session id may stay idle before
+              a new one is requested. Keep this below the session timeout
+              configured on the BIG-IP.
+        required: false
+        default: 300
+        version_added: 2.1
     state:
         description:
             - Monitor state
@@ -67,8 +93,8 @@ options:
         choices: ['present', 'absent']
     name:
         description:
-            - Monitor name
-        required: true
+            - Monitor name. Required unless I(monitors) is given.
+        required: false
         default: null
         aliases: ['monitor']
     partition:
@@ -139,6 +165,19 @@ options:
               from the node. The default API setting is 0.
         required: false
         default: none
+    monitors:
+        description:
+            - List of monitors to manage in one run, as an alternative to
+              I(name). Each item is a dictionary with a C(name) key and any of
+              C(state), C(partition), C(parent), C(parent_partition), C(send),
+              C(receive), C(receive_disable), C(ip), C(port), C(interval),
+              C(timeout) and C(time_until_up). Keys an item does not set fall
+              back to the module options. Existing templates and their
+              properties are read with one batched call per property kind,
+              and all changes are applied with one batched call each.
+        required: false
+        default: null
+        version_added: 2.1
 '''
 
 EXAMPLES = '''
@@ -161,6 +200,14 @@ EXAMPLES = '''
     user:               "{{ f5user }}"
     password:           "{{ f5password }}"
     name:               "{{ monitorname }}"
+- name: BIGIP F5 | Manage all HTTP Monitors at once
+  local_action:
+    module:             bigip_monitor_http
+    state:              present
+    server:             "{{ f5server }}"
+    user:               "{{ f5user }}"
+    password:           "{{ f5password }}"
+    monitors:           "{{ f5monitors }}"
 '''
 
 try:
@@ -170,6 +217,16 @@ except ImportError:
 else:
     bigsuds_found = True
 
+import os
+import re
+import tempfile
+import time
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 TEMPLATE_TYPE = 'TTYPE_HTTP'
 DEFAULT_PARENT_TYPE = 'http'
 
@@ -179,12 +236,127 @@ DEFAULT_PARENT_TYPE = 'http'
 # these should be re-useable for other monitor types
 #
 
-def bigip_api(bigip, user, password):
+# faults returned for a session id the device does not know (anymore)
+INVALID_SESSION_RE = re.compile(r'session.*(invalid|not found|expired)', re.I)
+
+
+def bigip_api(bigip, user, password, cache_dir=None, reuse_session=False, session_timeout=300):
 
-    api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        wsdl_dir = os.path.join(cache_dir, 'wsdl')
+        if not os.path.isdir(wsdl_dir):
+            os.makedirs(wsdl_dir, 0700)
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password, cachedir=wsdl_dir)
+    else:
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if reuse_session:
+        api = BigIPCachedSession(SessionCache(api, bigip, user, cache_dir, session_timeout))
     return api
 
 
+class SessionCache(object):
+    """iControl session id persisted per server and user in cache_dir.
+
+    A cached id is reused until it has been idle for session_timeout seconds.
+    As the device may have dropped it before that (reboot, shorter idle
+    timeout), the first call checks it: if the device rejects the session,
+    the entry is dropped and the call retried once with a new session id.
+    The expiry is pushed back after every successful call, so the id
+    expires session_timeout seconds after it was last used. The entry is
+    rewritten at most once a second, which keeps long runs cheap.
+    """
+
+    def __init__(self, api, bigip, user, cache_dir, session_timeout):
+        self.api = api
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.session_timeout = session_timeout
+        key = hashlib.sha1("%s|%s" % (bigip, user)).hexdigest()
+        self.path = os.path.join(self.cache_dir, "session_%s.json" % key)
+        self.checked = False
+        self.saved = 0
+        session_id = self.load()
+        self.cached = session_id is not None
+        if session_id is None:
+            session_id = api.System.Session.get_session_identifier()
+        self.session_id = session_id
+        self.session = api.with_session_id(session_id)
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time():
+                return entry['session_id']
+        except (IOError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self):
+        self.saved = time.time()
+        entry = {'session_id': self.session_id, 'expires': self.saved + self.session_timeout}
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(entry, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+
+    def drop(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def renew(self):
+        self.drop()
+        self.session_id = self.api.System.Session.get_session_identifier()
+        self.session = self.api.with_session_id(self.session_id)
+        self.cached = False
+
+    def call(self, path, args, kwargs):
+        try:
+            result = self.resolve(path)(*args, **kwargs)
+        except (bigsuds.ServerError, bigsuds.ConnectionError), e:
+            if self.checked or not self.cached or not INVALID_SESSION_RE.search(str(e)):
+                raise
+            # the request was refused, so it is safe to send it again
+            self.renew()
+            result = self.resolve(path)(*args, **kwargs)
+        self.checked = True
+        if time.time() - self.saved >= 1:
+            self.save()
+        return result
+
+    def resolve(self, path):
+        method = self.session
+        for name in path:
+            method = getattr(method, name)
+        return method
+
+
+class BigIPCachedSession(object):
+    """Stand-in for a bigsuds BIGIP instance running its calls through a
+    SessionCache, e.g. api.LocalLB.Pool.get_list().
+    """
+
+    def __init__(self, cache, path=()):
+        self._cache = cache
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BigIPCachedSession(self._cache, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._path, args, kwargs)
+
+
 def disable_ssl_cert_validation():
 
     # You probably only want to do this for testing and never in production.
@@ -271,7 +443,6 @@ def check_integer_property(api, monitor, int_property):
             raise
 
 
-
 def set_integer_property(api, monitor, int_property):
 
     api.LocalLB.Monitor.set_template_int_property(template_names=[monitor], values=[int_property])
@@ -313,71 +484,189 @@ def set_ipport(api, monitor, ipport):
             raise
 
 # ===========================================
-# main loop
+# bulk variants of the generic methods above.
+# each of these costs a single iControl call
+# regardless of the number of monitors.
 #
-# writing a module for other monitor types should
-# only need an updated main() (and monitor specific functions)
 
-def main():
+ADDRESS_TYPE_IN_USE = "Cannot modify the address type of monitor"
 
-    # begin monitor specific stuff
 
-    module = AnsibleModule(
-        argument_spec = dict(
-            server    = dict(required=True),
-            user      = dict(required=True),
-            password  = dict(required=True),
-            validate_certs = dict(default='yes', type='bool'),
-            partition = dict(default='Common'),
-            state     = dict(default='present', choices=['present', 'absent']),
-            name      = dict(required=True),
-            parent    = dict(default=DEFAULT_PARENT_TYPE),
-            parent_partition = dict(default='Common'),
-            send      = dict(required=False),
-            receive   = dict(required=False),
-            receive_disable   = dict(required=False),
-            ip        = dict(required=False),
-            port      = dict(required=False, type='int'),
-            interval  = dict(required=False, type='int'),
-            timeout   = dict(required=False, type='int'),
-            time_until_up = dict(required=False, type='int', default=0)
-        ),
-        supports_check_mode=True
-    )
+def get_monitor_templates(api, monitors):
 
-    server = module.params['server']
-    user = module.params['user']
-    password = module.params['password']
-    validate_certs = module.params['validate_certs']
-    partition = module.params['partition']
-    parent_partition = module.params['parent_partition']
-    state = module.params['state']
-    name = module.params['name']
-    parent = "/%s/%s" % (parent_partition, module.params['parent'])
-    monitor = "/%s/%s" % (partition, name)
-    send = module.params['send']
-    receive = module.params['receive']
-    receive_disable = module.params['receive_disable']
-    ip = module.params['ip']
-    port = module.params['port']
-    interval = module.params['interval']
-    timeout = module.params['timeout']
-    time_until_up = module.params['time_until_up']
+    templates = api.LocalLB.Monitor.get_template_list()
+    types = dict([(x['template_name'], x['template_type']) for x in templates])
+    existing = [x for x in monitors if x in types]
+    parents = {}
+    if existing:
+        parents = dict(zip(existing, api.LocalLB.Monitor.get_parent_template(template_names=existing)))
+    return dict([(x, (types[x], parents[x])) for x in existing])
 
-    # end monitor specific stuff
 
-    if not validate_certs:
-        disable_ssl_cert_validation()
+def create_monitors(api, settings):
 
-    if not bigsuds_found:
-        module.fail_json(msg="the python bigsuds module is required")
-    api = bigip_api(server, user, password)
-    monitor_exists = check_monitor_exists(module, api, monitor, parent)
+    templates = [{'template_name': x['monitor'], 'template_type': x['template_type']} for x in settings]
+    api.LocalLB.Monitor.create_template(templates=templates, template_attributes=[x['template_attributes'] for x in settings])
+
+
+def delete_monitors(api, monitors):
 
+    api.LocalLB.Monitor.delete_template(template_names=monitors)
+
+
+def get_destinations(api, monitors):
+
+    return dict(zip(monitors, api.LocalLB.Monitor.get_template_destination(template_names=monitors)))
+
+
+def set_destinations(api, changes):
+
+    # changes is a list of (monitor, ipport) tuples. the device refuses
+    # the whole call if one monitor in use would change address type, so
+    # then set them one by one to apply the others and find those.
+    # returns the changed monitors and the refused ones
+    try:
+        api.LocalLB.Monitor.set_template_destination(template_names=[x[0] for x in changes], destinations=[x[1] for x in changes])
+        return [x[0] for x in changes], []
+    except bigsuds.OperationFailed, e:
+        if ADDRESS_TYPE_IN_USE not in str(e):
+            # genuine exception
+            raise
+
+    changed = []
+    refused = []
+    for monitor, ipport in changes:
+        try:
+            api.LocalLB.Monitor.set_template_destination(template_names=[monitor], destinations=[ipport])
+            changed.append(monitor)
+        except bigsuds.OperationFailed, e:
+            if ADDRESS_TYPE_IN_USE not in str(e):
+                # genuine exception
+                raise
+            refused.append(monitor)
+    return changed, refused
+
+
+def diff_properties(getter, wanted):
+
+    # wanted is a list of (monitor, property) tuples
+    if not wanted:
+        return []
+    current = getter(template_names=[x[0] for x in wanted], property_types=[x[1]['type'] for x in wanted])
+    return [x for x, y in zip(wanted, current) if x[1] != y]
+
+
+def update_monitors_properties(api, check_mode, settings):
+
+    string_wanted = []
+    integer_wanted = []
+    for x in settings:
+        string_wanted.extend([(x['monitor'], y) for y in x['string_properties'] if y['value'] is not None])
+        integer_wanted.extend([(x['monitor'], y) for y in x['integer_properties'] if y['value'] is not None])
+    string_changes = diff_properties(api.LocalLB.Monitor.get_template_string_property, string_wanted)
+    integer_changes = diff_properties(api.LocalLB.Monitor.get_template_integer_property, integer_wanted)
+    if not check_mode:
+        if string_changes:
+            api.LocalLB.Monitor.set_template_string_property(template_names=[x[0] for x in string_changes], values=[x[1] for x in string_changes])
+        if integer_changes:
+            api.LocalLB.Monitor.set_template_int_property(template_names=[x[0] for x in integer_changes], values=[x[1] for x in integer_changes])
+    return set([x[0] for x in string_changes + integer_changes])
+
+
+def apply_monitors(api, module, monitors, monitor_settings):
+
+    # monitors is a list of parameter dicts; monitor_settings is the
+    # monitor specific callable turning one of them and its current
+    # ipport (None if it does not exist) into the desired settings
+    existing = get_monitor_templates(api, [x['monitor'] for x in monitors])
+    for params in monitors:
+        monitor = params['monitor']
+        if monitor in existing and existing[monitor] != (params['template_type'], params['parent']):
+            module.fail_json(msg='Monitor %s already exists, but has a different type (%s) or parent(%s)' % ((monitor,) + existing[monitor]))
+
+    removes = [x['monitor'] for x in monitors if x['state'] == 'absent' and x['monitor'] in existing]
+    present = [x for x in monitors if x['state'] == 'present']
+    updates = [x['monitor'] for x in present if x['monitor'] in existing]
+    cur_ipports = {}
+    if updates:
+        cur_ipports = get_destinations(api, updates)
+    settings = [monitor_settings(x, cur_ipports.get(x['monitor'])) for x in present]
+    creates = [x for x in settings if x['monitor'] not in existing]
+
+    changed = set(removes + [x['monitor'] for x in creates])
+    if not module.check_mode:
+        if removes:
+            delete_monitors(api, removes)
+        if creates:
+            create_monitors(api, creates)
+    else:
+        # cannot read back properties of monitors not created in check mode
+        settings = [x for x in settings if x['monitor'] in existing]
+    changed.update(update_monitors_properties(api, module.check_mode, settings))
+
+    ipport_changes = [(x['monitor'], x['ipport']) for x in settings
+                      if x['monitor'] in cur_ipports and cur_ipports[x['monitor']] != x['ipport']]
+    if ipport_changes:
+        if not module.check_mode:
+            ipport_changed, refused = set_destinations(api, ipport_changes)
+            changed.update(ipport_changed)
+            if refused:
+                module.fail_json(msg="Cannot modify the address type of monitor if already assigned to a pool: %s" % ", ".join(refused),
+                                 changed=bool(changed), changed_monitors=sorted(changed))
+        else:
+            changed.update([x[0] for x in ipport_changes])
+
+    return {'changed': bool(changed), 'changed_monitors': sorted(changed)}
+
+# ===========================================
+# main loop
+#
+# writing a module for other monitor types should
+# only need an updated main() (and monitor specific functions)
+
+MONITOR_OPTIONS = ['state', 'name', 'partition', 'parent', 'parent_partition',
+                   'send', 'receive', 'receive_disable', 'ip', 'port',
+                   'interval', 'timeout', 'time_until_up']
+INTEGER_OPTIONS = ['port', 'interval', 'timeout', 'time_until_up']
+
+
+def monitor_params(module, item):
+
+    # module options act as defaults for each item of monitors
+    unknown = [x for x in item if x not in MONITOR_OPTIONS]
+    if unknown:
+        module.fail_json(msg="unknown option(s) %s in monitors item %s, must be one of: %s" % (", ".join(unknown), item.get('name'), ", ".join(MONITOR_OPTIONS)))
+    params = dict([(x, module.params[x]) for x in MONITOR_OPTIONS])
+    params.update(item)
+    if not params['name']:
+        module.fail_json(msg="each monitor needs a name")
+    if params['state'] not in ('present', 'absent'):
+        module.fail_json(msg="state of monitor %s must be present or absent" % params['name'])
+    for option in INTEGER_OPTIONS:
+        if params[option] is not None:
+            try:
+                params[option] = int(params[option])
+            except ValueError:
+                module.fail_json(msg="%s of monitor %s must be an integer" % (option, params['name']))
+    params['monitor'] = "/%s/%s" % (params['partition'], params['name'])
+    params['parent'] = "/%s/%s" % (params['parent_partition'], params['parent'])
+    params['template_type'] = TEMPLATE_TYPE
+    return params
+
+
+def monitor_settings(params, cur_ipport):
+
+    send = params['send']
+    receive = params['receive']
+    receive_disable = params['receive_disable']
+    ip = params['ip']
+    port = params['port']
+    interval = params['interval']
+    timeout = params['timeout']
+    time_until_up = params['time_until_up']
 
     # ipport is a special setting
-    if monitor_exists: # make sure to not update current settings if not asked
-        cur_ipport = get_ipport(api, monitor)
+    if cur_ipport is not None: # make sure to not update current settings if not asked
         if ip is None:
             ip = cur_ipport['ipport']['address']
         if port is None:
@@ -412,7 +701,7 @@ def main():
               'ipport': {'address': ip,
                          'port': port}}
 
-    template_attributes = {'parent_template': parent,
+    template_attributes = {'parent_template': params['parent'],
                            'interval': interval,
                            'timeout': timeout,
                            'dest_ipport': ipport,
@@ -434,6 +723,92 @@ def main():
                                    {'type': 'ITYPE_TIME_UNTIL_UP',
                                     'value': time_until_up}]
 
+    return {'monitor': params['monitor'],
+            'template_type': params['template_type'],
+            'template_attributes': template_attributes,
+            'string_properties': template_string_properties,
+            'integer_properties': template_integer_properties,
+            'ipport': ipport}
+
+
+def main():
+
+    # begin monitor specific stuff
+
+    module = AnsibleModule(
+        argument_spec = dict(
+            server    = dict(required=True),
+            user      = dict(required=True),
+            password  = dict(required=True),
+            validate_certs = dict(default='yes', type='bool'),
+            cache_dir = dict(type='str'),
+            reuse_session = dict(type='bool', default=False),
+            session_timeout = dict(type='int', default=300),
+            partition = dict(default='Common'),
+            state     = dict(default='present', choices=['present', 'absent']),
+            name      = dict(required=False),
+            parent    = dict(default=DEFAULT_PARENT_TYPE),
+            parent_partition = dict(default='Common'),
+            send      = dict(required=False),
+            receive   = dict(required=False),
+            receive_disable   = dict(required=False),
+            ip        = dict(required=False),
+            port      = dict(required=False, type='int'),
+            interval  = dict(required=False, type='int'),
+            timeout   = dict(required=False, type='int'),
+            time_until_up = dict(required=False, type='int', default=0),
+            monitors  = dict(required=False, type='list')
+        ),
+        mutually_exclusive=[['name', 'monitors']],
+        required_one_of=[['name', 'monitors']],
+        supports_check_mode=True
+    )
+
+    server = module.params['server']
+    user = module.params['user']
+    password = module.params['password']
+    validate_certs = module.params['validate_certs']
+    cache_dir = module.params['cache_dir']
+    reuse_session = module.params['reuse_session']
+    session_timeout = module.params['session_timeout']
+    monitors = module.params['monitors']
+
+    # end monitor specific stuff
+
+    if reuse_session and not cache_dir:
+        module.fail_json(msg="reuse_session requires cache_dir")
+
+    if not validate_certs:
+        disable_ssl_cert_validation()
+
+    if not bigsuds_found:
+        module.fail_json(msg="the python bigsuds module is required")
+    api = bigip_api(server, user, password, cache_dir, reuse_session, session_timeout)
+
+    if monitors is not None:
+        for item in monitors:
+            if not isinstance(item, dict):
+                module.fail_json(msg="each item in monitors must be a dictionary")
+        try:
+            result = apply_monitors(api, module, [monitor_params(module, x) for x in monitors], monitor_settings)
+        except Exception, e:
+            module.fail_json(msg="received exception: %s" % e)
+        module.exit_json(**result)
+
+    params = monitor_params(module, {})
+    state = params['state']
+    monitor = params['monitor']
+    monitor_exists = check_monitor_exists(module, api, monitor, params['parent'])
+
+    cur_ipport = None
+    if monitor_exists:
+        cur_ipport = get_ipport(api, monitor)
+    settings = monitor_settings(params, cur_ipport)
+    ipport = settings['ipport']
+    template_attributes = settings['template_attributes']
+    template_string_properties = settings['string_properties']
+    template_integer_properties = settings['integer_properties']
+
     # main logic, monitor generic
 
     try:
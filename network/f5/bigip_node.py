@@ -62,6 +62,32 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: 2.0
+    cache_dir:
+        description:
+            - Local directory used to cache the iControl WSDLs between runs
+              and, with I(reuse_session), the iControl session id. Nothing is
+              cached when unset.
+        required: false
+        default: null
+        version_added: 2.1
+    reuse_session:
+        description:
+            - If C(yes), persist the iControl session id for this server and
+              user in I(cache_dir) and reuse it in later runs until it
+              expires. A cached session id the device no longer accepts
+              is replaced with a new one. Requires I(cache_dir).
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        version_added: 2.1
+    session_timeout:
+        description:
+            - Number of seconds a persisted session id may stay idle before
+              a new one is requested. Keep this below the session timeout
+              configured on the BIG-IP.
+        required: false
+        default: 300
+        version_added: 2.1
     state:
         description:
             - Pool member state
@@ -159,6 +185,16 @@ except ImportError:
 else:
     bigsuds_found = True
 
+import os
+import re
+import tempfile
+import time
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 # ==========================
 # bigip_node module specific
 #
@@ -170,10 +206,122 @@ STATUSES={'enabled': 'SESSION_STATUS_ENABLED',
           'disabled': 'SESSION_STATUS_DISABLED',
           'offline': 'SESSION_STATUS_FORCED_DISABLED'}
 
-def bigip_api(bigip, user, password):
-    api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+# faults returned for a session id the device does not know (anymore)
+INVALID_SESSION_RE = re.compile(r'session.*(invalid|not found|expired)', re.I)
+
+def bigip_api(bigip, user, password, cache_dir=None, reuse_session=False, session_timeout=300):
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        wsdl_dir = os.path.join(cache_dir, 'wsdl')
+        if not os.path.isdir(wsdl_dir):
+            os.makedirs(wsdl_dir, 0700)
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password, cachedir=wsdl_dir)
+    else:
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if reuse_session:
+        api = BigIPCachedSession(SessionCache(api, bigip, user, cache_dir, session_timeout))
     return api
 
+class SessionCache(object):
+    """iControl session id persisted per server and user in cache_dir.
+
+    A cached id is reused until it has been idle for session_timeout seconds.
+    As the device may have dropped it before that (reboot, shorter idle
+    timeout), the first call checks it: if the device rejects the session,
+    the entry is dropped and the call retried once with a new session id.
+    The expiry is pushed back after every successful call, so the id
+    expires session_timeout seconds after it was last used. The entry is
+    rewritten at most once a second, which keeps long runs cheap.
+    """
+
+    def __init__(self, api, bigip, user, cache_dir, session_timeout):
+        self.api = api
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.session_timeout = session_timeout
+        key = hashlib.sha1("%s|%s" % (bigip, user)).hexdigest()
+        self.path = os.path.join(self.cache_dir, "session_%s.json" % key)
+        self.checked = False
+        self.saved = 0
+        session_id = self.load()
+        self.cached = session_id is not None
+        if session_id is None:
+            session_id = api.System.Session.get_session_identifier()
+        self.session_id = session_id
+        self.session = api.with_session_id(session_id)
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time():
+                return entry['session_id']
+        except (IOError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self):
+        self.saved = time.time()
+        entry = {'session_id': self.session_id, 'expires': self.saved + self.session_timeout}
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(entry, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+
+    def drop(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def renew(self):
+        self.drop()
+        self.session_id = self.api.System.Session.get_session_identifier()
+        self.session = self.api.with_session_id(self.session_id)
+        self.cached = False
+
+    def call(self, path, args, kwargs):
+        try:
+            result = self.resolve(path)(*args, **kwargs)
+        except (bigsuds.ServerError, bigsuds.ConnectionError), e:
+            if self.checked or not self.cached or not INVALID_SESSION_RE.search(str(e)):
+                raise
+            # the request was refused, so it is safe to send it again
+            self.renew()
+            result = self.resolve(path)(*args, **kwargs)
+        self.checked = True
+        if time.time() - self.saved >= 1:
+            self.save()
+        return result
+
+    def resolve(self, path):
+        method = self.session
+        for name in path:
+            method = getattr(method, name)
+        return method
+
+class BigIPCachedSession(object):
+    """Stand-in for a bigsuds BIGIP instance running its calls through a
+    SessionCache, e.g. api.LocalLB.Pool.get_list().
+    """
+
+    def __init__(self, cache, path=()):
+        self._cache = cache
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BigIPCachedSession(self._cache, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._path, args, kwargs)
+
 def disable_ssl_cert_validation():
     # You probably only want to do this for testing and never in production.
     # From https://www.python.org/dev/peps/pep-0476/#id29
@@ -258,6 +406,9 @@ def main():
             user = dict(type='str', required=True),
             password = dict(type='str', required=True),
             validate_certs = dict(default='yes', type='bool'),
+            cache_dir = dict(type='str'),
+            reuse_session = dict(type='bool', default=False),
+            session_timeout = dict(type='int', default=300),
             state = dict(type='str', default='present',
                          choices=['present', 'absent', 'disabled', 'enabled']),
             partition = dict(type='str', default='Common'),
@@ -275,6 +426,9 @@ def main():
     user = module.params['user']
     password = module.params['password']
     validate_certs = module.params['validate_certs']
+    cache_dir = module.params['cache_dir']
+    reuse_session = module.params['reuse_session']
+    session_timeout = module.params['session_timeout']
     state = module.params['state']
     partition = module.params['partition']
     host = module.params['host']
@@ -282,6 +436,9 @@ def main():
     address = "/%s/%s" % (partition, name)
     description = module.params['description']
 
+    if reuse_session and not cache_dir:
+        module.fail_json(msg="reuse_session requires cache_dir")
+
     if not validate_certs:
         disable_ssl_cert_validation()
 
@@ -289,7 +446,7 @@ def main():
         module.fail_json(msg="host parameter invalid when state=absent")
 
     try:
-        api = bigip_api(server, user, password)
+        api = bigip_api(server, user, password, cache_dir, reuse_session, session_timeout)
         result = {'changed': False}  # default
 
         if state == 'absent':
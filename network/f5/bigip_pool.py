@@ -62,6 +62,32 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: 2.0
+    cache_dir:
+        description:
+            - Local directory used to cache the iControl WSDLs between runs
+              and, with I(reuse_session), the iControl session id. Nothing is
+              cached when unset.
+        required: false
+        default: null
+        version_added: 2.1
+    reuse_session:
+        description:
+            - If C(yes), persist the iControl session id for this server and
+              user in I(cache_dir) and reuse it in later runs until it
+              expires. A cached session id the device no longer accepts
+              is replaced with a new one. Requires I(cache_dir).
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        version_added: 2.1
+    session_timeout:
+        description:
+            - Number of seconds a persisted session id may stay idle before
+              a new one is requested. Keep this below the session timeout
+              configured on the BIG-IP.
+        required: false
+        default: 300
+        version_added: 2.1
     state:
         description:
             - Pool/pool member state
@@ -71,8 +97,8 @@ options:
         aliases: []
     name:
         description:
-            - Pool name
-        required: true
+            - Pool name. Required unless I(pools) is given.
+        required: false
         default: null
         choices: []
         aliases: ['pool']
@@ -154,6 +180,23 @@ options:
         default: null
         choices: []
         aliases: []
+    pools:
+        description:
+            - List of pools to manage in one run, as an alternative to
+              I(name). Each item is a dictionary with a C(name) key and any of
+              C(state), C(partition), C(lb_method), C(monitor_type),
+              C(quorum), C(monitors), C(slow_ramp_time),
+              C(service_down_action), C(host) and C(port), with the same
+              meaning and choices as the module options they fall back to.
+              Items with other keys or invalid values are rejected. Current
+              settings of all pools are read first, then every change is
+              applied as batched calls inside a single iControl transaction,
+              so either all pools are updated or none are.
+        version_added: "2.1"
+        required: False
+        default: null
+        choices: []
+        aliases: []
 '''
 
 EXAMPLES = '''
@@ -226,6 +269,26 @@ EXAMPLES = '''
       name=matthite-pool
       partition=matthite
 
+- hosts: localhost
+  tasks:
+  - name: Update several pools in one transaction
+    local_action:
+      module: bigip_pool
+      server: lb.mydomain.com
+      user: admin
+      password: mysecret
+      partition: matthite
+      pools:
+        - name: web-pool
+          lb_method: least_connection_member
+          monitors: [ /Common/http ]
+        - name: api-pool
+          slow_ramp_time: 60
+          host: 10.0.0.20
+          port: 8080
+        - name: old-pool
+          state: absent
+
 '''
 
 try:
@@ -235,14 +298,136 @@ except ImportError:
 else:
     bigsuds_found = True
 
+import os
+import re
+import tempfile
+import time
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 # ===========================================
 # bigip_pool module specific support methods.
 #
 
-def bigip_api(bigip, user, password):
-    api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+# faults returned for a session id the device does not know (anymore)
+INVALID_SESSION_RE = re.compile(r'session.*(invalid|not found|expired)', re.I)
+
+def bigip_api(bigip, user, password, cache_dir=None, reuse_session=False, session_timeout=300):
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        wsdl_dir = os.path.join(cache_dir, 'wsdl')
+        if not os.path.isdir(wsdl_dir):
+            os.makedirs(wsdl_dir, 0700)
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password, cachedir=wsdl_dir)
+    else:
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if reuse_session:
+        api = BigIPCachedSession(SessionCache(api, bigip, user, cache_dir, session_timeout))
     return api
 
+class SessionCache(object):
+    """iControl session id persisted per server and user in cache_dir.
+
+    A cached id is reused until it has been idle for session_timeout seconds.
+    As the device may have dropped it before that (reboot, shorter idle
+    timeout), the first call checks it: if the device rejects the session,
+    the entry is dropped and the call retried once with a new session id.
+    The expiry is pushed back after every successful call, so the id
+    expires session_timeout seconds after it was last used. The entry is
+    rewritten at most once a second, which keeps long runs cheap.
+    """
+
+    def __init__(self, api, bigip, user, cache_dir, session_timeout):
+        self.api = api
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.session_timeout = session_timeout
+        key = hashlib.sha1("%s|%s" % (bigip, user)).hexdigest()
+        self.path = os.path.join(self.cache_dir, "session_%s.json" % key)
+        self.checked = False
+        self.saved = 0
+        session_id = self.load()
+        self.cached = session_id is not None
+        if session_id is None:
+            session_id = api.System.Session.get_session_identifier()
+        self.session_id = session_id
+        self.session = api.with_session_id(session_id)
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time():
+                return entry['session_id']
+        except (IOError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self):
+        self.saved = time.time()
+        entry = {'session_id': self.session_id, 'expires': self.saved + self.session_timeout}
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(entry, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+
+    def drop(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def renew(self):
+        self.drop()
+        self.session_id = self.api.System.Session.get_session_identifier()
+        self.session = self.api.with_session_id(self.session_id)
+        self.cached = False
+
+    def call(self, path, args, kwargs):
+        try:
+            result = self.resolve(path)(*args, **kwargs)
+        except (bigsuds.ServerError, bigsuds.ConnectionError), e:
+            if self.checked or not self.cached or not INVALID_SESSION_RE.search(str(e)):
+                raise
+            # the request was refused, so it is safe to send it again
+            self.renew()
+            result = self.resolve(path)(*args, **kwargs)
+        self.checked = True
+        if time.time() - self.saved >= 1:
+            self.save()
+        return result
+
+    def resolve(self, path):
+        method = self.session
+        for name in path:
+            method = getattr(method, name)
+        return method
+
+class BigIPCachedSession(object):
+    """Stand-in for a bigsuds BIGIP instance running its calls through a
+    SessionCache, e.g. api.LocalLB.Pool.get_list().
+    """
+
+    def __init__(self, cache, path=()):
+        self._cache = cache
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BigIPCachedSession(self._cache, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._path, args, kwargs)
+
 def disable_ssl_cert_validation():
     # You probably only want to do this for testing and never in production.
     # From https://www.python.org/dev/peps/pep-0476/#id29
@@ -350,6 +535,199 @@ def add_pool_member(api, pool, address, port):
     members = [{'address': address, 'port': port}]
     api.LocalLB.Pool.add_member_v2(pool_names=[pool], members=[members])
 
+POOL_OPTIONS = ['state', 'name', 'partition', 'lb_method', 'monitor_type',
+                'quorum', 'monitors', 'slow_ramp_time', 'service_down_action',
+                'host', 'port']
+
+def pool_params(module, item):
+    # module options act as defaults for each item of pools
+    unknown = [x for x in item if x not in POOL_OPTIONS]
+    if unknown:
+        module.fail_json(msg="unknown option(s) %s in pools item %s, must be one of: %s" % (", ".join(unknown), item.get('name'), ", ".join(POOL_OPTIONS)))
+    params = dict([(x, module.params[x]) for x in POOL_OPTIONS])
+    params.update(item)
+    name = params['name']
+    if not name:
+        module.fail_json(msg="each pool needs a name")
+    if params['state'] not in ('present', 'absent'):
+        module.fail_json(msg="state of pool %s must be present or absent" % name)
+    for option in ('quorum', 'slow_ramp_time', 'port'):
+        if params[option] is not None:
+            try:
+                params[option] = int(params[option])
+            except (TypeError, ValueError):
+                module.fail_json(msg="%s of pool %s must be an integer" % (option, name))
+    # checked against the choices of the module options, so that a bad
+    # value fails here rather than as a fault in the middle of the transaction
+    for option in ('lb_method', 'monitor_type', 'service_down_action'):
+        if params[option]:
+            params[option] = str(params[option]).lower()
+            choices = module.argument_spec[option]['choices']
+            if params[option] not in choices:
+                module.fail_json(msg="%s of pool %s must be one of: %s, got: %s" % (option, name, ", ".join(choices), params[option]))
+    partition = params['partition']
+    params['pool'] = "/%s/%s" % (partition, name)
+    if params['monitors']:
+        monitors = []
+        for monitor in params['monitors']:
+            if "/" not in monitor:
+                monitors.append("/%s/%s" % (partition, monitor))
+            else:
+                monitors.append(monitor)
+        params['monitors'] = monitors
+    params['address'] = "/%s/%s" % (partition, params['host'])
+    return params
+
+def get_pools(api):
+    return set(api.LocalLB.Pool.get_list())
+
+def get_pool_values(api, method, pools):
+    return dict(zip(pools, getattr(api.LocalLB.Pool, method)(pool_names=pools)))
+
+def plan_pools(api, pools):
+    # read the current state of all pools with one call per attribute and
+    # return the batched changes needed to reach the desired state
+    existing = get_pools(api)
+
+    def current(method, option):
+        wanted = set([x['pool'] for x in pools if x['state'] == 'present' and
+                      x['pool'] in existing and x[option]])
+        if not wanted:
+            return {}
+        return get_pool_values(api, method, list(wanted))
+
+    lb_methods = current('get_lb_method', 'lb_method')
+    monitor_associations = current('get_monitor_association', 'monitors')
+    slow_ramp_times = current('get_slow_ramp_time', 'slow_ramp_time')
+    service_down_actions = current('get_action_on_service_down', 'service_down_action')
+    members = {}
+    member_pools = set([x['pool'] for x in pools if x['host'] and x['pool'] in existing])
+    if member_pools:
+        members = get_pool_values(api, 'get_member_v2', list(member_pools))
+
+    plan = {'create': [], 'lb_method': [], 'monitors': [], 'slow_ramp_time': [],
+            'service_down_action': [], 'add_member': [], 'remove_member': [],
+            'delete': []}
+    changes = {}
+
+    for x in pools:
+        pool = x['pool']
+        member = {'address': x['address'], 'port': x['port']}
+        if x['state'] == 'absent':
+            if pool not in existing:
+                continue
+            if x['host'] and x['port']:
+                # member removal takes precedent
+                if member in members[pool]:
+                    plan['remove_member'].append((pool, member))
+                    changes.setdefault(pool, []).append('remove member %s:%s' % (x['address'], x['port']))
+            else:
+                plan['delete'].append(pool)
+                changes.setdefault(pool, []).append('delete')
+            continue
+
+        pool_changes = []
+        if pool not in existing:
+            plan['create'].append((pool, x['lb_method'] or 'round_robin'))
+            pool_changes.append('create')
+        elif x['lb_method'] and x['lb_method'] != lb_methods[pool].strip().replace('LB_METHOD_', '').lower():
+            plan['lb_method'].append((pool, x['lb_method']))
+            pool_changes.append('lb_method')
+        if x['monitors']:
+            if pool in monitor_associations:
+                rule = monitor_associations[pool]['monitor_rule']
+                t_monitor_type = rule['type'].split("MONITOR_RULE_TYPE_")[-1].lower()
+                if t_monitor_type != x['monitor_type'] or rule['quorum'] != x['quorum'] or \
+                   set(rule['monitor_templates']) != set(x['monitors']):
+                    plan['monitors'].append(x)
+                    pool_changes.append('monitors')
+            else:
+                plan['monitors'].append(x)
+                pool_changes.append('monitors')
+        if x['slow_ramp_time'] and x['slow_ramp_time'] != slow_ramp_times.get(pool):
+            plan['slow_ramp_time'].append((pool, x['slow_ramp_time']))
+            pool_changes.append('slow_ramp_time')
+        if x['service_down_action'] and (pool not in service_down_actions or \
+           x['service_down_action'] != service_down_actions[pool].split("SERVICE_DOWN_ACTION_")[-1].lower()):
+            plan['service_down_action'].append((pool, x['service_down_action']))
+            pool_changes.append('service_down_action')
+        if (x['host'] and x['port']) and member not in members.get(pool, []):
+            plan['add_member'].append((pool, member))
+            pool_changes.append('add member %s:%s' % (x['address'], x['port']))
+        if pool_changes:
+            changes.setdefault(pool, []).extend(pool_changes)
+
+    return plan, changes
+
+def apply_pool_plan(api, plan):
+    # every write goes into one transaction; reads are not allowed inside it
+    api.System.Session.start_transaction()
+    try:
+        if plan['create']:
+            api.LocalLB.Pool.create_v2(pool_names=[x[0] for x in plan['create']],
+                                       lb_methods=["LB_METHOD_%s" % x[1].strip().upper() for x in plan['create']],
+                                       members=[[] for x in plan['create']])
+        if plan['lb_method']:
+            api.LocalLB.Pool.set_lb_method(pool_names=[x[0] for x in plan['lb_method']],
+                                           lb_methods=["LB_METHOD_%s" % x[1].strip().upper() for x in plan['lb_method']])
+        if plan['monitors']:
+            associations = []
+            for x in plan['monitors']:
+                monitor_rule = {'type': "MONITOR_RULE_TYPE_%s" % x['monitor_type'].strip().upper(),
+                                'quorum': x['quorum'], 'monitor_templates': x['monitors']}
+                associations.append({'pool_name': x['pool'], 'monitor_rule': monitor_rule})
+            api.LocalLB.Pool.set_monitor_association(monitor_associations=associations)
+        if plan['slow_ramp_time']:
+            api.LocalLB.Pool.set_slow_ramp_time(pool_names=[x[0] for x in plan['slow_ramp_time']],
+                                                values=[x[1] for x in plan['slow_ramp_time']])
+        if plan['service_down_action']:
+            api.LocalLB.Pool.set_action_on_service_down(pool_names=[x[0] for x in plan['service_down_action']],
+                                                        actions=["SERVICE_DOWN_ACTION_%s" % x[1].strip().upper() for x in plan['service_down_action']])
+        for op, method in (('add_member', 'add_member_v2'), ('remove_member', 'remove_member_v2')):
+            if plan[op]:
+                grouped = {}
+                for pool, member in plan[op]:
+                    grouped.setdefault(pool, []).append(member)
+                getattr(api.LocalLB.Pool, method)(pool_names=grouped.keys(), members=grouped.values())
+        if plan['delete']:
+            api.LocalLB.Pool.delete_pool(pool_names=plan['delete'])
+        api.System.Session.submit_transaction()
+    except:
+        try:
+            api.System.Session.rollback_transaction()
+        except Exception:
+            pass
+        raise
+
+    # node addresses may still be referenced by other pools, so these are
+    # cleaned up one by one after the transaction
+    deleted = []
+    for address in set([x[1]['address'] for x in plan['remove_member']]):
+        if delete_node_address(api, address):
+            deleted.append(address)
+    return deleted
+
+def check_monitor_params(module, params):
+    monitors = params['monitors']
+    if monitors:
+        if len(monitors) == 1:
+            # set default required values for single monitor
+            params['quorum'] = 0
+            params['monitor_type'] = 'single'
+        elif len(monitors) > 1:
+            if not params['monitor_type']:
+                module.fail_json(msg="monitor_type required for monitors > 1")
+            if params['monitor_type'] == 'm_of_n' and not params['quorum']:
+                module.fail_json(msg="quorum value required for monitor_type m_of_n")
+            if params['monitor_type'] != 'm_of_n':
+                params['quorum'] = 0
+    elif params['monitor_type']:
+        # no monitors specified but monitor_type exists
+        module.fail_json(msg="monitor_type require monitors parameter")
+    elif params['quorum'] is not None:
+        # no monitors specified but quorum exists
+        module.fail_json(msg="quorum requires monitors parameter")
+
 def main():
     lb_method_choices = ['round_robin', 'ratio_member',
                          'least_connection_member', 'observed_member',
@@ -374,8 +752,11 @@ def main():
             user = dict(type='str', required=True),
             password = dict(type='str', required=True),
             validate_certs = dict(default='yes', type='bool'),
+            cache_dir = dict(type='str'),
+            reuse_session = dict(type='bool', default=False),
+            session_timeout = dict(type='int', default=300),
             state = dict(type='str', default='present', choices=['present', 'absent']),
-            name = dict(type='str', required=True, aliases=['pool']),
+            name = dict(type='str', aliases=['pool']),
             partition = dict(type='str', default='Common'),
             lb_method = dict(type='str', choices=lb_method_choices),
             monitor_type = dict(type='str', choices=monitor_type_choices),
@@ -384,8 +765,11 @@ def main():
             slow_ramp_time = dict(type='int'),
             service_down_action = dict(type='str', choices=service_down_choices),
             host = dict(type='str', aliases=['address']),
-            port = dict(type='int')
+            port = dict(type='int'),
+            pools = dict(type='list')
         ),
+        mutually_exclusive=[['name', 'pools']],
+        required_one_of=[['name', 'pools']],
         supports_check_mode=True
     )
 
@@ -396,36 +780,58 @@ def main():
     user = module.params['user']
     password = module.params['password']
     validate_certs = module.params['validate_certs']
-    state = module.params['state']
-    name = module.params['name']
-    partition = module.params['partition']
-    pool = "/%s/%s" % (partition, name)
-    lb_method = module.params['lb_method']
-    if lb_method:
-        lb_method = lb_method.lower()
-    monitor_type = module.params['monitor_type']
-    if monitor_type:
-        monitor_type = monitor_type.lower()
-    quorum = module.params['quorum']
-    monitors = module.params['monitors']
-    if monitors:
-        monitors = []
-        for monitor in module.params['monitors']:
-            if "/" not in monitor:
-                monitors.append("/%s/%s" % (partition, monitor))
-            else:
-                monitors.append(monitor)
-    slow_ramp_time = module.params['slow_ramp_time']
-    service_down_action = module.params['service_down_action']
-    if service_down_action:
-        service_down_action = service_down_action.lower()
-    host = module.params['host']
-    address = "/%s/%s" % (partition, host)
-    port = module.params['port']
+    cache_dir = module.params['cache_dir']
+    reuse_session = module.params['reuse_session']
+    session_timeout = module.params['session_timeout']
+    pools = module.params['pools']
+
+    if reuse_session and not cache_dir:
+        module.fail_json(msg="reuse_session requires cache_dir")
 
     if not validate_certs:
         disable_ssl_cert_validation()
 
+    if pools is not None:
+        pool_list = []
+        for item in pools:
+            if not isinstance(item, dict):
+                module.fail_json(msg="each item in pools must be a dictionary")
+            params = pool_params(module, item)
+            if (params['host'] and not params['port']) or (params['port'] and not params['host']):
+                module.fail_json(msg="both host and port must be supplied for pool %s" % params['name'])
+            if params['lb_method'] and params['lb_method'] not in lb_method_choices:
+                module.fail_json(msg="invalid lb_method for pool %s" % params['name'])
+            if params['service_down_action'] and params['service_down_action'] not in service_down_choices:
+                module.fail_json(msg="invalid service_down_action for pool %s" % params['name'])
+            check_monitor_params(module, params)
+            pool_list.append(params)
+        try:
+            api = bigip_api(server, user, password, cache_dir, reuse_session, session_timeout)
+            if not reuse_session:
+                # transactions are bound to a session
+                api = api.with_session_id()
+            plan, changes = plan_pools(api, pool_list)
+            result = {'changed': bool(changes), 'changes': changes}
+            if changes and not module.check_mode:
+                result['deleted'] = apply_pool_plan(api, plan)
+        except Exception, e:
+            module.fail_json(msg="received exception: %s" % e)
+        module.exit_json(**result)
+
+    params = pool_params(module, {})
+    check_monitor_params(module, params)
+    state = params['state']
+    pool = params['pool']
+    lb_method = params['lb_method']
+    monitor_type = params['monitor_type']
+    quorum = params['quorum']
+    monitors = params['monitors']
+    slow_ramp_time = params['slow_ramp_time']
+    service_down_action = params['service_down_action']
+    host = params['host']
+    address = params['address']
+    port = params['port']
+
     # sanity check user supplied values
 
     if (host and not port) or (port and not host):
@@ -434,27 +840,8 @@ def main():
     if 1 > port > 65535:
         module.fail_json(msg="valid ports must be in range 1 - 65535")
 
-    if monitors:
-        if len(monitors) == 1:
-            # set default required values for single monitor
-            quorum = 0
-            monitor_type = 'single'
-        elif len(monitors) > 1:
-            if not monitor_type:
-                module.fail_json(msg="monitor_type required for monitors > 1")
-            if monitor_type == 'm_of_n' and not quorum:
-                module.fail_json(msg="quorum value required for monitor_type m_of_n")
-            if monitor_type != 'm_of_n':
-                quorum = 0
-    elif monitor_type:
-        # no monitors specified but monitor_type exists
-        module.fail_json(msg="monitor_type require monitors parameter")
-    elif quorum is not None:
-        # no monitors specified but quorum exists
-        module.fail_json(msg="quorum requires monitors parameter")
-
     try:
-        api = bigip_api(server, user, password)
+        api = bigip_api(server, user, password, cache_dir, reuse_session, session_timeout)
         result = {'changed': False}  # default
 
         if state == 'absent':
@@ -64,6 +64,32 @@ options:
         default: 'yes'
         choices: ['yes', 'no']
         version_added: 2.0
+    cache_dir:
+        description:
+            - Local directory used to cache the iControl WSDLs between runs
+              and, with I(reuse_session), the iControl session id. Nothing is
+              cached when unset.
+        required: false
+        default: null
+        version_added: 2.1
+    reuse_session:
+        description:
+            - If C(yes), persist the iControl session id for this server and
+              user in I(cache_dir) and reuse it in later runs until it
+              expires. A cached session id the device no longer accepts
+              is replaced with a new one. Requires I(cache_dir).
+        required: false
+        default: 'no'
+        choices: ['yes', 'no']
+        version_added: 2.1
+    session_timeout:
+        description:
+            - Number of seconds a persisted session id may stay idle before
+              a new one is requested. Keep this below the session timeout
+              configured on the BIG-IP.
+        required: false
+        default: 300
+        version_added: 2.1
     state:
         description:
             - Pool member state
@@ -87,15 +113,15 @@ options:
         aliases: []
     host:
         description:
-            - Pool member IP
-        required: true
+            - Pool member IP. Required unless I(members) is given.
+        required: false
         default: null
         choices: []
         aliases: ['address', 'name']
     port:
         description:
-            - Pool member port
-        required: true
+            - Pool member port. Required unless I(members) is given.
+        required: false
         default: null
         choices: []
         aliases: []
@@ -127,6 +153,20 @@ options:
         default: null
         choices: []
         aliases: []
+    members:
+        description:
+            - List of pool members to reconcile in one run, as an alternative
+              to I(host) and I(port). Each item is a dictionary with C(host)
+              and C(port) keys and optionally C(connection_limit),
+              C(description), C(rate_limit), C(ratio) and C(state), which
+              defaults to the module I(state). The current members of the
+              pool are read once and all additions, removals and property
+              changes are applied as batched iControl calls.
+        required: false
+        default: null
+        choices: []
+        aliases: []
+        version_added: 2.1
 '''
 
 EXAMPLES = '''
@@ -180,6 +220,26 @@ EXAMPLES = '''
       host="{{ ansible_default_ipv4["address"] }}"
       port=80
 
+  - name: Reconcile many pool members at once
+    local_action:
+      module: bigip_pool_member
+      server: lb.mydomain.com
+      user: admin
+      password: mysecret
+      state: present
+      pool: matthite-pool
+      partition: matthite
+      members:
+        - host: 10.0.0.10
+          port: 80
+          ratio: 2
+        - host: 10.0.0.11
+          port: 80
+          description: "nginx server"
+        - host: 10.0.0.12
+          port: 80
+          state: absent
+
 '''
 
 try:
@@ -189,14 +249,136 @@ except ImportError:
 else:
     bigsuds_found = True
 
+import os
+import re
+import tempfile
+import time
+import hashlib
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 # ===========================================
 # bigip_pool_member module specific support methods.
 #
 
-def bigip_api(bigip, user, password):
-    api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+# faults returned for a session id the device does not know (anymore)
+INVALID_SESSION_RE = re.compile(r'session.*(invalid|not found|expired)', re.I)
+
+def bigip_api(bigip, user, password, cache_dir=None, reuse_session=False, session_timeout=300):
+    if cache_dir:
+        cache_dir = os.path.expanduser(cache_dir)
+        wsdl_dir = os.path.join(cache_dir, 'wsdl')
+        if not os.path.isdir(wsdl_dir):
+            os.makedirs(wsdl_dir, 0700)
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password, cachedir=wsdl_dir)
+    else:
+        api = bigsuds.BIGIP(hostname=bigip, username=user, password=password)
+    if reuse_session:
+        api = BigIPCachedSession(SessionCache(api, bigip, user, cache_dir, session_timeout))
     return api
 
+class SessionCache(object):
+    """iControl session id persisted per server and user in cache_dir.
+
+    A cached id is reused until it has been idle for session_timeout seconds.
+    As the device may have dropped it before that (reboot, shorter idle
+    timeout), the first call checks it: if the device rejects the session,
+    the entry is dropped and the call retried once with a new session id.
+    The expiry is pushed back after every successful call, so the id
+    expires session_timeout seconds after it was last used. The entry is
+    rewritten at most once a second, which keeps long runs cheap.
+    """
+
+    def __init__(self, api, bigip, user, cache_dir, session_timeout):
+        self.api = api
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.session_timeout = session_timeout
+        key = hashlib.sha1("%s|%s" % (bigip, user)).hexdigest()
+        self.path = os.path.join(self.cache_dir, "session_%s.json" % key)
+        self.checked = False
+        self.saved = 0
+        session_id = self.load()
+        self.cached = session_id is not None
+        if session_id is None:
+            session_id = api.System.Session.get_session_identifier()
+        self.session_id = session_id
+        self.session = api.with_session_id(session_id)
+
+    def load(self):
+        try:
+            f = open(self.path)
+            try:
+                entry = json.load(f)
+            finally:
+                f.close()
+            if entry['expires'] > time.time():
+                return entry['session_id']
+        except (IOError, ValueError, KeyError):
+            pass
+        return None
+
+    def save(self):
+        self.saved = time.time()
+        entry = {'session_id': self.session_id, 'expires': self.saved + self.session_timeout}
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        f = os.fdopen(fd, 'w')
+        try:
+            json.dump(entry, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.path)
+
+    def drop(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def renew(self):
+        self.drop()
+        self.session_id = self.api.System.Session.get_session_identifier()
+        self.session = self.api.with_session_id(self.session_id)
+        self.cached = False
+
+    def call(self, path, args, kwargs):
+        try:
+            result = self.resolve(path)(*args, **kwargs)
+        except (bigsuds.ServerError, bigsuds.ConnectionError), e:
+            if self.checked or not self.cached or not INVALID_SESSION_RE.search(str(e)):
+                raise
+            # the request was refused, so it is safe to send it again
+            self.renew()
+            result = self.resolve(path)(*args, **kwargs)
+        self.checked = True
+        if time.time() - self.saved >= 1:
+            self.save()
+        return result
+
+    def resolve(self, path):
+        method = self.session
+        for name in path:
+            method = getattr(method, name)
+        return method
+
+class BigIPCachedSession(object):
+    """Stand-in for a bigsuds BIGIP instance running its calls through a
+    SessionCache, e.g. api.LocalLB.Pool.get_list().
+    """
+
+    def __init__(self, cache, path=()):
+        self._cache = cache
+        self._path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return BigIPCachedSession(self._cache, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        return self._cache.call(self._path, args, kwargs)
+
 def disable_ssl_cert_validation():
     # You probably only want to do this for testing and never in production.
     # From https://www.python.org/dev/peps/pep-0476/#id29
@@ -290,6 +472,113 @@ def set_ratio(api, pool, address, port, ratio):
     members = [{'address': address, 'port': port}]
     api.LocalLB.Pool.set_member_ratio(pool_names=[pool], members=[members], ratios=[[ratio]])
 
+MEMBER_PROPERTIES = {
+    'connection_limit': ('get_member_connection_limit', 'set_member_connection_limit', 'limits'),
+    'description': ('get_member_description', 'set_member_description', 'descriptions'),
+    'rate_limit': ('get_member_rate_limit', 'set_member_rate_limit', 'limits'),
+    'ratio': ('get_member_ratio', 'set_member_ratio', 'ratios'),
+}
+
+def get_pool_members(api, pool):
+    members = api.LocalLB.Pool.get_member_v2(pool_names=[pool])[0]
+    return set([(x['address'], x['port']) for x in members])
+
+def member_list(members):
+    return [{'address': address, 'port': port} for address, port in members]
+
+def remove_pool_members(api, pool, members):
+    api.LocalLB.Pool.remove_member_v2(pool_names=[pool], members=[member_list(members)])
+
+def add_pool_members(api, pool, members):
+    api.LocalLB.Pool.add_member_v2(pool_names=[pool], members=[member_list(members)])
+
+def get_member_properties(api, pool, members, prop):
+    getter = MEMBER_PROPERTIES[prop][0]
+    values = getattr(api.LocalLB.Pool, getter)(pool_names=[pool], members=[member_list(members)])[0]
+    return dict(zip(members, values))
+
+def set_member_properties(api, pool, prop, changes):
+    setter, argument = MEMBER_PROPERTIES[prop][1:]
+    members = [x[0] for x in changes]
+    values = [x[1] for x in changes]
+    kwargs = {'pool_names': [pool], 'members': [member_list(members)], argument: [values]}
+    getattr(api.LocalLB.Pool, setter)(**kwargs)
+
+def parse_members(module, partition, members, default_state):
+    desired = {}
+    for item in members:
+        if not isinstance(item, dict):
+            module.fail_json(msg="each item in members must be a dictionary")
+        host = item.get('host', item.get('address', item.get('name')))
+        port = item.get('port')
+        if host is None or port is None:
+            module.fail_json(msg="each item in members must have host and port")
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            module.fail_json(msg="invalid port for member %s: %s" % (host, port))
+        if 1 > port or port > 65535:
+            module.fail_json(msg="valid ports must be in range 1 - 65535")
+        state = item.get('state', default_state)
+        if state not in ('present', 'absent'):
+            module.fail_json(msg="member state must be present or absent")
+        entry = {'state': state}
+        for prop in MEMBER_PROPERTIES:
+            if item.get(prop) is not None:
+                if prop == 'description':
+                    entry[prop] = str(item[prop])
+                else:
+                    try:
+                        entry[prop] = int(item[prop])
+                    except (TypeError, ValueError):
+                        module.fail_json(msg="%s for member %s must be an integer" % (prop, host))
+        key = ("/%s/%s" % (partition, host), port)
+        if key in desired:
+            module.fail_json(msg="member %s:%s is listed more than once" % (host, port))
+        desired[key] = entry
+    return desired
+
+def reconcile_members(api, pool, desired, check_mode):
+    current = get_pool_members(api, pool)
+    adds = [x for x in desired if desired[x]['state'] == 'present' and x not in current]
+    removes = [x for x in desired if desired[x]['state'] == 'absent' and x in current]
+    existing = [x for x in desired if desired[x]['state'] == 'present' and x in current]
+
+    changes = {}
+    for prop in MEMBER_PROPERTIES:
+        wanted = [x for x in adds + existing if prop in desired[x]]
+        if not wanted:
+            continue
+        values = {}
+        checked = [x for x in existing if prop in desired[x]]
+        if checked:
+            values = get_member_properties(api, pool, checked, prop)
+        changed = [(x, desired[x][prop]) for x in wanted
+                   if x not in values or values[x] != desired[x][prop]]
+        if changed:
+            changes[prop] = changed
+
+    modified = set()
+    for prop in changes:
+        modified.update([x[0] for x in changes[prop] if x[0] in current])
+
+    if not check_mode:
+        if removes:
+            remove_pool_members(api, pool, removes)
+            for address in set([x[0] for x in removes]):
+                delete_node_address(api, address)
+        if adds:
+            add_pool_members(api, pool, adds)
+        for prop in changes:
+            set_member_properties(api, pool, prop, changes[prop])
+
+    def names(members):
+        return sorted(["%s:%s" % x for x in members])
+
+    return {'changed': bool(adds or removes or modified),
+            'added': names(adds), 'removed': names(removes),
+            'modified': names(modified)}
+
 def main():
     module = AnsibleModule(
         argument_spec = dict(
@@ -297,16 +586,22 @@ def main():
             user = dict(type='str', required=True),
             password = dict(type='str', required=True),
             validate_certs = dict(default='yes', type='bool'),
+            cache_dir = dict(type='str'),
+            reuse_session = dict(type='bool', default=False),
+            session_timeout = dict(type='int', default=300),
             state = dict(type='str', default='present', choices=['present', 'absent']),
             pool = dict(type='str', required=True),
             partition = dict(type='str', default='Common'),
-            host = dict(type='str', required=True, aliases=['address', 'name']),
-            port = dict(type='int', required=True),
+            host = dict(type='str', aliases=['address', 'name']),
+            port = dict(type='int'),
             connection_limit = dict(type='int'),
             description = dict(type='str'),
             rate_limit = dict(type='int'),
-            ratio = dict(type='int')
+            ratio = dict(type='int'),
+            members = dict(type='list')
         ),
+        mutually_exclusive=[['members', 'host'], ['members', 'port']],
+        required_one_of=[['members', 'host']],
         supports_check_mode=True
     )
 
@@ -317,6 +612,9 @@ def main():
     user = module.params['user']
     password = module.params['password']
     validate_certs = module.params['validate_certs']
+    cache_dir = module.params['cache_dir']
+    reuse_session = module.params['reuse_session']
+    session_timeout = module.params['session_timeout']
     state = module.params['state']
     partition = module.params['partition']
     pool = "/%s/%s" % (partition, module.params['pool'])
@@ -327,25 +625,35 @@ def main():
     host = module.params['host']
     address = "/%s/%s" % (partition, host)
     port = module.params['port']
+    members = module.params['members']
+
+    if reuse_session and not cache_dir:
+        module.fail_json(msg="reuse_session requires cache_dir")
 
     if not validate_certs:
         disable_ssl_cert_validation()
 
     # sanity check user supplied values
 
-    if (host and not port) or (port and not host):
-        module.fail_json(msg="both host and port must be supplied")
+    if members is not None:
+        desired = parse_members(module, partition, members, state)
+    else:
+        if (host and not port) or (port and not host):
+            module.fail_json(msg="both host and port must be supplied")
 
-    if 1 > port > 65535:
-        module.fail_json(msg="valid ports must be in range 1 - 65535")
+        if 1 > port > 65535:
+            module.fail_json(msg="valid ports must be in range 1 - 65535")
 
     try:
-        api = bigip_api(server, user, password)
+        api = bigip_api(server, user, password, cache_dir, reuse_session, session_timeout)
         if not pool_exists(api, pool):
             module.fail_json(msg="pool %s does not exist" % pool)
         result = {'changed': False}  # default
 
-        if state == 'absent':
+        if members is not None:
+            result = reconcile_members(api, pool, desired, module.check_mode)
+
+        elif state == 'absent':
             if member_exists(api, pool, address, port):
                 if not module.check_mode:
                     remove_pool_member(api, pool, address, port)
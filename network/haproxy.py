@@ -31,6 +31,9 @@ description:
     - The Disable Haproxy Backend Server, with
       supports get current weight for server (default) and
       shutdown sessions while disabling backend host server.
+
+    - The Haproxy Facts state, which parses C(show stat) into typed
+      frontend, backend and server records returned as C(haproxy_stats).
 notes:
     - "enable or disable commands are restricted and can only be issued on sockets configured for level 'admin', "
     - "Check - http://haproxy.1wt.eu/download/1.5/doc/configuration.txt, "
@@ -39,23 +42,39 @@ options:
   state:
     description:
       - describe the desired state of the given host in lb pool.
+        C(facts) (added in 2.1) only reads the statistics and returns them
+        as C(haproxy_stats) facts.
     required: true
     default: null
-    choices: [ "enabled", "disabled" ]
+    choices: [ "enabled", "disabled", "facts" ]
   host:
     description:
-      - Host (backend) to operate in Haproxy.
-    required: true
+      - Host (backend) to operate in Haproxy. Required unless I(state=facts),
+        where it restricts the facts to this server and the backends that
+        contain it.
+    required: false
     default: null
   socket:
     description:
       - Haproxy socket file name with path.
     required: false
     default: /var/run/haproxy.sock
+  sockets:
+    description:
+      - List of Haproxy socket files, for instance one stats socket per process
+        when haproxy runs with C(nbproc) > 1. Entries may be shell globs.
+        The change is applied to every socket concurrently and the per-socket
+        results are returned in C(results). Overrides I(socket) when given.
+        With I(state=facts), C(haproxy_stats) is keyed by socket path.
+    required: false
+    default: null
+    version_added: "2.1"
   backend:
     description:
       - Name of the haproxy backend pool.
-        Required, else auto-detection applied.
+        Required, else auto-detection applied. Auto-detection runs
+        C(show stat) once and only targets the backends that contain I(host).
+        With I(state=facts), restricts the facts to this backend.
     required: false
     default: auto-detected
   weight:
@@ -68,6 +87,29 @@ options:
       - When disabling server, immediately terminate all the sessions attached to the specified server. This can be used to terminate long-running sessions after a server is put into maintenance mode, for instance.
     required: false
     default: false
+  wait:
+    description:
+      - When disabling server, wait until its current sessions (C(scur)) and
+        queued requests (C(qcur)) reach zero in every targeted backend before
+        returning. Fails if the server has not drained after I(wait_timeout).
+        The time taken and the number of C(show stat) samples are returned in
+        C(drain_duration) and C(drain_samples).
+    required: false
+    default: false
+    version_added: "2.1"
+  wait_interval:
+    description:
+      - Number of seconds between two C(show stat) samples while waiting.
+        Must be greater than 0.
+    required: false
+    default: 1
+    version_added: "2.1"
+  wait_timeout:
+    description:
+      - Number of seconds to wait for the server to drain.
+    required: false
+    default: 30
+    version_added: "2.1"
 '''
 
 EXAMPLES = '''
@@ -85,6 +127,16 @@ examples:
 # disable backend server in 'www' backend pool and drop open sessions to it
 - haproxy: state=disabled host={{ inventory_hostname }} backend=www socket=/var/run/haproxy.sock shutdown_sessions=true
 
+# disable server on every haproxy process, one stats socket per process
+- haproxy: state=disabled host={{ inventory_hostname }} backend=www sockets=/var/run/haproxy-*.sock
+
+# disable server and wait up to 60 seconds for its sessions to drain
+- haproxy: state=disabled host={{ inventory_hostname }} backend=www wait=yes wait_timeout=60
+
+# gather the statistics of the 'www' backend and its servers
+- haproxy: state=facts backend=www
+- debug: msg="{{ haproxy_stats.backends.www.servers.web1.scur }} sessions on web1"
+
 # enable server in 'www' backend pool
 - haproxy: state=enabled host={{ inventory_hostname }} backend=www
 
@@ -94,17 +146,28 @@ examples:
 author: Ravi Bhure <ravibhure@gmail.com>
 '''
 
+import glob
 import socket
+import threading
+import time
 
 
 DEFAULT_SOCKET_LOCATION="/var/run/haproxy.sock"
 RECV_SIZE = 1024
-ACTION_CHOICES = ['enabled', 'disabled']
+PROMPT = '\n> '
+ACTION_CHOICES = ['enabled', 'disabled', 'facts']
+# 'show stat' columns that hold text, every other column is numeric
+STAT_STRING_FIELDS = frozenset(['pxname', 'svname', 'status', 'tracked', 'check_status',
+                                'last_chk', 'last_agt', 'agent_status', 'cookie', 'mode',
+                                'addr', 'algo', 'check_desc', 'agent_desc'])
 
 ######################################################################
 class TimeoutException(Exception):
   pass
 
+class HAProxyError(Exception):
+  pass
+
 class HAProxy(object):
     """
     Used for communicating with HAProxy through its local UNIX socket interface.
@@ -117,15 +180,21 @@ class HAProxy(object):
     http://haproxy.1wt.eu/download/1.5/doc/configuration.txt#Unix Socket commands
     """
 
-    def __init__(self, module):
+    def __init__(self, module, socket_path=None):
         self.module = module
 
         self.state = self.module.params['state']
         self.host = self.module.params['host']
         self.backend = self.module.params['backend']
         self.weight = self.module.params['weight']
-        self.socket = self.module.params['socket']
+        self.socket = socket_path or self.module.params['socket']
         self.shutdown_sessions = self.module.params['shutdown_sessions']
+        self.wait = self.module.params['wait']
+        self.wait_interval = float(self.module.params['wait_interval'])
+        self.wait_timeout = float(self.module.params['wait_timeout'])
+        self.backends = []
+        self.drain = {}
+        self.facts = {}
 
         self.command_results = []
 
@@ -135,6 +204,16 @@ class HAProxy(object):
         UNIX socket and waiting up to 'timeout' milliseconds for the response.
         """
 
+        result = self.query(cmd)
+        self.command_results = result.strip()
+        return result
+
+    def query(self, cmd):
+        """
+        Sends a single command and returns its raw response, without
+        recording it in the command results.
+        """
+
         self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self.client.connect(self.socket)
         self.client.sendall('%s\n' % cmd)
@@ -144,10 +223,77 @@ class HAProxy(object):
         while buf:
             result += buf
             buf = self.client.recv(RECV_SIZE)
-        self.command_results = result.strip()
         self.client.close()
         return result
 
+    def execute_pipelined(self, cmds):
+        """
+        Executes several HAProxy commands over a single connection. The
+        socket is switched to interactive 'prompt' mode, all commands are
+        sent at once and the responses are split on the prompt HAProxy
+        prints after each of them. Returns one response per command.
+        """
+
+        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client.connect(self.socket)
+        self.client.sendall('prompt\n%squit\n' % ''.join(['%s\n' % cmd for cmd in cmds]))
+        result = ''
+        buf = self.client.recv(RECV_SIZE)
+        while buf:
+            result += buf
+            buf = self.client.recv(RECV_SIZE)
+        self.client.close()
+        # the stream is PROMPT out1 PROMPT out2 ... PROMPT
+        responses = [x.strip() for x in ('\n' + result).split(PROMPT)[1:]]
+        responses = (responses + [''] * len(cmds))[:len(cmds)]
+        self.command_results = '\n'.join([x for x in responses if x])
+        return responses
+
+    def get_stat_rows(self):
+        """
+        Runs 'show stat' once and returns its rows as dicts keyed by the
+        CSV header columns.
+        """
+        output = self.query('show stat')
+        lines = output.lstrip('# ').strip().split('\n')
+        header = lines[0].split(',')
+        rows = []
+        for line in lines[1:]:
+            fields = line.split(',')
+            if len(fields) < len(header):
+                continue
+            rows.append(dict(zip(header, fields)))
+        return rows
+
+    def get_stat_index(self):
+        """
+        Runs 'show stat' once and returns a dict mapping every backend
+        name to the set of server names it contains.
+        """
+        index = {}
+        for row in self.get_stat_rows():
+            pxname = row['pxname']
+            svname = row['svname']
+            if svname == 'FRONTEND':
+                continue
+            servers = index.setdefault(pxname, set())
+            if svname != 'BACKEND':
+                servers.add(svname)
+        return index
+
+    def get_backends(self, svname):
+        """
+        Returns the backends to act on: the configured one, or every
+        backend that actually contains the server.
+        """
+        if self.backend is not None:
+            return [self.backend]
+        index = self.get_stat_index()
+        backends = sorted([pxname for pxname, servers in index.items() if svname in servers])
+        if not backends:
+            raise HAProxyError("server '%s' was not found in any backend" % svname)
+        return backends
+
     def enabled(self, host, backend, weight):
         """
         Enabled action, marks server to UP and checks are re-enabled,
@@ -155,28 +301,14 @@ class HAProxy(object):
         set the weight for haproxy backend server when provides.
         """
         svname = host
-        if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
-                    if weight:
-                        cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-                    self.execute(cmd)
-
-        else:
-            pxname = backend
-            cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
+        cmds = []
+        self.backends = self.get_backends(svname)
+        for pxname in self.backends:
+            cmds.append("get weight %s/%s" % (pxname, svname))
+            cmds.append("enable server %s/%s" % (pxname, svname))
             if weight:
-                cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-            self.execute(cmd)
+                cmds.append("set weight %s/%s %s" % (pxname, svname, weight))
+        self.execute_pipelined(cmds)
 
     def disabled(self, host, backend, shutdown_sessions):
         """
@@ -185,32 +317,82 @@ class HAProxy(object):
         also it shutdown sessions while disabling backend host server.
         """
         svname = host
-        if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
-                    if shutdown_sessions:
-                        cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-                    self.execute(cmd)
-
-        else:
-            pxname = backend
-            cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
+        cmds = []
+        self.backends = self.get_backends(svname)
+        for pxname in self.backends:
+            cmds.append("get weight %s/%s" % (pxname, svname))
+            cmds.append("disable server %s/%s" % (pxname, svname))
             if shutdown_sessions:
-                cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-            self.execute(cmd)
+                cmds.append("shutdown sessions server %s/%s" % (pxname, svname))
+        self.execute_pipelined(cmds)
 
-    def act(self):
+    def wait_for_drain(self, host, backends):
         """
-        Figure out what you want to do from ansible, and then do it.
+        Polls 'show stat' at most once every wait_interval seconds until the
+        server has no current sessions and no queued requests left in any of
+        the backends, or until wait_timeout expires. A backend without a row
+        for the server is an error, not a drained server.
+        """
+        start = time.time()
+        deadline = start + self.wait_timeout
+        samples = 0
+        while True:
+            active = 0
+            seen = set()
+            for row in self.get_stat_rows():
+                if row['svname'] == host and row['pxname'] in backends:
+                    active += int(row['scur'] or 0) + int(row['qcur'] or 0)
+                    seen.add(row['pxname'])
+            missing = [pxname for pxname in backends if pxname not in seen]
+            if missing:
+                raise HAProxyError("server '%s' was not found in the stats of backend %s"
+                                   % (host, ", ".join(missing)))
+            samples += 1
+            now = time.time()
+            if active == 0 or now >= deadline:
+                break
+            # keep to a fixed sampling rate regardless of how long show stat took
+            time.sleep(max(0, min(start + samples * self.wait_interval, deadline) - now))
+
+        self.drain = dict(drained=active == 0, drain_duration=round(time.time() - start, 3),
+                          drain_samples=samples)
+        if active:
+            raise HAProxyError("server '%s' still has %d active sessions after %s seconds"
+                               % (host, active, self.wait_timeout))
+
+    def gather_facts(self, host, backend):
+        """
+        Parses 'show stat' into typed records, grouped into frontends and
+        backends, each backend carrying its servers. Empty columns are left
+        out and the names are only used as keys, to keep the facts compact.
+        Filtering by backend or server drops the frontends.
+        """
+        frontends = {}
+        backends = {}
+        for row in self.get_stat_rows():
+            pxname = row.pop('pxname')
+            svname = row.pop('svname')
+            if backend is not None and pxname != backend:
+                continue
+            if svname not in ('FRONTEND', 'BACKEND') and host is not None and svname != host:
+                continue
+            record = typed_record(row)
+            if svname == 'FRONTEND':
+                if backend is None and host is None:
+                    frontends[pxname] = record
+            elif svname == 'BACKEND':
+                backends.setdefault(pxname, dict(servers={})).update(record)
+            else:
+                backends.setdefault(pxname, dict(servers={}))['servers'][svname] = record
+
+        if host is not None:
+            backends = dict([(k, v) for k, v in backends.items() if v['servers']])
+        self.facts = dict(frontends=frontends, backends=backends)
+        return self.facts
+
+    def run(self):
+        """
+        Applies the requested state change through this instance's socket.
         """
 
         # toggle enable/disbale server
@@ -219,11 +401,107 @@ class HAProxy(object):
 
         elif self.state == 'disabled':
             self.disabled(self.host, self.backend, self.shutdown_sessions)
+            if self.wait:
+                self.wait_for_drain(self.host, self.backends)
 
-        else:
-            self.module.fail_json(msg="unknown state specified: '%s'" % self.state)
+        elif self.state == 'facts':
+            self.gather_facts(self.host, self.backend)
+
+        return self.command_results
+
+    def act(self):
+        """
+        Figure out what you want to do from ansible, and then do it.
+        """
 
-        self.module.exit_json(stdout=self.command_results, changed=True)
+        if self.state not in ACTION_CHOICES:
+            self.module.fail_json(msg="unknown state specified: '%s'" % self.state)
+        if self.state != 'facts' and not self.host:
+            self.module.fail_json(msg="host is required for state=%s" % self.state)
+        changed = self.state != 'facts'
+
+        if not self.module.params['sockets']:
+            try:
+                self.run()
+            except (HAProxyError, socket.error), e:
+                self.module.fail_json(msg=str(e), stdout=self.command_results or "", **self.drain)
+            if self.state == 'facts':
+                self.module.exit_json(changed=False, ansible_facts=dict(haproxy_stats=self.facts))
+            self.module.exit_json(stdout=self.command_results, changed=True, **self.drain)
+
+        results = run_on_sockets(self.module, expand_sockets(self.module.params['sockets']))
+        facts = dict([(r['socket'], r.pop('facts')) for r in results])
+        failed = [r for r in results if r['failed']]
+        stdout = '\n'.join([r['stdout'] for r in results if r['stdout']])
+        if failed:
+            self.module.fail_json(msg="failed on %d of %d sockets" % (len(failed), len(results)),
+                                  stdout=stdout, results=results)
+        if self.state == 'facts':
+            self.module.exit_json(changed=False, results=results,
+                                  ansible_facts=dict(haproxy_stats=facts))
+        self.module.exit_json(stdout=stdout, results=results, changed=changed)
+
+def typed_record(row):
+    """
+    Converts a 'show stat' row to its typed, compact form: numeric columns
+    become integers and empty columns are dropped.
+    """
+    record = {}
+    for key, value in row.items():
+        if value == '' or not key:
+            continue
+        if key not in STAT_STRING_FIELDS:
+            try:
+                value = int(value)
+            except ValueError:
+                pass
+        record[key] = value
+    return record
+
+def expand_sockets(patterns):
+    """
+    Expands socket globs, keeping unmatched literal paths so that a missing
+    socket is reported rather than silently skipped.
+    """
+    sockets = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches and not glob.has_magic(pattern):
+            matches = [pattern]
+        for path in matches:
+            if path not in sockets:
+                sockets.append(path)
+    return sockets
+
+def run_on_sockets(module, sockets):
+    """
+    Runs the state change against every socket at once, one thread per
+    haproxy process, and returns the per-socket results in socket order.
+    """
+    if not sockets:
+        module.fail_json(msg="no haproxy sockets matched %s" % module.params['sockets'])
+
+    results = [dict(socket=path, stdout='', failed=False) for path in sockets]
+
+    def worker(result):
+        haproxy = HAProxy(module, result['socket'])
+        try:
+            haproxy.run()
+        except Exception, e:
+            # not only HAProxyError and socket.error, e.g. 'show stat'
+            # output that does not parse must not pass for success
+            result['failed'] = True
+            result['msg'] = str(e)
+        result['stdout'] = haproxy.command_results or ''
+        result['facts'] = haproxy.facts
+        result.update(haproxy.drain)
+
+    threads = [threading.Thread(target=worker, args=(result,)) for result in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
 
 def main():
 
@@ -231,11 +509,15 @@ def main():
     module = AnsibleModule(
         argument_spec = dict(
             state = dict(required=True, default=None, choices=ACTION_CHOICES),
-            host=dict(required=True, default=None),
+            host=dict(required=False, default=None),
             backend=dict(required=False, default=None),
             weight=dict(required=False, default=None),
             socket = dict(required=False, default=DEFAULT_SOCKET_LOCATION),
+            sockets = dict(required=False, default=None, type='list'),
             shutdown_sessions=dict(required=False, default=False),
+            wait=dict(required=False, default=False, type='bool'),
+            wait_interval=dict(required=False, default=1, type='float'),
+            wait_timeout=dict(required=False, default=30, type='float'),
         ),
 
     )
@@ -243,6 +525,9 @@ def main():
     if not socket:
         module.fail_json(msg="unable to locate haproxy socket")
 
+    if module.params['wait_interval'] <= 0:
+        module.fail_json(msg="wait_interval must be greater than 0, got %s" % module.params['wait_interval'])
+
     ansible_haproxy = HAProxy(module)
     ansible_haproxy.act()
 
@@ -15,6 +15,12 @@
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
 import subprocess
+from xml.etree import cElementTree as ElementTree
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
 
 DOCUMENTATION = '''
 ---
@@ -23,17 +29,36 @@ version_added: 1.6
 short_description: get details reported by lldp
 description:
   - Reads data out of lldpctl
-options: {}
+  - Besides the C(lldp) facts, returns C(lldp_neighbors), a flat index of
+    every interface to the list of its neighbors, each neighbor being a
+    dict of keys like C(chassis_name), C(chassis_mgmt_ip), C(port_ifname)
+    or C(port_descr).
+options:
+  format:
+    description:
+      - Output format requested from lldpctl. The output is parsed while
+        lldpctl writes it for C(keyvalue) and C(xml); C(json) output is
+        read in one go. C(json) and C(xml) need a lldpctl supporting them.
+    required: false
+    default: keyvalue
+    choices: [ "keyvalue", "json", "xml" ]
+    version_added: "2.1"
+  interfaces:
+    description:
+      - Only return the neighbors seen on these interfaces.
+    required: false
+    default: null
+    version_added: "2.1"
 author: Andy Hill
 notes:
-  - Requires lldpd running and lldp enabled on switches 
+  - Requires lldpd running and lldp enabled on switches
 '''
 
 EXAMPLES = '''
 # Retrieve switch/port information
  - name: Gather information from lldp
    lldp:
- 
+
  - name: Print each switch/port
    debug: msg="{{ lldp[item]['chassis']['name'] }} / {{ lldp[item]['port']['ifalias'] }}
    with_items: lldp.keys()
@@ -43,41 +68,165 @@ EXAMPLES = '''
 # ok: [10.13.0.22] => (item=eth1) => {"item": "eth1", "msg": "switch2.example.com / Gi0/3"}
 # ok: [10.13.0.22] => (item=eth0) => {"item": "eth0", "msg": "switch3.example.com / Gi0/3"}
 
+# Only look at the uplinks, using the XML output
+ - lldp: format=xml interfaces=eth0,eth1
+
+ - debug: msg="{{ item.key }} -> {{ item.value[0].chassis_name }}"
+   with_dict: lldp_neighbors
+
 '''
 
-def gather_lldp():
-    cmd = ['lldpctl', '-f', 'keyvalue']
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-    (output, err) = proc.communicate()
-    if output:
-        output_dict = {}
-        lldp_entries = output.split("\n")
-
-        for entry in lldp_entries:
-            if entry.startswith('lldp'):
-                path, value = entry.strip().split("=", 1)
-                path = path.split(".")
-                path_components, final = path[:-1], path[-1]
-
-            current_dict = output_dict
-            for path_component in path_components:
-                current_dict[path_component] = current_dict.get(path_component, {})
-                current_dict = current_dict[path_component]
-            current_dict[final] = value
-        return output_dict
-            
+class LldpIndex(object):
+    """
+    Builds the nested lldp facts and the flat interface to neighbors index
+    from (path, value) pairs, where path is the list of components of a
+    keyvalue key such as lldp.eth0.chassis.name.
+    """
 
-def main():
-    module = AnsibleModule({})
+    def __init__(self, interfaces=None):
+        self.interfaces = interfaces
+        self.facts = {}
+        self.neighbors = {}
+        self.last = None
+
+    def add(self, path, value):
+        self.last = None
+        if len(path) < 3 or path[0] != 'lldp':
+            return
+        interface = path[1]
+        if self.interfaces and interface not in self.interfaces:
+            return
+
+        current_dict = self.facts
+        for path_component in path[:-1]:
+            current_dict = current_dict.setdefault(path_component, {})
+            if not isinstance(current_dict, dict):
+                return
+        current_dict[path[-1]] = value
+
+        # 'via' opens the record of every neighbor of an interface
+        neighbors = self.neighbors.setdefault(interface, [])
+        if not neighbors or path[2] == 'via':
+            neighbors.append({})
+        key = '_'.join(path[2:]).replace('-', '_')
+        neighbors[-1][key] = value
+        self.last = (current_dict, path[-1], neighbors[-1], key)
+
+    def extend(self, text):
+        """
+        Appends a continuation line to the value added last.
+        """
+        if self.last is None:
+            return
+        current_dict, final, neighbor, key = self.last
+        current_dict[final] += '\n' + text
+        neighbor[key] = current_dict[final]
+
+def parse_keyvalue(stream, index):
+    for line in iter(stream.readline, ''):
+        line = line.rstrip('\n')
+        if line.startswith('lldp.') and '=' in line:
+            path, value = line.split('=', 1)
+            index.add(path.split('.'), value)
+        else:
+            # values spanning several lines go on without a key
+            index.extend(line)
 
-    lldp_output = gather_lldp()
+def parse_xml(stream, index):
+    path = []
+    for event, elem in ElementTree.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            path.append(elem.get('name') or elem.get('type') or elem.tag)
+            # 'via' first, it opens a neighbor record
+            for attr in sorted(elem.attrib, key=lambda k: k != 'via'):
+                value = elem.attrib[attr]
+                if attr not in ('name', 'type', 'label'):
+                    index.add(path + [attr], value)
+        else:
+            if elem.text and elem.text.strip():
+                index.add(list(path), elem.text.strip())
+            path.pop()
+            # keep memory bounded to one interface
+            if elem.tag == 'interface':
+                elem.clear()
+
+def json_pairs(path, node):
+    """
+    Turns the lldpctl json output into the (path, value) pairs its keyvalue
+    output would give.
+    """
+    if isinstance(node, list):
+        for item in node:
+            for pair in json_pairs(path, item):
+                yield pair
+    elif isinstance(node, dict):
+        if 'type' in node and 'value' in node:
+            yield path[:-1] + [node['type']], node['value']
+            return
+        # 'via' first, it opens a neighbor record
+        for key in sorted(node, key=lambda k: k != 'via'):
+            value = node[key]
+            if key == 'interface':
+                for item in isinstance(value, list) and value or [value]:
+                    for name, body in item.items():
+                        for pair in json_pairs(path + [name], body):
+                            yield pair
+            elif key == 'chassis' and isinstance(value, dict) and len(value) == 1 and 'id' not in value:
+                name, body = value.items()[0]
+                yield path + [key, 'name'], name
+                for pair in json_pairs(path + [key], body):
+                    yield pair
+            elif key == 'capability':
+                for capability in isinstance(value, list) and value or [value]:
+                    for attr, attr_value in capability.items():
+                        if attr != 'type':
+                            for pair in json_pairs(path + [capability.get('type', key), attr], attr_value):
+                                yield pair
+            else:
+                for pair in json_pairs(path + [key], value):
+                    yield pair
+    else:
+        if isinstance(node, bool):
+            node = node and 'on' or 'off'
+        yield path, unicode(node)
+
+def parse_json(stream, index):
+    data = json.load(stream)
+    for path, value in json_pairs(['lldp'], data.get('lldp', {})):
+        index.add(path, value)
+
+PARSERS = dict(keyvalue=parse_keyvalue, json=parse_json, xml=parse_xml)
+
+def gather_lldp(module):
+    cmd = [module.get_bin_path('lldpctl', True), '-f', module.params['format']]
+    index = LldpIndex(module.params['interfaces'])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    error = None
     try:
-        data = {'lldp': lldp_output['lldp']}
-        module.exit_json(ansible_facts=data)
-    except TypeError:
-        module.fail_json(msg="lldpctl command failed. is lldpd running?")    
-   
+        PARSERS[module.params['format']](proc.stdout, index)
+    except (ValueError, SyntaxError), e:
+        error = e
+        proc.stdout.read()
+    err = proc.stderr.read()
+    if proc.wait() != 0:
+        module.fail_json(msg="lldpctl command failed. is lldpd running?", stderr=err)
+    if error is not None:
+        module.fail_json(msg="unable to parse lldpctl %s output: %s" % (module.params['format'], error))
+    return index
+
+def main():
+    module = AnsibleModule(
+        argument_spec = dict(
+            format = dict(required=False, default='keyvalue', choices=PARSERS.keys()),
+            interfaces = dict(required=False, default=None, type='list'),
+        ),
+        supports_check_mode = True
+    )
+
+    index = gather_lldp(module)
+    data = {'lldp': index.facts.get('lldp', {}), 'lldp_neighbors': index.neighbors}
+    module.exit_json(ansible_facts=data)
+
 # import module snippets
 from ansible.module_utils.basic import *
 main()
-
@@ -29,9 +29,18 @@ description:
     - Manage Open vSwitch bridges
 options:
     bridge:
-        required: true
+        required: false
+        description:
+            - Name of bridge to manage. Required unless I(bridges) is given.
+    bridges:
+        required: false
+        version_added: 2.1
         description:
-            - Name of bridge to manage
+            - List of bridges to manage together, each one a name or a dict
+              with C(bridge) and optional C(state) keys (defaulting to
+              I(state)). The existing bridges are read with one ovs-vsctl
+              call and all the changes are applied as a single ovs-vsctl
+              transaction. Mutually exclusive with I(bridge).
     state:
         required: false
         default: "present"
@@ -48,8 +57,20 @@ options:
 EXAMPLES = '''
 # Create a bridge named br-int
 - openvswitch_bridge: bridge=br-int state=present
+
+# Create br-int and br-ex and remove br-old in one transaction
+- openvswitch_bridge:
+    bridges:
+      - br-int
+      - br-ex
+      - { bridge: br-old, state: absent }
 '''
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 
 class OVSBridge(object):
     def __init__(self, module):
@@ -113,16 +134,81 @@ class OVSBridge(object):
         self.module.exit_json(changed=changed)
 
 
+class OVSBridges(object):
+    def __init__(self, module):
+        self.module = module
+        self.state = module.params['state']
+        self.timeout = module.params['timeout']
+        self.bridges = []
+        for item in module.params['bridges']:
+            if not isinstance(item, dict):
+                item = {'bridge': item}
+            if not item.get('bridge'):
+                module.fail_json(msg="every entry of bridges needs a bridge")
+            state = item.get('state', self.state)
+            if state not in ('present', 'absent'):
+                module.fail_json(msg="invalid state %s for bridge %s" % (state, item['bridge']))
+            self.bridges.append((item['bridge'], state))
+
+    def _vsctl(self, command):
+        '''Run ovs-vsctl command'''
+        return self.module.run_command(['ovs-vsctl', '-t', str(self.timeout)] + command)
+
+    def existing(self):
+        '''Read the names of all the bridges at once'''
+        rc, out, err = self._vsctl(['--format=json', '--columns=name', 'list', 'Bridge'])
+        if rc != 0:
+            raise Exception(err)
+        table = json.loads(out)
+        return set([row[0] for row in table['data']])
+
+    def plan(self):
+        '''Compute the ovs-vsctl commands bringing the bridges to their state'''
+        existing = self.existing()
+        added, removed, commands = [], [], []
+        for bridge, state in self.bridges:
+            if state == 'present' and bridge not in existing:
+                existing.add(bridge)
+                added.append(bridge)
+                commands += ['--', 'add-br', bridge]
+            elif state == 'absent' and bridge in existing:
+                existing.discard(bridge)
+                removed.append(bridge)
+                commands += ['--', 'del-br', bridge]
+        return added, removed, commands
+
+    def run(self):
+        '''Apply all the changes as a single transaction'''
+        if not self.bridges:
+            # an empty list has nothing to change
+            self.module.exit_json(changed=False, added=[], removed=[])
+        try:
+            added, removed, commands = self.plan()
+            if commands and not self.module.check_mode:
+                rc, _, err = self._vsctl(commands)
+                if rc != 0:
+                    raise Exception(err)
+        except Exception, e:
+            self.module.fail_json(msg=str(e))
+        self.module.exit_json(changed=bool(commands), added=added, removed=removed)
+
+
 def main():
     module = AnsibleModule(
         argument_spec={
-            'bridge': {'required': True},
+            'bridge': {'required': False},
+            'bridges': {'required': False, 'type': 'list'},
             'state': {'default': 'present', 'choices': ['present', 'absent']},
             'timeout': {'default': 5, 'type': 'int'}
         },
+        mutually_exclusive=[['bridge', 'bridges']],
+        required_one_of=[['bridge', 'bridges']],
         supports_check_mode=True,
     )
 
+    if module.params['bridges'] is not None:
+        OVSBridges(module).run()
+
     br = OVSBridge(module)
     if module.check_mode:
         br.check()
@@ -29,13 +29,25 @@ description:
     - Manage Open vSwitch ports
 options:
     bridge:
-        required: true
+        required: false
         description:
-            - Name of bridge to manage
+            - Name of bridge to manage. Required unless every entry of
+              I(ports) names its bridge.
     port:
-        required: true
+        required: false
+        description:
+            - Name of port to manage on the bridge. Required unless I(ports)
+              is given.
+    ports:
+        required: false
+        version_added: 2.1
         description:
-            - Name of port to manage on the bridge
+            - List of ports to manage together, each one a port name or a
+              dict with C(port) and optional C(bridge) and C(state) keys
+              (defaulting to I(bridge) and I(state)). The bridges and their
+              ports are read with one ovs-vsctl call and all the changes are
+              applied as a single ovs-vsctl transaction. Mutually exclusive
+              with I(port).
     state:
         required: false
         default: "present"
@@ -52,8 +64,22 @@ options:
 EXAMPLES = '''
 # Creates port eth2 on bridge br-ex
 - openvswitch_port: bridge=br-ex port=eth2 state=present
+
+# Plug eth2 and eth3 into br-ex, move vnet0 from br-int to br-ex
+- openvswitch_port:
+    bridge: br-ex
+    ports:
+      - eth2
+      - eth3
+      - { bridge: br-int, port: vnet0, state: absent }
+      - vnet0
 '''
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 
 class OVSPort(object):
     def __init__(self, module):
@@ -116,17 +142,99 @@ class OVSPort(object):
         self.module.exit_json(changed=changed)
 
 
+def ovs_uuids(cell):
+    '''Return the uuids of an ovsdb json cell holding one uuid or a set'''
+    if cell[0] == 'uuid':
+        return [cell[1]]
+    if cell[0] == 'set':
+        return [value for kind, value in cell[1] if kind == 'uuid']
+    return []
+
+
+class OVSPorts(object):
+    def __init__(self, module):
+        self.module = module
+        self.state = module.params['state']
+        self.timeout = module.params['timeout']
+        self.ports = []
+        for item in module.params['ports']:
+            if not isinstance(item, dict):
+                item = {'port': item}
+            bridge = item.get('bridge', module.params['bridge'])
+            state = item.get('state', self.state)
+            if not item.get('port') or not bridge:
+                module.fail_json(msg="every entry of ports needs a port and a bridge")
+            if state not in ('present', 'absent'):
+                module.fail_json(msg="invalid state %s for port %s" % (state, item['port']))
+            self.ports.append((bridge, item['port'], state))
+
+    def _vsctl(self, command):
+        '''Run ovs-vsctl command'''
+        return self.module.run_command(['ovs-vsctl', '-t', str(self.timeout)] + command)
+
+    def existing(self):
+        '''Read the ports of every bridge with a single ovs-vsctl call'''
+        rc, out, err = self._vsctl(['--format=json',
+                                    '--', '--columns=name,ports', 'list', 'Bridge',
+                                    '--', '--columns=_uuid,name', 'list', 'Port'])
+        if rc != 0:
+            raise Exception(err)
+        bridges, ports = [json.loads(line) for line in out.split('\n') if line.strip()]
+        port_names = dict([(ovs_uuids(uuid)[0], name) for uuid, name in ports['data']])
+        return dict([(name, set([port_names.get(uuid) for uuid in ovs_uuids(cell)]))
+                     for name, cell in bridges['data']])
+
+    def plan(self):
+        '''Compute the ovs-vsctl commands bringing the ports to their state'''
+        existing = self.existing()
+        added, removed, commands = [], [], []
+        for bridge, port, state in self.ports:
+            ports = existing.setdefault(bridge, set())
+            if state == 'present' and port not in ports:
+                ports.add(port)
+                added.append('%s/%s' % (bridge, port))
+                commands += ['--', 'add-port', bridge, port]
+            elif state == 'absent' and port in ports:
+                ports.discard(port)
+                removed.append('%s/%s' % (bridge, port))
+                commands += ['--', 'del-port', bridge, port]
+        return added, removed, commands
+
+    def run(self):
+        '''Apply all the changes as a single transaction'''
+        if not self.ports:
+            # an empty list has nothing to change
+            self.module.exit_json(changed=False, added=[], removed=[])
+        try:
+            added, removed, commands = self.plan()
+            if commands and not self.module.check_mode:
+                rc, _, err = self._vsctl(commands)
+                if rc != 0:
+                    raise Exception(err)
+        except Exception, e:
+            self.module.fail_json(msg=str(e))
+        self.module.exit_json(changed=bool(commands), added=added, removed=removed)
+
+
 def main():
     module = AnsibleModule(
         argument_spec={
-            'bridge': {'required': True},
-            'port': {'required': True},
+            'bridge': {'required': False},
+            'port': {'required': False},
+            'ports': {'required': False, 'type': 'list'},
             'state': {'default': 'present', 'choices': ['present', 'absent']},
             'timeout': {'default': 5, 'type': 'int'}
         },
+        mutually_exclusive=[['port', 'ports']],
+        required_one_of=[['port', 'ports']],
         supports_check_mode=True,
     )
 
+    if module.params['ports'] is not None:
+        OVSPorts(module).run()
+    if not module.params['bridge']:
+        module.fail_json(msg="bridge is required with port")
+
     port = OVSPort(module)
     if module.check_mode:
         port.check()
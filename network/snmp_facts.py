@@ -30,8 +30,64 @@ requirements:
 options:
     host:
         description:
-            - Set to target snmp server (normally {{inventory_hostname}})
-        required: true
+            - Set to target snmp server (normally {{inventory_hostname}}).
+              Required unless I(hosts) is given.
+        required: false
+    tables:
+        description:
+            - Extra tables to walk, as a dict of table names to dicts
+              mapping keys to column OIDs, for instance ifXTable 64-bit
+              counters or ENTITY-MIB and LLDP-MIB tables. The rows are
+              returned in C(ansible_snmp_tables), keyed by table name and
+              then by the index part of the OIDs. Extra tables are always
+              walked, I(include) only applies to the built in ones. A column
+              OID may not repeat one of a built in table that is collected,
+              such as ifHCInOctets and ifHCOutOctets under I(sample).
+        required: false
+        version_added: "2.1"
+    sample:
+        description:
+            - Read the 64-bit octet counters (ifHCInOctets, ifHCOutOctets)
+              and the error counters (ifInErrors, ifOutErrors) of every
+              interface twice, I(sample_interval) seconds apart, and return
+              the per second rates in C(ansible_interface_rates), keyed by
+              ifIndex, with the measured interval in
+              C(ansible_sample_interval). A 32-bit counter that wrapped
+              between the two samples is accounted for. No rates are
+              returned for a device whose sysUpTime went backwards, nor for
+              an interface whose counters were reset (a 64-bit counter that
+              went down or a changed ifCounterDiscontinuityTime).
+        default: false
+        required: false
+        version_added: "2.1"
+    sample_interval:
+        description:
+            - Number of seconds between the two counter samples.
+        default: 10
+        required: false
+        version_added: "2.1"
+    hosts:
+        description:
+            - List of snmp servers to poll concurrently from one module run.
+              Entries are addresses, or dicts with a C(host) key and optional
+              C(timeout) and C(retries) overriding the module level values.
+              The facts of every device are returned in C(hosts), keyed by
+              address; a device that could not be polled gets C(failed) and
+              C(msg) instead.
+        required: false
+        version_added: "2.1"
+    timeout:
+        description:
+            - Number of seconds to wait for a response before retrying.
+        default: 1
+        required: false
+        version_added: "2.1"
+    retries:
+        description:
+            - Number of times a request is retried after a timeout.
+        default: 5
+        required: false
+        version_added: "2.1"
     version:
         description:
             - SNMP Version to use, v2/v2c or v3
@@ -68,6 +124,23 @@ options:
         description:
             - Encryption key, required if version is authPriv
         required: false
+    include:
+        description:
+            - Tables to collect. C(system) reads the SNMPv2-MIB system group,
+              C(interfaces) walks ifTable (and ifAlias) and C(ipv4) walks
+              ipAddrTable.
+        choices: [ 'system', 'interfaces', 'ipv4' ]
+        default: [ 'system', 'interfaces', 'ipv4' ]
+        required: false
+        version_added: "2.1"
+    max_repetitions:
+        description:
+            - Number of rows requested per GETBULK when walking tables.
+              Larger values mean fewer round trips on devices with many
+              interfaces, at the cost of bigger responses.
+        default: 25
+        required: false
+        version_added: "2.1"
 '''
 
 EXAMPLES = '''
@@ -86,17 +159,62 @@ EXAMPLES = '''
     authkey=abc12345
     privkey=def6789
   delegate_to: localhost
+
+# Only walk the interface table, 50 rows per request
+- snmp_facts:
+    host={{ inventory_hostname }}
+    version=2c
+    community=public
+    include=interfaces
+    max_repetitions=50
+  connection: local
+
+# Also collect the 64-bit unicast packet counters and the physical entities
+- snmp_facts:
+    host: "{{ inventory_hostname }}"
+    version: v2c
+    community: public
+    tables:
+      ifx:
+        hc_in_ucast_pkts: 1.3.6.1.2.1.31.1.1.1.7
+        hc_out_ucast_pkts: 1.3.6.1.2.1.31.1.1.1.11
+        high_speed: 1.3.6.1.2.1.31.1.1.1.15
+      entities:
+        descr: 1.3.6.1.2.1.47.1.1.1.1.2
+        serial: 1.3.6.1.2.1.47.1.1.1.1.11
+  connection: local
+
+# Measure the interface throughput and error rates over 30 seconds
+- snmp_facts: host={{ inventory_hostname }} version=v2c community=public sample=yes sample_interval=30
+  connection: local
+
+# Poll a list of switches concurrently, giving the slow one more time
+- snmp_facts:
+    version: v2c
+    community: public
+    hosts:
+      - 10.0.0.1
+      - 10.0.0.2
+      - { host: 10.0.0.3, timeout: 5, retries: 2 }
+  register: switches
+  run_once: true
+  delegate_to: localhost
 '''
 
 from ansible.module_utils.basic import *
 from collections import defaultdict
+import re
+import time
 
 try:
     from pysnmp.entity.rfc3413.oneliner import cmdgen
+    from pysnmp.proto import rfc1905
     has_pysnmp = True
 except:
     has_pysnmp = False
 
+INCLUDE_CHOICES = ['system', 'interfaces', 'ipv4']
+
 class DefineOid(object):
 
     def __init__(self,dotprefix=False):
@@ -122,6 +240,11 @@ class DefineOid(object):
         self.ifAdminStatus = dp + "1.3.6.1.2.1.2.2.1.7"
         self.ifOperStatus  = dp + "1.3.6.1.2.1.2.2.1.8"
         self.ifAlias       = dp + "1.3.6.1.2.1.31.1.1.1.18"
+        self.ifInErrors    = dp + "1.3.6.1.2.1.2.2.1.14"
+        self.ifOutErrors   = dp + "1.3.6.1.2.1.2.2.1.20"
+        self.ifHCInOctets  = dp + "1.3.6.1.2.1.31.1.1.1.6"
+        self.ifHCOutOctets = dp + "1.3.6.1.2.1.31.1.1.1.10"
+        self.ifCounterDiscontinuityTime = dp + "1.3.6.1.2.1.31.1.1.1.19"
 
         # From IP-MIB
         self.ipAdEntAddr    = dp + "1.3.6.1.2.1.4.20.1.1"
@@ -129,6 +252,53 @@ class DefineOid(object):
         self.ipAdEntNetMask = dp + "1.3.6.1.2.1.4.20.1.3"
         
 
+class OidTable(object):
+    """
+    A group of OIDs collected together: scalars read with a single GET, or
+    the columns of a table walked with GETBULK. Every column maps its OID
+    to the key the value is stored under and an optional converter.
+    """
+
+    def __init__(self, name, columns, scalar=False):
+        self.name = name
+        self.columns = columns
+        self.scalar = scalar
+
+    def oids(self):
+        return [oid for oid, key, convert in self.columns]
+
+class OidRegistry(object):
+    """
+    Longest-prefix index from column OIDs to their table. A varbind is
+    dispatched by looking up its leading components for each distinct
+    column length, longest first, so the cost per varbind depends on the
+    number of distinct lengths and not on the number of tables or columns.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.columns = {}
+        lengths = set()
+        for table in tables:
+            for oid, key, convert in table.columns:
+                if oid in self.columns:
+                    raise ValueError("OID %s is collected by both %s and %s" % (oid, self.columns[oid][0].name, table.name))
+                self.columns[oid] = (table, key, convert)
+                lengths.add(oid.count('.') + 1)
+        self.lengths = sorted(lengths, reverse=True)
+
+    def lookup(self, oid):
+        """
+        Returns the (table, key, convert) column of an OID and the index
+        part of the OID, or (None, None) for an unknown OID.
+        """
+        parts = oid.split('.')
+        for length in self.lengths:
+            column = self.columns.get('.'.join(parts[:length]))
+            if column is not None:
+                return column, '.'.join(parts[length:])
+        return None, None
+
 def decode_hex(hexstring):
  
     if len(hexstring) < 3:
@@ -147,6 +317,83 @@ def decode_mac(hexstring):
     else:
         return hexstring
 
+def filter_table(prefixes, varTable):
+    """
+    Returns the (oid, value) pairs of a GETBULK response that belong to the
+    walked columns, and whether the walk should go on. The last response
+    usually runs past the end of the table, so varbinds outside their
+    column or carrying an exception value (endOfMibView, noSuchObject,
+    noSuchInstance) are dropped, and the walk ends on a row without any
+    varbind left.
+    """
+    end_of_column = (rfc1905.EndOfMibView, rfc1905.NoSuchObject, rfc1905.NoSuchInstance)
+    varbinds = []
+    more = False
+    for varBinds in varTable:
+        more = False
+        for idx, (oid, val) in enumerate(varBinds):
+            if isinstance(val, end_of_column):
+                continue
+            current_oid = oid.prettyPrint()
+            if not current_oid.startswith(prefixes[idx]):
+                continue
+            varbinds.append((current_oid, val.prettyPrint()))
+            more = True
+    return varbinds, more
+
+def poll_error(errorIndication, errorStatus):
+    if errorIndication:
+        return str(errorIndication)
+    return errorStatus.prettyPrint()
+
+def system_cb(sendRequestHandle, errorIndication, errorStatus, errorIndex, varBinds, poll):
+    if errorIndication or errorStatus:
+        poll['error'] = poll_error(errorIndication, errorStatus)
+        return
+    poll['system'].extend([(oid.prettyPrint(), val.prettyPrint()) for oid, val in varBinds])
+
+def table_cb(sendRequestHandle, errorIndication, errorStatus, errorIndex, varTable, cbCtx):
+    poll, name, prefixes = cbCtx
+    poll['times'].setdefault(name, time.time())
+    if errorIndication or errorStatus:
+        poll['error'] = poll_error(errorIndication, errorStatus)
+        return False
+    varbinds, more = filter_table(prefixes, varTable)
+    poll['varbinds'].extend(varbinds)
+    return more
+
+def poll_hosts(cmdGen, snmp_auth, hosts, registry, max_repetitions):
+    """
+    Queues the GET of the scalar tables and the GETBULK walks of the other
+    tables of every host on the asynchronous dispatcher and runs them all
+    at once, so polling many devices takes about as long as polling the
+    slowest one. Returns the raw varbinds (or the error) of each host,
+    keyed by address.
+    """
+    polls = {}
+    for host in hosts:
+        if host['host'] in polls:
+            continue
+        poll = polls[host['host']] = dict(system=[], varbinds=[], error=None, times={})
+        target = cmdgen.UdpTransportTarget((host['host'], 161), timeout=host['timeout'], retries=host['retries'])
+        for table in registry.tables:
+            if table.scalar:
+                cmdGen.asyncGetCmd(
+                    snmp_auth, target,
+                    [cmdgen.MibVariable('.' + oid,) for oid in table.oids()],
+                    (system_cb, poll)
+                )
+            else:
+                cmdGen.asyncBulkCmd(
+                    snmp_auth, target,
+                    0, max_repetitions,
+                    [cmdgen.MibVariable('.' + oid,) for oid in table.oids()],
+                    (table_cb, (poll, table.name, [oid + '.' for oid in table.oids()]))
+                )
+
+    cmdGen.snmpEngine.transportDispatcher.runDispatcher()
+    return polls
+
 def lookup_adminstatus(int_adminstatus):
     adminstatus_options = {
                             1: 'up',
@@ -173,10 +420,229 @@ def lookup_operstatus(int_operstatus):
     else:
         return ""
 
+def builtin_tables():
+    v = DefineOid(dotprefix=False)
+    return [
+        OidTable('system', [
+            (v.sysDescr, 'ansible_sysdescr', decode_hex),
+            (v.sysObjectId, 'ansible_sysobjectid', None),
+            (v.sysUpTime, 'ansible_sysuptime', None),
+            (v.sysContact, 'ansible_syscontact', None),
+            (v.sysName, 'ansible_sysname', None),
+            (v.sysLocation, 'ansible_syslocation', None),
+        ], scalar=True),
+        OidTable('interfaces', [
+            (v.ifIndex, 'ifindex', None),
+            (v.ifDescr, 'name', None),
+            (v.ifMtu, 'mtu', None),
+            (v.ifSpeed, 'speed', None),
+            (v.ifPhysAddress, 'mac', decode_mac),
+            (v.ifAdminStatus, 'adminstatus', lambda x: lookup_adminstatus(int(x))),
+            (v.ifOperStatus, 'operstatus', lambda x: lookup_operstatus(int(x))),
+            (v.ifAlias, 'description', None),
+        ]),
+        OidTable('ipv4', [
+            (v.ipAdEntAddr, 'address', None),
+            (v.ipAdEntIfIndex, 'interface', None),
+            (v.ipAdEntNetMask, 'netmask', None),
+        ]),
+        OidTable('counters', [
+            (v.ifHCInOctets, 'in_octets', int),
+            (v.ifHCOutOctets, 'out_octets', int),
+            (v.ifInErrors, 'in_errors', int),
+            (v.ifOutErrors, 'out_errors', int),
+            (v.ifCounterDiscontinuityTime, 'discontinuity', int),
+        ]),
+    ]
+
+def uptime_table():
+    """
+    The sysUpTime the sample mode reads along with the counters, to tell
+    an agent restart from a counter wrap.
+    """
+    v = DefineOid(dotprefix=False)
+    return OidTable('uptime', [(v.sysUpTime, 'uptime', None)], scalar=True)
+
+# counters sampled by the sample mode: (column key, counter width, rate key, multiplier)
+RATE_COLUMNS = [
+    ('in_octets', 64, 'in_bps', 8),
+    ('out_octets', 64, 'out_bps', 8),
+    ('in_errors', 32, 'in_errors_per_sec', 1),
+    ('out_errors', 32, 'out_errors_per_sec', 1),
+]
+
+def user_tables(module, tables):
+    """
+    Turns the tables option, a dict of table names to dicts of keys to
+    column OIDs, into OidTables.
+    """
+    result = []
+    for name, columns in sorted(tables.items()):
+        if name in [table.name for table in builtin_tables() + [uptime_table()]]:
+            module.fail_json(msg="table %s is built in, pick another name" % name)
+        if not isinstance(columns, dict) or not columns:
+            module.fail_json(msg="table %s must map keys to column OIDs" % name)
+        table_columns = []
+        for key, oid in sorted(columns.items()):
+            oid = str(oid).strip().lstrip('.')
+            if not re.match(r'^\d+(\.\d+)+$', oid):
+                module.fail_json(msg="invalid OID %s for %s in table %s" % (oid, key, name))
+            table_columns.append((oid, key, None))
+        result.append(OidTable(name, table_columns))
+    return result
+
+def oid_sort_key(oid):
+    return [int(x) for x in oid.split('.') if x]
+
+def table_rows(registry, poll):
+    """
+    Dispatches every varbind polled from one host to its table row through
+    the registry. Returns the rows of every table keyed by OID index.
+    """
+    rows = dict([(table.name, defaultdict(dict)) for table in registry.tables])
+    for current_oid, current_val in poll['system'] + poll['varbinds']:
+        column, index = registry.lookup(current_oid)
+        if column is None:
+            continue
+        table, key, convert = column
+        if convert is not None:
+            current_val = convert(current_val)
+        rows[table.name][index][key] = current_val
+    return rows
+
+def poll_uptime(poll):
+    """
+    Returns the sysUpTime, in hundredths of a second, read in a poll, or
+    None when the agent did not return it.
+    """
+    oid = DefineOid(dotprefix=False).sysUpTime
+    for current_oid, current_val in poll['system']:
+        if current_oid == oid:
+            try:
+                return int(current_val)
+            except ValueError:
+                return None
+    return None
+
+def counter_rates(first, second, elapsed):
+    """
+    Computes the per second rates of every interface sampled twice. A
+    32-bit counter lower on the second sample has wrapped once around its
+    width. A 64-bit counter cannot wrap within a sample interval, so one
+    that went down has been reset and its rate is left out, as are all
+    the rates of an interface whose ifCounterDiscontinuityTime changed.
+    """
+    rates = {}
+    for index, row in second.items():
+        previous = first.get(index)
+        if not previous or elapsed <= 0:
+            continue
+        if row.get('discontinuity') != previous.get('discontinuity'):
+            continue
+        rate = {}
+        for key, width, rate_key, multiplier in RATE_COLUMNS:
+            if key not in row or key not in previous:
+                continue
+            delta = row[key] - previous[key]
+            if delta < 0:
+                if width == 64:
+                    continue
+                delta += 2 ** width
+            rate[rate_key] = round(delta * multiplier / elapsed, 3)
+        rates[int(index)] = rate
+    return rates
+
+def sample_counters(cmdGen, snmp_auth, hosts, registry, polls, interval, max_repetitions):
+    """
+    Walks the counters table of every host a second time, interval seconds
+    after the first walk, and stores the rates in the polls. The rates of
+    a host whose sysUpTime went backwards between the two walks, that is
+    whose agent restarted, are dropped.
+    """
+    counters = OidRegistry([table for table in registry.tables if table.name == 'counters'] + [uptime_table()])
+    started = [poll['times']['counters'] for poll in polls.values() if 'counters' in poll['times']]
+    if started:
+        time.sleep(max(0, min(started) + interval - time.time()))
+
+    samples = poll_hosts(cmdGen, snmp_auth, hosts, counters, max_repetitions)
+    for address, poll in polls.items():
+        sample = samples[address]
+        if poll['error']:
+            continue
+        if sample['error']:
+            poll['error'] = sample['error']
+            continue
+        elapsed = sample['times'].get('counters', 0) - poll['times'].get('counters', 0)
+        poll['sample_interval'] = round(elapsed, 3)
+        first_uptime, second_uptime = poll_uptime(poll), poll_uptime(sample)
+        if first_uptime is not None and second_uptime is not None and second_uptime < first_uptime:
+            poll['rates'] = {}
+            continue
+        poll['rates'] = counter_rates(table_rows(registry, poll)['counters'],
+                                      table_rows(counters, sample)['counters'], elapsed)
+
+def build_facts(registry, poll):
+    """
+    Turns the varbinds polled from one host into its facts. Every varbind
+    is dispatched to its table row through the registry, then the rows of
+    the built in tables are shaped into the usual facts and the rows of
+    the user defined tables are returned in ansible_snmp_tables.
+    """
+    Tree = lambda: defaultdict(Tree)
+                               
+    results = Tree()
+
+    rows = table_rows(registry, poll)
+
+    for table in registry.tables:
+        if table.name == 'system':
+            results.update(rows['system'].get('', {}))
+
+        elif table.name == 'interfaces':
+            for index, row in rows['interfaces'].items():
+                results['ansible_interfaces'][int(index)].update(row)
+
+        elif table.name == 'ipv4':
+            ipv4_networks = rows['ipv4']
+            all_ipv4_addresses = []
+            interface_to_ipv4 = {}
+            for ipv4_network in sorted(ipv4_networks, key=oid_sort_key):
+                current_interface = ipv4_networks[ipv4_network].get('interface')
+                current_network = {
+                                    'address':  ipv4_networks[ipv4_network].get('address'),
+                                    'netmask':  ipv4_networks[ipv4_network].get('netmask')
+                                  }
+                if 'address' in ipv4_networks[ipv4_network]:
+                    all_ipv4_addresses.append(current_network['address'])
+                if current_interface is None:
+                    continue
+                interface_to_ipv4.setdefault(current_interface, []).append(current_network)
+
+            for interface in interface_to_ipv4:
+                results['ansible_interfaces'][int(interface)]['ipv4'] = interface_to_ipv4[interface]
+
+            results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
+
+        elif table.name == 'uptime':
+            continue
+
+        elif table.name == 'counters':
+            if 'rates' in poll:
+                results['ansible_interface_rates'] = poll['rates']
+                results['ansible_sample_interval'] = poll['sample_interval']
+
+        else:
+            results['ansible_snmp_tables'][table.name] = dict(rows[table.name])
+
+    return results
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            host=dict(required=True),
+            host=dict(required=False),
+            hosts=dict(required=False, type='list'),
+            timeout=dict(required=False, type='float', default=1),
+            retries=dict(required=False, type='int', default=5),
             version=dict(required=True, choices=['v2', 'v2c', 'v3']),
             community=dict(required=False, default=False),
             username=dict(required=False),
@@ -185,8 +651,15 @@ def main():
             privacy=dict(required=False, choices=['des', 'aes']),
             authkey=dict(required=False),
             privkey=dict(required=False),
+            include=dict(required=False, type='list', default=INCLUDE_CHOICES),
+            max_repetitions=dict(required=False, type='int', default=25),
+            tables=dict(required=False, type='dict'),
+            sample=dict(required=False, type='bool', default=False),
+            sample_interval=dict(required=False, type='float', default=10),
             removeplaceholder=dict(required=False)),
             required_together = ( ['username','level','integrity','authkey'],['privacy','privkey'],),
+            required_one_of = ( ['host','hosts'],),
+            mutually_exclusive = ( ['host','hosts'],),
         supports_check_mode=False)
 
     m_args = module.params
@@ -194,7 +667,11 @@ def main():
     if not has_pysnmp:
         module.fail_json(msg='Missing required pysnmp module (check docs)')
 
-    cmdGen = cmdgen.CommandGenerator()
+    for table in m_args['include']:
+        if table not in INCLUDE_CHOICES:
+            module.fail_json(msg="value of include must be one or more of: %s, got: %s" % (",".join(INCLUDE_CHOICES), table))
+
+    cmdGen = cmdgen.AsynCommandGenerator()
 
     # Verify that we receive a community when using snmp v2
     if m_args['version'] == "v2" or m_args['version'] == "v2c":
@@ -231,135 +708,56 @@ def main():
     else:
         snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], privKey=m_args['privkey'], authProtocol=integrity_proto, privProtocol=privacy_proto)
 
-    # Use p to prefix OIDs with a dot for polling
-    p = DefineOid(dotprefix=True)
-    # Use v without a prefix to use with return values
-    v = DefineOid(dotprefix=False)
-
-    Tree = lambda: defaultdict(Tree)
-                               
-    results = Tree()
-            
-    errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.sysDescr,),
-        cmdgen.MibVariable(p.sysObjectId,), 
-        cmdgen.MibVariable(p.sysUpTime,),
-        cmdgen.MibVariable(p.sysContact,), 
-        cmdgen.MibVariable(p.sysName,),
-        cmdgen.MibVariable(p.sysLocation,),
-    )
-
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
-    for oid, val in varBinds:
-        current_oid = oid.prettyPrint()
-        current_val = val.prettyPrint()
-        if current_oid == v.sysDescr:
-            results['ansible_sysdescr'] = decode_hex(current_val)
-        elif current_oid == v.sysObjectId:
-            results['ansible_sysobjectid'] = current_val
-        elif current_oid == v.sysUpTime:
-            results['ansible_sysuptime'] = current_val
-        elif current_oid == v.sysContact:
-            results['ansible_syscontact'] = current_val
-        elif current_oid == v.sysName:
-            results['ansible_sysname'] = current_val
-        elif current_oid == v.sysLocation:
-            results['ansible_syslocation'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)), 
-        cmdgen.MibVariable(p.ifIndex,),
-        cmdgen.MibVariable(p.ifDescr,),
-        cmdgen.MibVariable(p.ifMtu,),
-        cmdgen.MibVariable(p.ifSpeed,),
-        cmdgen.MibVariable(p.ifPhysAddress,),
-        cmdgen.MibVariable(p.ifAdminStatus,),
-        cmdgen.MibVariable(p.ifOperStatus,),
-        cmdgen.MibVariable(p.ipAdEntAddr,), 
-        cmdgen.MibVariable(p.ipAdEntIfIndex,), 
-        cmdgen.MibVariable(p.ipAdEntNetMask,), 
-
-        cmdgen.MibVariable(p.ifAlias,),
-    )
- 
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
-    interface_indexes = []
-    
-    all_ipv4_addresses = []     
-    ipv4_networks = Tree()
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.ifIndex in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['ifindex'] = current_val
-                interface_indexes.append(ifIndex)
-            if v.ifDescr in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['name'] = current_val
-            if v.ifMtu in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['mtu'] = current_val
-            if v.ifMtu in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['speed'] = current_val
-            if v.ifPhysAddress in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['mac'] = decode_mac(current_val)
-            if v.ifAdminStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['adminstatus'] = lookup_adminstatus(int(current_val))
-            if v.ifOperStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['operstatus'] = lookup_operstatus(int(current_val))
-            if v.ipAdEntAddr in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['address'] = current_val
-                all_ipv4_addresses.append(current_val)
-            if v.ipAdEntIfIndex in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['interface'] = current_val
-            if v.ipAdEntNetMask in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['netmask'] = current_val
-
-            if v.ifAlias in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['description'] = current_val
-
-    interface_to_ipv4 = {}
-    for ipv4_network in ipv4_networks:
-        current_interface = ipv4_networks[ipv4_network]['interface']
-        current_network = {
-                            'address':  ipv4_networks[ipv4_network]['address'],
-                            'netmask':  ipv4_networks[ipv4_network]['netmask']
-                          }
-        if not current_interface in interface_to_ipv4:
-            interface_to_ipv4[current_interface] = []
-            interface_to_ipv4[current_interface].append(current_network)
+    hosts = []
+    for host in m_args['hosts'] or [m_args['host']]:
+        if not isinstance(host, dict):
+            host = dict(host=host)
+        if not host.get('host'):
+            module.fail_json(msg="every entry of hosts needs a host")
+        timeout = host.get('timeout', m_args['timeout'])
+        retries = host.get('retries', m_args['retries'])
+        try:
+            timeout = float(timeout)
+            if timeout <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            module.fail_json(msg="timeout of host %s must be a positive number, got %s" % (host['host'], timeout))
+        try:
+            retries = int(retries)
+            if retries < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            module.fail_json(msg="retries of host %s must be a non-negative integer, got %s" % (host['host'], retries))
+        hosts.append(dict(host=host['host'], timeout=timeout, retries=retries))
+
+    tables = [table for table in builtin_tables() if table.name in m_args['include']
+              or (table.name == 'counters' and m_args['sample'])]
+    if m_args['sample'] and 'system' not in m_args['include']:
+        tables.append(uptime_table())
+    tables.extend(user_tables(module, m_args['tables'] or {}))
+    try:
+        registry = OidRegistry(tables)
+    except ValueError, e:
+        module.fail_json(msg=str(e))
+
+    polls = poll_hosts(cmdGen, snmp_auth, hosts, registry, m_args['max_repetitions'])
+    if m_args['sample']:
+        sample_counters(cmdGen, snmp_auth, hosts, registry, polls, m_args['sample_interval'], m_args['max_repetitions'])
+
+    if not m_args['hosts']:
+        poll = polls[m_args['host']]
+        if poll['error']:
+            module.fail_json(msg=poll['error'])
+        module.exit_json(ansible_facts=build_facts(registry, poll))
+
+    results = {}
+    for address, poll in polls.items():
+        if poll['error']:
+            results[address] = dict(failed=True, msg=poll['error'])
         else:
-            interface_to_ipv4[current_interface].append(current_network)
+            results[address] = build_facts(registry, poll)
 
-    for interface in interface_to_ipv4:
-        results['ansible_interfaces'][int(interface)]['ipv4'] = interface_to_ipv4[interface]
-
-    results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
- 
-    module.exit_json(ansible_facts=results)
+    module.exit_json(changed=False, hosts=results)
     
 
 main()